@@ -0,0 +1,77 @@
+"""Проверки DatabaseManager на повтор новостей при заполненной таблице seen_news.
+
+Используется временная база SQLite, которая удаляется при выходе; рабочая
+база из DATABASE_URL не открывается, и config.py не нужен.
+"""
+import atexit
+import random
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+
+from benchmarks.harness import Benchmark
+
+USERS = 20
+SEEN_PER_USER = 5000
+BATCH = 200
+
+
+@lru_cache(maxsize=None)
+def populated_db():
+    from sqlalchemy.orm import sessionmaker
+
+    import database
+
+    directory = tempfile.TemporaryDirectory(prefix='bench_dedup_')
+    engine = database.create_database(f"sqlite:///{Path(directory.name) / 'bench.db'}")
+    # Обработчики atexit вызываются в обратном порядке: сначала закрываются соединения
+    atexit.register(directory.cleanup)
+    atexit.register(engine.dispose)
+    db = database.DatabaseManager(cache_ttl=0, session_factory=sessionmaker(bind=engine))
+
+    rng = random.Random(0)
+    seen = {}
+    for user_id in range(1, USERS + 1):
+        db.add_user(user_id)
+        hashes = [f'{rng.getrandbits(128):032x}' for _ in range(SEEN_PER_USER)]
+        db.mark_news_seen(user_id, hashes)
+        seen[user_id] = hashes
+    db.get_seen_prefilter()
+    return db, seen
+
+
+def _fresh_hashes(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [f'{rng.getrandbits(128):032x}' for _ in range(count)]
+
+
+def _filter_unseen(seen_share: float):
+    def prepare():
+        db, seen = populated_db()
+        known = int(BATCH * seen_share)
+        hashes = seen[1][:known] + _fresh_hashes(BATCH - known, seed=1)
+        return lambda: db.filter_unseen_news(1, hashes)
+    return prepare
+
+
+def _is_news_seen():
+    db, seen = populated_db()
+    news_hash = seen[1][0]
+    return lambda: db.is_news_seen(1, news_hash)
+
+
+def _mark_seen_again():
+    db, seen = populated_db()
+    hashes = seen[2][:BATCH]
+    return lambda: db.mark_news_seen(2, hashes)
+
+
+def collect() -> List[Benchmark]:
+    rows = f'{USERS * SEEN_PER_USER} rows'
+    return [
+        Benchmark(f'filter_unseen_news[{BATCH} new, {rows}]', _filter_unseen(0.0)),
+        Benchmark(f'filter_unseen_news[{BATCH} half seen, {rows}]', _filter_unseen(0.5)),
+        Benchmark(f'is_news_seen[{rows}]', _is_news_seen),
+        Benchmark(f'mark_news_seen[{BATCH} already seen, {rows}]', _mark_seen_again),
+    ]
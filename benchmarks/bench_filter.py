@@ -0,0 +1,71 @@
+"""Фильтрация новостей цикла по ключевым словам для растущего числа пользователей и слов."""
+from typing import List
+
+from benchmarks.data import make_keywords, make_news
+from benchmarks.harness import Benchmark
+from keyword_index import KeywordIndex
+from near_duplicates import NearDuplicateFilter
+from news_sources.binance_handler import BinanceHandler
+from news_sources.rss_handler import RSSHandler
+
+NEWS_PER_CYCLE = 200
+# (пользователей, ключевых слов у каждого)
+GRID = ((10, 5), (100, 10), (1000, 10))
+
+
+def _subscriptions(users: int, keywords: int):
+    return [make_keywords(keywords, seed=user) for user in range(users)]
+
+
+def _filter_news(users: int, keywords: int):
+    def prepare():
+        handler = RSSHandler()
+        news = make_news(NEWS_PER_CYCLE)
+        subscriptions = _subscriptions(users, keywords)
+        return lambda: [handler.filter_news_by_keywords(news, words) for words in subscriptions]
+    return prepare
+
+
+def _filter_announcements(users: int, keywords: int):
+    def prepare():
+        handler = BinanceHandler()
+        announcements = make_news(NEWS_PER_CYCLE)
+        subscriptions = _subscriptions(users, keywords)
+        return lambda: [handler.filter_announcements_by_keywords(announcements, words) for words in subscriptions]
+    return prepare
+
+
+def _keyword_index(users: int, keywords: int):
+    def prepare():
+        # Путь check_news: одна проверка новости сразу для всех пользователей
+        index = KeywordIndex(
+            (user, word) for user, words in enumerate(_subscriptions(users, keywords)) for word in words
+        )
+        texts = [news.search_text for news in make_news(NEWS_PER_CYCLE)]
+        return lambda: [index.match_users(text, normalized=True) for text in texts]
+    return prepare
+
+
+def _near_duplicates(window_size: int):
+    def prepare():
+        # Окно уже заполнено новостями прошлых циклов, новые записи с ними не совпадают
+        news = make_news(window_size + NEWS_PER_CYCLE, seed=1)
+        window, cycle = news[:window_size], news[window_size:]
+
+        def run():
+            near_duplicates = NearDuplicateFilter()
+            near_duplicates.filter(window, now=0)
+            return near_duplicates.filter(cycle, now=1)
+        return run
+    return prepare
+
+
+def collect() -> List[Benchmark]:
+    benchmarks = []
+    for users, keywords in GRID:
+        suffix = f'[{users} users x {keywords} kw]'
+        benchmarks.append(Benchmark(f'filter_news_by_keywords{suffix}', _filter_news(users, keywords)))
+        benchmarks.append(Benchmark(f'filter_announcements_by_keywords{suffix}', _filter_announcements(users, keywords)))
+        benchmarks.append(Benchmark(f'KeywordIndex.match_users{suffix}', _keyword_index(users, keywords)))
+    benchmarks.append(Benchmark('NearDuplicateFilter.filter[1000 in window + 200]', _near_duplicates(1000)))
+    return benchmarks
@@ -0,0 +1,48 @@
+"""Форматирование сообщений и выделение ключевых слов."""
+from typing import List
+
+from benchmarks.data import make_keywords, make_news
+from benchmarks.harness import Benchmark
+from utils import MessageRenderer, format_message, highlight_keywords
+
+# Рассылка цикла: пользователей, новостей у каждого и различных наборов найденных слов
+FANOUT_USERS = 1000
+FANOUT_NEWS_PER_USER = 5
+FANOUT_KEYWORD_SETS = 50
+
+
+def _format_message():
+    news = make_news(1)[0]
+    return lambda: format_message(news)
+
+
+def _highlight_keywords(keywords: int):
+    def prepare():
+        text = make_news(1)[0].description
+        words = make_keywords(keywords)
+        return lambda: highlight_keywords(text, words)
+    return prepare
+
+
+def _render_fanout():
+    news = make_news(FANOUT_NEWS_PER_USER * 10)
+    keyword_sets = [frozenset(make_keywords(2, seed=seed)) for seed in range(FANOUT_KEYWORD_SETS)]
+    pairs = [
+        (news[(user + offset) % len(news)], keyword_sets[user % FANOUT_KEYWORD_SETS])
+        for user in range(FANOUT_USERS)
+        for offset in range(FANOUT_NEWS_PER_USER)
+    ]
+
+    def run():
+        renderer = MessageRenderer()
+        return [renderer.render(item, keywords) for item, keywords in pairs]
+    return run
+
+
+def collect() -> List[Benchmark]:
+    return [
+        Benchmark('format_message', _format_message),
+        Benchmark('highlight_keywords[1 kw]', _highlight_keywords(1)),
+        Benchmark('highlight_keywords[10 kw]', _highlight_keywords(10)),
+        Benchmark(f'MessageRenderer.render[{FANOUT_USERS} users x {FANOUT_NEWS_PER_USER} news]', _render_fanout),
+    ]
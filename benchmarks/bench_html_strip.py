@@ -0,0 +1,67 @@
+"""Сравнение быстрого html_preview с прежним разбором через BeautifulSoup.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.bench_html_strip
+
+Для каждого канала из benchmarks/fixtures проверяется, что превью описаний
+совпадает с результатом BeautifulSoup(...).get_text(), и выводится ускорение.
+"""
+import sys
+import timeit
+from pathlib import Path
+from typing import List
+
+import feedparser
+from bs4 import BeautifulSoup
+
+from utils import html_preview
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+PREVIEW_LENGTH = 200
+
+
+def beautifulsoup_preview(description: str) -> str:
+    """Прежний способ получения превью в RSSHandler.parse_feed."""
+    clean_description = BeautifulSoup(description, 'html.parser').get_text()
+    if len(clean_description) > PREVIEW_LENGTH:
+        return clean_description[:PREVIEW_LENGTH] + '...'
+    return clean_description
+
+
+def load_descriptions(path: Path) -> List[str]:
+    feed = feedparser.parse(path.read_text(encoding='utf-8'))
+    return [entry.get('description', '') for entry in feed.entries]
+
+
+def measure(func, descriptions: List[str], repeat: int = 5) -> float:
+    """Возвращает лучшее время обработки всех описаний в микросекундах на описание."""
+    timer = timeit.Timer(lambda: [func(description) for description in descriptions])
+    number = max(1, 2000 // max(1, len(descriptions)))
+    best = min(timer.repeat(repeat=repeat, number=number))
+    return best / number / max(1, len(descriptions)) * 1e6
+
+
+def main() -> int:
+    mismatches = 0
+    print(f"{'fixture':<20}{'items':>7}{'bs4, us':>12}{'fast, us':>12}{'speedup':>10}")
+    for path in sorted(FIXTURES_DIR.glob('*.xml')):
+        descriptions = load_descriptions(path)
+        for description in descriptions:
+            if html_preview(description, PREVIEW_LENGTH) != beautifulsoup_preview(description):
+                mismatches += 1
+                print(f"Несовпадение в {path.name}: {description[:80]!r}")
+
+        slow = measure(beautifulsoup_preview, descriptions)
+        fast = measure(lambda description: html_preview(description, PREVIEW_LENGTH), descriptions)
+        print(f"{path.stem:<20}{len(descriptions):>7}{slow:>12.1f}{fast:>12.1f}{slow / fast:>9.1f}x")
+
+    if mismatches:
+        print(f"Найдено несовпадений: {mismatches}")
+        return 1
+    print("Результаты совпадают с BeautifulSoup")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Разбор RSS-каналов разного размера через RSSHandler.parse_feed и потоковая загрузка fetch_source."""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Mapping, Optional
+
+from benchmarks.data import make_feed
+from benchmarks.harness import Benchmark
+from news_sources.rss_handler import RSSHandler
+from news_sources.transport import STREAM_CHUNK_SIZE, HttpTransport, TransportResponse, TransportStream
+
+FEED_SIZES = (('small', 10), ('medium', 40), ('large', 5000))
+
+
+def _parse_feed(item_count: int):
+    def prepare():
+        # Разбор без пула исполнителей: измеряется сама работа, а не передача между процессами
+        handler = RSSHandler()
+        loop = asyncio.new_event_loop()
+        content = make_feed(item_count)
+        return lambda: loop.run_until_complete(handler.parse_feed(content))
+    return prepare
+
+
+class _MemoryTransport(HttpTransport):
+    """Отдаёт заранее собранное тело порциями, как сетевой транспорт."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    async def request(self, method: str, url: str, headers: Optional[Mapping[str, str]] = None,
+                      json_body: Any = None) -> TransportResponse:
+        return TransportResponse(200, {'Content-Type': 'application/rss+xml'}, self.body)
+
+    async def _chunks(self) -> AsyncIterator[bytes]:
+        for start in range(0, len(self.body), STREAM_CHUNK_SIZE):
+            yield self.body[start:start + STREAM_CHUNK_SIZE]
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str,
+                     headers: Optional[Mapping[str, str]] = None) -> AsyncIterator[TransportStream]:
+        chunks = self._chunks()
+        try:
+            yield TransportStream(200, {'Content-Type': 'application/rss+xml'}, chunks)
+        finally:
+            await chunks.aclose()
+
+    async def close(self) -> None:
+        pass
+
+
+def _fetch_source(item_count: int, new_count: int):
+    def prepare():
+        # Известны все записи, кроме new_count самых новых
+        loop = asyncio.new_event_loop()
+        body = make_feed(item_count).encode('utf-8')
+        handler = RSSHandler(transport=_MemoryTransport(body))
+        known = loop.run_until_complete(handler.parse_feed(body))[new_count:]
+        known_hashes = [item.news_hash for item in known]
+        return lambda: loop.run_until_complete(
+            handler.fetch_source('memory', known_hashes=known_hashes, newest_first=True)
+        )
+    return prepare
+
+
+def collect() -> List[Benchmark]:
+    benchmarks = [
+        Benchmark(f'parse_feed[{label}, {item_count} items]', _parse_feed(item_count))
+        for label, item_count in FEED_SIZES
+    ]
+    benchmarks.append(Benchmark('fetch_source[large, 5 new of 5000 items]', _fetch_source(5000, 5)))
+    return benchmarks
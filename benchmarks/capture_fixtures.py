@@ -0,0 +1,97 @@
+"""Сохраняет настоящие RSS-каналы в benchmarks/fixtures.
+
+Запуск из корня репозитория (нужен доступ к сети):
+
+    python -m benchmarks.capture_fixtures              # все каналы из CAPTURE_SOURCES
+    python -m benchmarks.capture_fixtures wordpress    # только указанные
+
+Тело канала сохраняется без изменений как captured_<имя>.xml, а адрес,
+дата загрузки и число записей заносятся в fixtures/SOURCES.md. Сохранённые
+каналы подхватывает bench_html_strip, а их записи <item> — генератор каналов
+make_feed, поэтому после захвата пересохраните базовые результаты
+(python -m benchmarks.run --save).
+"""
+import argparse
+import asyncio
+import re
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List
+
+from news_sources.transport import AiohttpTransport
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+SOURCES_FILE = FIXTURES_DIR / 'SOURCES.md'
+
+# Каналы разных движков: их разметка описаний и отличает одну выборку от другой
+CAPTURE_SOURCES = {
+    'blog': 'https://martinfowler.com/feed.atom',
+    'forum': 'https://meta.discourse.org/latest.rss',
+    'news_site': 'https://lwn.net/headlines/rss',
+    'wiki': 'https://en.wikipedia.org/w/index.php?title=RSS&action=history&feed=rss',
+    'wordpress': 'https://wordpress.org/news/feed/',
+}
+
+# Записи RSS 2.0, RSS 1.0 (<item rdf:about=...>) и Atom
+_ITEM_RE = re.compile(rb'<(?:item|entry)[\s>]')
+
+
+async def capture(names: List[str]) -> int:
+    transport = AiohttpTransport(timeout=30.0)
+    failures = 0
+    try:
+        for name in names:
+            url = CAPTURE_SOURCES[name]
+            try:
+                response = await transport.request('GET', url)
+            except Exception as e:
+                print(f'{name}: ошибка загрузки {url}: {e!r}')
+                failures += 1
+                continue
+            items = len(_ITEM_RE.findall(response.body))
+            if response.status != 200 or not items:
+                print(f'{name}: {url} ответил {response.status}, записей: {items}')
+                failures += 1
+                continue
+            try:
+                # Бенчмарки читают каналы как UTF-8
+                response.body.decode('utf-8')
+            except UnicodeDecodeError:
+                print(f'{name}: {url} отдаёт канал не в UTF-8, пропущен')
+                failures += 1
+                continue
+            path = FIXTURES_DIR / f'captured_{name}.xml'
+            path.write_bytes(response.body)
+            record_source(path.name, url, items)
+            print(f'{name}: {items} записей, {len(response.body)} байт -> {path}')
+    finally:
+        await transport.close()
+    return failures
+
+
+def record_source(filename: str, url: str, items: int) -> None:
+    """Заменяет или добавляет строку о канале в таблице SOURCES.md."""
+    captured_at = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    lines = [
+        line for line in SOURCES_FILE.read_text(encoding='utf-8').splitlines()
+        if not line.startswith(f'| {filename} |')
+    ]
+    lines.append(f'| {filename} | {url} | {captured_at} | {items} |')
+    SOURCES_FILE.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('names', nargs='*',
+                        help=f"какие каналы сохранить: {', '.join(CAPTURE_SOURCES)} (по умолчанию все)")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in CAPTURE_SOURCES]
+    if unknown:
+        parser.error(f"неизвестные каналы: {', '.join(unknown)}")
+    names = args.names or sorted(CAPTURE_SOURCES)
+    return 1 if asyncio.run(capture(names)) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
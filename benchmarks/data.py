@@ -0,0 +1,76 @@
+"""Данные для бенчмарков: каналы из benchmarks/fixtures и детерминированно сгенерированные наборы."""
+import random
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+from pathlib import Path
+from typing import List
+
+from news_record import NewsRecord
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+_ITEM_RE = re.compile(r'<item>.*?</item>', re.S)
+_LINK_RE = re.compile(r'<link>(.*?)</link>')
+
+WORDS = (
+    'bitcoin ethereum solana binance listing delisting etf sec regulation stablecoin usdt usdc '
+    'staking airdrop defi nft layer2 rollup exchange hack exploit bridge validator treasury '
+    'grant governance vote mainnet testnet upgrade fork halving miner hashrate liquidity '
+    'futures options leverage funding whale wallet custody inflow outflow rally dump'
+).split()
+
+
+@lru_cache(maxsize=None)
+def fixture_items() -> List[str]:
+    """Все элементы <item> из каналов в benchmarks/fixtures."""
+    items = []
+    for path in sorted(FIXTURES_DIR.glob('*.xml')):
+        items.extend(_ITEM_RE.findall(path.read_text(encoding='utf-8')))
+    return items
+
+
+@lru_cache(maxsize=None)
+def make_feed(item_count: int) -> str:
+    """Собирает RSS-канал из item_count элементов каналов fixtures с уникальными ссылками."""
+    source = fixture_items()
+    items = []
+    for index in range(item_count):
+        item = source[index % len(source)]
+        items.append(_LINK_RE.sub(lambda match: f'<link>{match.group(1)}?copy={index}</link>', item, count=1))
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel>\n'
+        '<title>benchmark</title><link>https://example.com/</link><description>Benchmark feed</description>\n'
+        + '\n'.join(items) + '\n</channel></rss>'
+    )
+
+
+def make_keywords(count: int, seed: int = 0) -> List[str]:
+    """Ключевые слова пользователя: слова из словаря и их сочетания."""
+    rng = random.Random(seed)
+    keywords = []
+    while len(keywords) < count:
+        keyword = rng.choice(WORDS)
+        if rng.random() < 0.3:
+            keyword = f'{keyword} {rng.choice(WORDS)}'
+        if keyword not in keywords:
+            keywords.append(keyword)
+    return keywords
+
+
+def make_news(count: int, seed: int = 0) -> List[NewsRecord]:
+    """Новости в формате RSSHandler.parse_feed."""
+    rng = random.Random(seed)
+    started = datetime(2024, 5, 1)
+    news = []
+    for index in range(count):
+        title = ' '.join(rng.choice(WORDS) for _ in range(8)).capitalize()
+        description = ' '.join(rng.choice(WORDS) for _ in range(30))
+        news.append(NewsRecord(
+            title=title,
+            link=f'https://example.com/news/{index}',
+            description=description,
+            published=started + timedelta(minutes=index),
+            news_hash=f'{rng.getrandbits(128):032x}'
+        ))
+    return news
@@ -0,0 +1,112 @@
+"""Замер времени, сохранение базовых результатов и поиск регрессий."""
+import json
+import platform
+import statistics
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_BASELINE = Path(__file__).parent / 'baseline.json'
+
+
+@dataclass
+class Benchmark:
+    """Один замер.
+
+    prepare вызывается только для выбранных бенчмарков и возвращает
+    функцию без аргументов, время выполнения которой измеряется.
+    """
+    name: str
+    prepare: Callable[[], Callable[[], Any]]
+
+
+@dataclass
+class Measurement:
+    name: str
+    best: float    # Лучшее время одной операции, с
+    median: float  # Медиана по повторам, с
+    number: int    # Операций в одном повторе
+
+
+def measure(func: Callable[[], Any], repeat: int = 5, min_time: float = 0.2) -> Measurement:
+    """Измеряет функцию: число операций в повторе подбирается так, чтобы повтор длился не меньше min_time."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9) * 1.1))
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return Measurement(name='', best=min(timings), median=statistics.median(timings), number=number)
+
+
+def load_baseline(path: Path) -> Dict[str, Dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding='utf-8')).get('results', {})
+
+
+def save_baseline(path: Path, measurements: List[Measurement]) -> None:
+    """Сохраняет результаты, дополняя ранее сохранённые замеры других бенчмарков."""
+    results = load_baseline(path)
+    for measurement in measurements:
+        results[measurement.name] = {'best': measurement.best, 'median': measurement.median}
+    path.write_text(json.dumps({
+        'machine': platform.platform(),
+        'python': platform.python_version(),
+        'results': results,
+    }, indent=2, sort_keys=True, ensure_ascii=False) + '\n', encoding='utf-8')
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f'{seconds:.2f} s'
+    if seconds >= 1e-3:
+        return f'{seconds * 1e3:.2f} ms'
+    return f'{seconds * 1e6:.1f} us'
+
+
+def run(benchmarks: List[Benchmark], baseline: Dict[str, Dict], threshold: float,
+        repeat: int = 5, min_time: float = 0.2,
+        name_filter: Optional[str] = None) -> Tuple[List[Measurement], List[str]]:
+    """Выполняет бенчмарки, печатает таблицу и сравнение с базовыми результатами.
+
+    Замер считается регрессией, если лучшее время выросло больше чем на
+    threshold (доля) по сравнению с базовым. Возвращает замеры и имена
+    регрессировавших бенчмарков.
+    """
+    measurements = []
+    regressions = []
+    print(f"{'benchmark':<52}{'best':>12}{'median':>12}{'baseline':>12}{'change':>10}")
+    for benchmark in benchmarks:
+        if name_filter and name_filter not in benchmark.name:
+            continue
+        result = measure(benchmark.prepare(), repeat=repeat, min_time=min_time)
+        result.name = benchmark.name
+        measurements.append(result)
+
+        line = f'{benchmark.name:<52}{format_time(result.best):>12}{format_time(result.median):>12}'
+        base = baseline.get(benchmark.name)
+        if base:
+            change = result.best / base['best'] - 1
+            line += f"{format_time(base['best']):>12}{change:>+9.0%}"
+            if change > threshold:
+                line += '  REGRESSION'
+                regressions.append(benchmark.name)
+            elif change < -threshold:
+                line += '  faster'
+        print(line, flush=True)
+
+    if regressions:
+        print(f"\nРегрессии (медленнее более чем на {threshold:.0%}): {', '.join(regressions)}")
+    return measurements, regressions
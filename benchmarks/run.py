@@ -0,0 +1,52 @@
+"""Набор микробенчмарков для горячих путей бота.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.run                # замер и сравнение с benchmarks/baseline.json
+    python -m benchmarks.run --save         # замер и сохранение новых базовых результатов
+    python -m benchmarks.run --filter parse # только бенчмарки, в имени которых есть 'parse'
+
+Базовые результаты зависят от машины, поэтому сохраняются локально и не
+хранятся в репозитории. Если какой-то бенчмарк стал медленнее базового
+больше чем на --threshold, он отмечается как REGRESSION, а команда
+завершается с кодом 1.
+"""
+import argparse
+import sys
+from pathlib import Path
+
+from benchmarks import bench_dedup, bench_filter, bench_format, bench_parse
+from benchmarks.harness import DEFAULT_BASELINE, load_baseline, run, save_baseline
+
+SUITES = (bench_parse, bench_filter, bench_format, bench_dedup)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', action='store_true', help='сохранить результаты как базовые')
+    parser.add_argument('--baseline', type=Path, default=DEFAULT_BASELINE, help='файл базовых результатов')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='допустимое замедление относительно базового, доля (по умолчанию 0.15)')
+    parser.add_argument('--filter', dest='name_filter', help='подстрока имени бенчмарка')
+    parser.add_argument('--repeat', type=int, default=5, help='число повторов замера')
+    parser.add_argument('--min-time', type=float, default=0.2, help='минимальная длительность повтора, с')
+    args = parser.parse_args()
+
+    benchmarks = [benchmark for suite in SUITES for benchmark in suite.collect()]
+    measurements, regressions = run(
+        benchmarks,
+        baseline={} if args.save else load_baseline(args.baseline),
+        threshold=args.threshold,
+        repeat=args.repeat,
+        min_time=args.min_time,
+        name_filter=args.name_filter
+    )
+    if args.save:
+        save_baseline(args.baseline, measurements)
+        print(f'\nБазовые результаты сохранены в {args.baseline}')
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class TTLCache:
+    """Потокобезопасный кеш со сквозным чтением и ограниченным временем жизни записей.
+
+    Значение загружается функцией loader при первом обращении и хранится
+    ttl секунд либо до явного сброса. При ttl <= 0 кеш отключён и каждый
+    вызов обращается к loader.
+    """
+
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        # Поколение растёт при каждом сбросе, чтобы не сохранить значение,
+        # загруженное до сброса
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Возвращает значение по ключу, загружая его при отсутствии или устаревании."""
+        if self.ttl <= 0:
+            return loader()
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def invalidate(self, key: Hashable = None) -> None:
+        """Сбрасывает запись по ключу или, если ключ не указан, весь кеш."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
@@ -1,9 +1,26 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey, Table, DateTime
+import asyncio
+import functools
+import logging
+import math
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import (
+    create_engine, inspect, insert, update, delete, select, or_, text, true,
+    Column, Integer, BigInteger, String, Text, Boolean, ForeignKey, Table, DateTime, Index
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from sqlalchemy.sql import func
-from typing import List, Optional, Dict
-from config import DATABASE_URL
+from typing import AbstractSet, Any, Callable, FrozenSet, Iterable, List, Optional, Dict, Set, Tuple
+from cache import TTLCache
+from keyword_index import KeywordIndex
+from news_record import NewsRecord
+from seen_filter import SeenPrefilter, fingerprint64
+
+logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
@@ -23,6 +40,7 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     update_interval = Column(Integer, default=300)
     last_update = Column(DateTime(timezone=True))
+    digest = Column(Boolean, default=False)  # Получать новости цикла одним сообщением-дайджестом
     
     keywords = relationship("Keyword", back_populates="user")
     sources = relationship("NewsSource", secondary=user_sources)
@@ -46,29 +64,287 @@ class NewsSource(Base):
     is_active = Column(Boolean, default=True)
     added_at = Column(DateTime(timezone=True), server_default=func.now())
     last_fetch = Column(DateTime(timezone=True))
+    # Валидаторы HTTP для условных запросов (If-None-Match / If-Modified-Since)
+    etag = Column(String)
+    last_modified = Column(String)
+    content_length = Column(Integer)  # Размер последнего полученного тела ответа
+    # Адаптивный опрос: собственный интервал и время следующей проверки источника
+    poll_interval = Column(Integer)
+    next_fetch_at = Column(DateTime)
+    failure_count = Column(Integer, default=0)
+    # Отметка последней загрузки: отпечаток тела и хеши записей через пробел
+    body_hash = Column(String)
+    entry_hashes = Column(Text)
+    # Записи канала идут от новых к старым: можно прекращать чтение на известных
+    newest_first = Column(Boolean)
 
 class SeenNews(Base):
     __tablename__ = 'seen_news'
+    __table_args__ = (
+        # Поиск просмотренных новостей пользователя выполняется только по индексу
+        Index('ix_seen_news_user_fingerprint', 'user_id', 'fingerprint', unique=True),
+        # Индекс для удаления записей старше срока хранения
+        Index('ix_seen_news_timestamp', 'timestamp'),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
-    news_hash = Column(String)
+    # Первые 64 бита MD5-хеша новости вместо строки из 32 символов
+    fingerprint = Column(BigInteger)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
-# Создаем движок базы данных
-engine = create_engine(DATABASE_URL)
+class OutboxMessage(Base):
+    """Сообщение, подготовленное к отправке пользователю.
+
+    Строки создаются при сопоставлении новостей, забираются отправителями
+    с арендой (lease) и отмечаются доставленными только после успешной
+    отправки, поэтому новости не теряются при сбоях и перезапусках.
+    """
+    __tablename__ = 'outbox'
+    __table_args__ = (
+        Index('ix_outbox_status_available', 'status', 'available_at'),
+        # Индекс для удаления доставленных и отклонённых сообщений старше срока хранения
+        Index('ix_outbox_status_delivered', 'status', 'delivered_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'))
+    chat_id = Column(Integer)
+    news_hash = Column(String)
+    text = Column(String)
+    status = Column(String, default='pending')  # 'pending', 'delivered' или 'failed'
+    attempts = Column(Integer, default=0)
+    available_at = Column(DateTime)  # Не отправлять раньше этого времени (UTC)
+    lease_owner = Column(String)
+    lease_until = Column(DateTime)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime)  # Время доставки или окончательной неудачи (UTC)
+    published_at = Column(DateTime)  # Время публикации новости, для замера свежести доставки
+
+class Worker(Base):
+    """Процесс бота в режиме сегментирования и время его последнего отклика."""
+    __tablename__ = 'workers'
+
+    id = Column(String, primary_key=True)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)
+
+class WorkerLease(Base):
+    """Аренда сегмента ('shard:<номер>') или роли получателя обновлений ('poller')."""
+    __tablename__ = 'worker_leases'
+
+    name = Column(String, primary_key=True)
+    owner = Column(String)
+    lease_until = Column(DateTime)
+
+class Counter(Base):
+    """Именованный счётчик изменений общих данных.
+
+    Увеличивается в одной транзакции с изменением, поэтому процессы
+    узнают о чужих изменениях, сравнивая его значение с прежним.
+    """
+    __tablename__ = 'counters'
+
+    name = Column(String, primary_key=True)
+    value = Column(Integer, default=0)
+
+class NewsItem(Base):
+    """Новость, загруженная одним из процессов, для сопоставления остальными.
+
+    В режиме сегментирования источник загружает только процесс, владеющий
+    его сегментом, а пользователей обслуживает владелец их сегмента, поэтому
+    новые записи передаются между процессами через эту таблицу.
+    """
+    __tablename__ = 'news_items'
+    __table_args__ = (
+        Index('ix_news_items_created_at', 'created_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    news_hash = Column(String)
+    source = Column(String)
+    title = Column(Text)
+    link = Column(String)
+    description = Column(Text)
+    published = Column(DateTime)
+    created_at = Column(DateTime)
+
+def utcnow() -> datetime:
+    """Текущее время UTC без часового пояса, как его хранит SQLite."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Максимальное число параметров в одном условии IN
+SQL_IN_CHUNK_SIZE = 500
+
+# Сколько устаревших записей удалять за одну транзакцию
+PRUNE_BATCH_SIZE = 5000
+
+# Сколько пользователей ставить в outbox за одну транзакцию
+ENQUEUE_BATCH_USERS = 100
+
+# Аренда роли получателя обновлений Telegram в таблице worker_leases
+POLLER_LEASE = 'poller'
 
-# Создаем все таблицы
-Base.metadata.create_all(engine)
+# Счётчик изменений ключевых слов в таблице counters
+KEYWORDS_COUNTER = 'keywords'
 
-# Создаем сессию
-Session = sessionmaker(bind=engine)
+def shard_of(key: int, shard_count: int) -> int:
+    """Номер сегмента пользователя (по telegram_id) или источника (по id)."""
+    return key % shard_count
+
+def shard_filter(column, shard_count: int, shards: Iterable[int]):
+    """Условие SQL, равносильное shard_of(column) in shards.
+
+    Остаток от деления отрицательных чисел (идентификаторы групп) в SQL
+    отрицателен, поэтому он приводится к диапазону [0, shard_count).
+    """
+    return ((column % shard_count + shard_count) % shard_count).in_(sorted(shards))
+
+def lease_name(shard: int) -> str:
+    return f'shard:{shard}'
+
+def shard_from_lease(name: str) -> Optional[int]:
+    """Номер сегмента по имени аренды или None для остальных аренд."""
+    prefix, _, number = name.partition(':')
+    return int(number) if prefix == 'shard' and number.isdigit() else None
+
+def migrate_schema(engine) -> None:
+    """Добавляет в существующие таблицы столбцы, появившиеся в моделях."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+            if table.name == SeenNews.__tablename__ and 'news_hash' in existing:
+                backfill_seen_fingerprints(conn)
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                if index.unique:
+                    # Перед созданием уникального индекса удаляем накопившиеся дубликаты
+                    columns = ', '.join(column.name for column in index.columns)
+                    conn.execute(text(
+                        f'DELETE FROM {table.name} WHERE id NOT IN '
+                        f'(SELECT MIN(id) FROM {table.name} GROUP BY {columns})'
+                    ))
+                index.create(conn)
+
+def bump_counter(session, name: str) -> None:
+    """Увеличивает счётчик изменений в текущей транзакции, создавая его при необходимости."""
+    session.execute(insert_ignoring_duplicates(session, Counter).values(name=name, value=0))
+    session.execute(update(Counter).where(Counter.name == name).values(value=Counter.value + 1))
+
+def insert_ignoring_duplicates(session, model):
+    """INSERT, пропускающий строки, которые нарушили бы уникальный индекс."""
+    dialect = session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(model).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(model).on_conflict_do_nothing()
+    return insert(model).prefix_with('IGNORE', dialect='mysql')
+
+def backfill_seen_fingerprints(conn) -> None:
+    """Переводит записи seen_news прежнего формата (хеш строкой) в 64-битные отпечатки."""
+    rows = conn.execute(text(
+        'SELECT id, news_hash FROM seen_news WHERE fingerprint IS NULL AND news_hash IS NOT NULL'
+    )).fetchall()
+    if rows:
+        conn.execute(
+            text('UPDATE seen_news SET fingerprint = :fingerprint, news_hash = NULL WHERE id = :id'),
+            [{'id': row.id, 'fingerprint': fingerprint64(row.news_hash)} for row in rows]
+        )
+        logger.info(f"Записей seen_news переведено в отпечатки: {len(rows)}")
+
+def create_database(url: str):
+    """Создаёт движок базы, её таблицы и недостающие в них столбцы."""
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    migrate_schema(engine)
+    return engine
+
+_default_session_factory: Optional[sessionmaker] = None
+_default_session_lock = threading.Lock()
+
+def default_session_factory() -> sessionmaker:
+    """Фабрика сессий базы DATABASE_URL.
+
+    База создаётся и обновляется при первом обращении, а не при импорте
+    модуля, и config.py читается тогда же, поэтому бенчмарки и нагрузочный
+    прогон со своей временной базой не трогают рабочую и не требуют config.py.
+    """
+    global _default_session_factory
+    with _default_session_lock:
+        if _default_session_factory is None:
+            from config import DATABASE_URL
+            _default_session_factory = sessionmaker(bind=create_database(DATABASE_URL))
+        return _default_session_factory
 
 class DatabaseManager:
-    def __init__(self):
-        self.Session = Session
+    def __init__(self, seen_filter_capacity: int = 1024, seen_filter_error_rate: float = 0.01,
+                 cache_ttl: float = 60.0, session_factory: Optional[sessionmaker] = None):
+        # Без session_factory используется база DATABASE_URL, открываемая при первом запросе
+        self._session_factory = session_factory
+        self._keyword_index: Optional[KeywordIndex] = None
+        self.seen_filter_capacity = seen_filter_capacity
+        self.seen_filter_error_rate = seen_filter_error_rate
+        self._seen_prefilter: Optional[SeenPrefilter] = None
+        # Отметки, сделанные, пока фильтр не построен: переносятся в новый фильтр
+        self._seen_journal: Optional[List[Tuple[int, List[int]]]] = []
+        self._seen_lock = threading.Lock()
+        self._seen_build_lock = threading.Lock()
+        # Кеши часто читаемых данных сбрасываются при каждой записи в них
+        self._users = TTLCache(cache_ttl)
+        self._keywords = TTLCache(cache_ttl)
+        self._sources = TTLCache(cache_ttl)
+        # Сегменты, которыми владеет процесс; None - без сегментирования, всё своё
+        self.shard_count = 1
+        self.shards: Optional[FrozenSet[int]] = None
+
+    @property
+    def Session(self) -> sessionmaker:
+        if self._session_factory is None:
+            self._session_factory = default_session_factory()
+        return self._session_factory
+
+    @Session.setter
+    def Session(self, session_factory: sessionmaker) -> None:
+        self._session_factory = session_factory
+
+    def set_shards(self, shards: Optional[Iterable[int]], shard_count: int = 1):
+        """Задаёт сегменты пользователей и источников, которые обслуживает процесс.
+
+        Индекс ключевых слов и фильтр просмотренных новостей строятся
+        только для своих пользователей, поэтому при смене сегментов они
+        загружаются заново: новые пользователи могли получить отметки
+        от предыдущего владельца.
+        """
+        self.shard_count = shard_count
+        self.shards = frozenset(shards) if shards is not None else None
+        self._keyword_index = None
+        self._invalidate_seen_prefilter()
+
+    def owns(self, key: int) -> bool:
+        """Проверяет, относится ли пользователь (telegram_id) или источник (id) к своим сегментам."""
+        return self.shards is None or shard_of(key, self.shard_count) in self.shards
+
+    def _own_users(self, column):
+        """Условие SQL на принадлежность пользователя своим сегментам."""
+        if self.shards is None:
+            return true()
+        return shard_filter(column, self.shard_count, self.shards)
 
     def get_user(self, telegram_id: int) -> Optional[User]:
+        return self._users.get(telegram_id, lambda: self._load_user(telegram_id))
+
+    def _load_user(self, telegram_id: int) -> Optional[User]:
         with self.Session() as session:
             return session.query(User).filter_by(telegram_id=telegram_id).first()
 
@@ -77,15 +353,40 @@ class DatabaseManager:
             user = User(telegram_id=telegram_id)
             session.add(user)
             session.commit()
+            self._users.invalidate(telegram_id)
+            if self._seen_prefilter is not None and self.owns(telegram_id):
+                self._seen_prefilter.add_user(telegram_id)
             return user
 
+    def set_digest(self, telegram_id: int, enabled: bool) -> bool:
+        """Включает или выключает режим дайджеста. Возвращает False, если пользователя нет."""
+        with self.Session() as session:
+            updated = session.execute(
+                update(User).where(User.telegram_id == telegram_id).values(digest=enabled)
+            ).rowcount
+            session.commit()
+        self._users.invalidate(telegram_id)
+        return bool(updated)
+
+    def get_digest_users(self) -> Set[int]:
+        """Возвращает telegram_id пользователей своих сегментов, включивших режим дайджеста."""
+        with self.Session() as session:
+            rows = session.query(User.telegram_id).filter(
+                User.digest == True, self._own_users(User.telegram_id)
+            ).all()
+            return {row.telegram_id for row in rows}
+
     def add_keyword(self, user_id: int, keyword: str) -> bool:
         with self.Session() as session:
             user = session.query(User).filter_by(telegram_id=user_id).first()
             if user and len(user.keywords) < 10:
                 keyword_obj = Keyword(user_id=user.id, word=keyword.lower())
                 session.add(keyword_obj)
+                bump_counter(session, KEYWORDS_COUNTER)
                 session.commit()
+                self._keywords.invalidate(user_id)
+                if self._keyword_index is not None and user.is_active and self.owns(user_id):
+                    self._keyword_index.add(user_id, keyword)
                 return True
             return False
 
@@ -99,37 +400,520 @@ class DatabaseManager:
                 ).first()
                 if keyword_obj:
                     session.delete(keyword_obj)
+                    bump_counter(session, KEYWORDS_COUNTER)
                     session.commit()
+                    self._keywords.invalidate(user_id)
+                    if self._keyword_index is not None:
+                        self._keyword_index.remove(user_id, keyword)
                     return True
             return False
 
     def get_keywords(self, user_id: int) -> List[str]:
+        return list(self._keywords.get(user_id, lambda: self._load_keywords(user_id)))
+
+    def _load_keywords(self, user_id: int) -> List[str]:
         with self.Session() as session:
-            user = session.query(User).filter_by(telegram_id=user_id).first()
-            if user:
-                return [keyword.word for keyword in user.keywords]
-            return []
+            rows = session.query(Keyword.word).join(User, Keyword.user_id == User.id).filter(
+                User.telegram_id == user_id
+            ).order_by(Keyword.id)
+            return [row.word for row in rows]
 
-    def add_seen_news(self, user_id: int, news_hash: str):
+    def get_keyword_index(self) -> KeywordIndex:
+        """Возвращает индекс ключевых слов всех активных пользователей.
+
+        Индекс строится из базы при первом обращении, а затем обновляется
+        инкрементально в add_keyword и remove_keyword. При сегментировании
+        в индекс попадают только пользователи своих сегментов.
+        """
+        if self._keyword_index is None:
+            with self.Session() as session:
+                rows = session.query(User.telegram_id, Keyword.word).join(
+                    Keyword, Keyword.user_id == User.id
+                ).filter(User.is_active == True, self._own_users(User.telegram_id)).all()
+                self._keyword_index = KeywordIndex((row.telegram_id, row.word) for row in rows)
+        return self._keyword_index
+
+    def get_seen_prefilter(self) -> SeenPrefilter:
+        """Возвращает фильтр просмотренных новостей всех пользователей.
+
+        Фильтр загружается из базы при первом обращении и затем пополняется
+        при каждой отметке новостей. После удаления устаревших записей он
+        строится заново. Построение идёт в одном потоке под блокировкой,
+        новый фильтр подменяет прежний целиком, а отметки, сделанные другими
+        потоками во время загрузки, переносятся в него перед подменой.
+        """
+        prefilter = self._seen_prefilter
+        if prefilter is not None:
+            return prefilter
+        with self._seen_build_lock:
+            with self._seen_lock:
+                if self._seen_prefilter is not None:
+                    return self._seen_prefilter
+            prefilter = self._load_seen_prefilter()
+            with self._seen_lock:
+                for telegram_id, fingerprints in self._seen_journal:
+                    prefilter.add(telegram_id, fingerprints)
+                self._seen_journal = None
+                self._seen_prefilter = prefilter
+            return prefilter
+
+    def _load_seen_prefilter(self) -> SeenPrefilter:
+        prefilter = SeenPrefilter(self.seen_filter_capacity, self.seen_filter_error_rate)
         with self.Session() as session:
-            user = session.query(User).filter_by(telegram_id=user_id).first()
-            if user:
-                seen = SeenNews(user_id=user.id, news_hash=news_hash)
-                session.add(seen)
-                session.commit()
+            fingerprints: Dict[int, List[int]] = {
+                row.telegram_id: []
+                for row in session.query(User.telegram_id).filter(self._own_users(User.telegram_id))
+            }
+            rows = session.query(User.telegram_id, SeenNews.fingerprint).join(
+                SeenNews, SeenNews.user_id == User.id
+            ).filter(
+                SeenNews.fingerprint.isnot(None),
+                self._own_users(User.telegram_id)
+            ).yield_per(10000)
+            for row in rows:
+                fingerprints.setdefault(row.telegram_id, []).append(row.fingerprint)
+        for telegram_id, user_fingerprints in fingerprints.items():
+            prefilter.add_user(telegram_id)
+            prefilter.add(telegram_id, user_fingerprints)
+        return prefilter
+
+    def _invalidate_seen_prefilter(self) -> None:
+        """Сбрасывает фильтр; отметки до его построения заново собираются в журнал."""
+        with self._seen_lock:
+            self._seen_prefilter = None
+            if self._seen_journal is None:
+                self._seen_journal = []
+
+    def _remember_seen(self, telegram_id: int, fingerprints: List[int]) -> None:
+        with self._seen_lock:
+            if self._seen_journal is not None:
+                self._seen_journal.append((telegram_id, fingerprints))
+            prefilter = self._seen_prefilter
+            if prefilter is not None:
+                prefilter.add(telegram_id, fingerprints)
+
+    def add_seen_news(self, user_id: int, news_hash: str):
+        self.mark_news_seen(user_id, [news_hash])
 
     def is_news_seen(self, user_id: int, news_hash: str) -> bool:
+        # Фильтр берётся до открытия сессии: его построению тоже нужно соединение
+        candidates, filtered = self._seen_candidates(user_id, {news_hash})
         with self.Session() as session:
             user = session.query(User).filter_by(telegram_id=user_id).first()
             if user:
-                return session.query(SeenNews).filter_by(
-                    user_id=user.id,
-                    news_hash=news_hash
-                ).first() is not None
+                return bool(self._get_seen_hashes(session, user.id, candidates, filtered))
             return False
 
+    def filter_unseen_news(self, user_id: int, news_hashes: Iterable[str]) -> Set[str]:
+        """Возвращает подмножество хешей, которые пользователь ещё не видел.
+
+        Если фильтр уверен, что ни одной новости пользователь не видел,
+        база не запрашивается.
+        """
+        hashes = set(news_hashes)
+        if not hashes:
+            return set()
+        candidates, filtered = self._seen_candidates(user_id, hashes)
+        if not candidates:
+            return hashes
+        with self.Session() as session:
+            user = session.query(User).filter_by(telegram_id=user_id).first()
+            if not user:
+                return set()
+            return hashes - self._get_seen_hashes(session, user.id, candidates, filtered)
+
+    def add_seen_news_bulk(self, user_id: int, news_hashes: Iterable[str]):
+        """Отмечает набор новостей как просмотренные одной пакетной вставкой."""
+        self.mark_news_seen(user_id, news_hashes)
+
+    def mark_news_seen(self, user_id: int, news_hashes: Iterable[str]) -> Set[str]:
+        """Отмечает новости как просмотренные и возвращает те, что ранее не были видны.
+
+        Выполняет не больше одного запроса на выборку уже просмотренных
+        хешей и одну пакетную вставку новых.
+        """
+        hashes = set(news_hashes)
+        if not hashes:
+            return set()
+        candidates, filtered = self._seen_candidates(user_id, hashes)
+        with self.Session() as session:
+            user = session.query(User).filter_by(telegram_id=user_id).first()
+            if not user:
+                return set()
+            unseen = hashes - self._get_seen_hashes(session, user.id, candidates, filtered)
+            if unseen:
+                unseen = self._insert_seen(session, user, unseen)
+                session.commit()
+            return unseen
+
+    def _seen_candidates(self, user_id: int, hashes: Set[str]) -> Tuple[Dict[int, str], bool]:
+        """Возвращает отпечатки новостей, которые пользователь мог видеть, с их хешами.
+
+        Второй элемент результата сообщает, отобрал ли кандидатов фильтр:
+        для пользователя, которого в фильтре нет, кандидатами считаются все
+        отпечатки.
+        """
+        fingerprints = {fingerprint64(news_hash): news_hash for news_hash in hashes}
+        prefilter = self.get_seen_prefilter()
+        if user_id not in prefilter:
+            return fingerprints, False
+        return {
+            fingerprint: fingerprints[fingerprint]
+            for fingerprint in prefilter.candidates(user_id, fingerprints)
+        }, True
+
+    def _get_seen_hashes(self, session, user_db_id: int, candidates: Dict[int, str],
+                         filtered: bool) -> Set[str]:
+        filtered_users = {user_db_id} if filtered else set()
+        return self._get_seen_hashes_bulk(session, {user_db_id: candidates}, filtered_users)[user_db_id]
+
+    def _get_seen_hashes_bulk(self, session, candidates_by_user: Dict[int, Dict[int, str]],
+                              filtered_users: AbstractSet[int]) -> Dict[int, Set[str]]:
+        """Возвращает уже просмотренные новости из candidates по id пользователей в базе.
+
+        Отпечатки всех пользователей проверяются общими запросами, а не
+        отдельным запросом на каждого пользователя. Ложными срабатываниями
+        фильтра считаются только кандидаты пользователей из filtered_users
+        (их кандидатов отобрал фильтр), которых не оказалось в базе.
+        """
+        seen = {user_db_id: set() for user_db_id in candidates_by_user}
+        user_ids = [user_db_id for user_db_id, candidates in candidates_by_user.items() if candidates]
+        if not user_ids:
+            return seen
+        fingerprint_list = list({
+            fingerprint for candidates in candidates_by_user.values() for fingerprint in candidates
+        })
+        # Разбиваем на части, чтобы не превысить лимит параметров SQLite
+        for start in range(0, len(fingerprint_list), SQL_IN_CHUNK_SIZE):
+            chunk = fingerprint_list[start:start + SQL_IN_CHUNK_SIZE]
+            rows = session.query(SeenNews.user_id, SeenNews.fingerprint).filter(
+                SeenNews.user_id.in_(user_ids),
+                SeenNews.fingerprint.in_(chunk)
+            ).all()
+            for row in rows:
+                # Отпечаток мог совпасть с кандидатом другого пользователя группы
+                news_hash = candidates_by_user[row.user_id].get(row.fingerprint)
+                if news_hash is not None:
+                    seen[row.user_id].add(news_hash)
+        if self._seen_prefilter is not None and filtered_users:
+            self._seen_prefilter.record_false_positives(sum(
+                len(candidates_by_user[user_db_id]) - len(seen[user_db_id]) for user_db_id in filtered_users
+            ))
+        return seen
+
+    def _insert_seen(self, session, user: User, hashes: Set[str]) -> Set[str]:
+        return self._insert_seen_bulk(session, [(user, hashes)])[user.id]
+
+    def _insert_seen_bulk(self, session, hashes_by_user: List[Tuple[User, Set[str]]]) -> Dict[int, Set[str]]:
+        """Вставляет отметки о просмотре одним запросом и возвращает действительно вставленные.
+
+        Результат - хеши по id пользователя в базе. Отметки, уже сделанные
+        параллельно другим потоком или процессом, пропускаются уникальным
+        индексом, а не прерывают транзакцию.
+        """
+        fingerprints = {
+            user.id: {fingerprint64(news_hash): news_hash for news_hash in hashes}
+            for user, hashes in hashes_by_user
+        }
+        inserted = {user_db_id: set() for user_db_id in fingerprints}
+        values = [
+            {'user_id': user_db_id, 'fingerprint': fingerprint}
+            for user_db_id, user_fingerprints in fingerprints.items()
+            for fingerprint in user_fingerprints
+        ]
+        if not values:
+            return inserted
+        rows = session.execute(
+            insert_ignoring_duplicates(session, SeenNews).returning(SeenNews.user_id, SeenNews.fingerprint),
+            values
+        )
+        for row in rows:
+            inserted[row.user_id].add(fingerprints[row.user_id][row.fingerprint])
+        # Фильтр пополняется до фиксации: лишняя запись в нём приведёт
+        # только к проверке в базе, а пропущенная - к повторной вставке
+        for user, _ in hashes_by_user:
+            self._remember_seen(user.telegram_id, list(fingerprints[user.id]))
+        return inserted
+
+    def prune_seen_news(self, retention_days: float) -> int:
+        """Удаляет отметки о просмотре старше retention_days дней и возвращает их число."""
+        cutoff = utcnow() - timedelta(days=retention_days)
+        deleted = 0
+        with self.Session() as session:
+            while True:
+                expired = select(SeenNews.id).where(SeenNews.timestamp < cutoff).limit(PRUNE_BATCH_SIZE)
+                result = session.execute(delete(SeenNews).where(SeenNews.id.in_(expired)))
+                session.commit()
+                deleted += result.rowcount
+                if result.rowcount < PRUNE_BATCH_SIZE:
+                    break
+        if deleted:
+            # Удалённые отпечатки остаются в фильтре, поэтому строим его заново
+            self._invalidate_seen_prefilter()
+        return deleted
+
+    def add_to_outbox(self, user_id: int, messages: List[Tuple[str, str, Optional[datetime]]],
+                      seen_hashes: Iterable[str] = ()) -> int:
+        """Ставит сообщения в outbox и отмечает новости просмотренными в одной транзакции.
+
+        messages - тройки (хеш новости, текст сообщения, время публикации);
+        seen_hashes - хеши,
+        которые нужно отметить просмотренными без отправки. Новости, уже
+        отмеченные ранее, пропускаются. Возвращает число добавленных сообщений.
+        """
+        def unseen_messages(_, unseen: List[str]) -> List[Tuple[str, str, Optional[datetime]]]:
+            unseen = set(unseen)
+            return [message for message in messages if message[0] in unseen]
+
+        hashes = [message[0] for message in messages] + list(seen_hashes)
+        enqueued, _ = self.enqueue_news({user_id: hashes}, unseen_messages)
+        return enqueued
+
+    def enqueue_news(self, news_by_user: Dict[int, List[str]],
+                     build_messages: Callable[[int, List[str]], List[Tuple[str, str, Optional[datetime]]]]
+                     ) -> Tuple[int, int]:
+        """Ставит в outbox новости группы пользователей и отмечает их просмотренными.
+
+        news_by_user - хеши найденных для пользователя новостей по его
+        Telegram ID. Для каждого пользователя build_messages получает его ещё
+        не виденные новости в том же порядке и возвращает сообщения в формате
+        add_to_outbox; просмотренными отмечаются все эти новости, в том числе
+        не вошедшие в сообщения. Пользователи обрабатываются частями по
+        ENQUEUE_BATCH_USERS: на часть приходится один запрос пользователей,
+        общие запросы просмотренных новостей и одна транзакция вставки.
+        Возвращает число добавленных сообщений и число ещё не виденных новостей.
+        """
+        user_ids = [user_id for user_id, hashes in news_by_user.items() if hashes]
+        enqueued = unseen_total = 0
+        for start in range(0, len(user_ids), ENQUEUE_BATCH_USERS):
+            chunk = user_ids[start:start + ENQUEUE_BATCH_USERS]
+            added, unseen = self._enqueue_news_chunk(
+                {user_id: news_by_user[user_id] for user_id in chunk}, build_messages
+            )
+            enqueued += added
+            unseen_total += unseen
+        return enqueued, unseen_total
+
+    def _enqueue_news_chunk(self, news_by_user: Dict[int, List[str]],
+                            build_messages: Callable[[int, List[str]], List[Tuple[str, str, Optional[datetime]]]]
+                            ) -> Tuple[int, int]:
+        # Фильтр берётся до открытия сессии: его построению тоже нужно соединение
+        candidates = {
+            user_id: self._seen_candidates(user_id, set(hashes))
+            for user_id, hashes in news_by_user.items()
+        }
+        with self.Session() as session:
+            users = {
+                user.telegram_id: user
+                for user in session.query(User).filter(User.telegram_id.in_(list(news_by_user)))
+            }
+            seen = self._get_seen_hashes_bulk(
+                session,
+                {user.id: candidates[user_id][0] for user_id, user in users.items()},
+                {user.id for user_id, user in users.items() if candidates[user_id][1]}
+            )
+            unseen_by_user = {}
+            for user_id, user in users.items():
+                unseen = list(dict.fromkeys(
+                    news_hash for news_hash in news_by_user[user_id] if news_hash not in seen[user.id]
+                ))
+                if unseen:
+                    unseen_by_user[user_id] = unseen
+            if not unseen_by_user:
+                return 0, 0
+
+            inserted = self._insert_seen_bulk(session, [
+                (users[user_id], set(unseen)) for user_id, unseen in unseen_by_user.items()
+            ])
+            now = utcnow()
+            rows = []
+            delayed = []
+            for user_id, unseen in unseen_by_user.items():
+                user = users[user_id]
+                # Отметки, сделанные параллельно другим процессом, не отправляются повторно
+                pending = [
+                    message for message in build_messages(user_id, unseen)
+                    if message[0] in inserted[user.id]
+                ]
+                if not pending:
+                    continue
+                # Время отправки учитывает интервал обновления пользователя
+                available_at = self._reserve_delivery_slot(user, now)
+                delayed.append(user_id)
+                rows.extend(
+                    {
+                        'user_id': user.id,
+                        'chat_id': user_id,
+                        'news_hash': news_hash,
+                        'text': message_text,
+                        'status': 'pending',
+                        'attempts': 0,
+                        'available_at': available_at,
+                        'published_at': published_at
+                    }
+                    for news_hash, message_text, published_at in pending
+                )
+            if rows:
+                session.execute(insert(OutboxMessage), rows)
+            session.commit()
+        for user_id in delayed:
+            self._users.invalidate(user_id)
+        return len(rows), sum(len(unseen) for unseen in unseen_by_user.values())
+
+    @staticmethod
+    def _reserve_delivery_slot(user: User, now: datetime) -> datetime:
+        """Возвращает время отправки очередной порции новостей с учётом update_interval.
+
+        Порции, поставленные в очередь до уже назначенного времени отправки,
+        присоединяются к нему; иначе следующая порция уходит не раньше чем
+        через update_interval секунд после предыдущей.
+        """
+        last_update = user.last_update.replace(tzinfo=None) if user.last_update else None
+        if last_update and last_update > now:
+            return last_update
+        slot = now
+        if last_update and user.update_interval:
+            slot = max(now, last_update + timedelta(seconds=user.update_interval))
+        user.last_update = slot
+        return slot
+
+    def _leasable_outbox(self, now: datetime):
+        """Условие для сообщений, которые можно взять в аренду в момент now."""
+        available = (
+            (OutboxMessage.status == 'pending')
+            & (OutboxMessage.available_at <= now)
+            & or_(OutboxMessage.lease_until.is_(None), OutboxMessage.lease_until < now)
+        )
+        if self.shards is not None:
+            # Сообщения чата отправляет только владелец его сегмента,
+            # иначе лимиты Telegram на один чат не соблюсти
+            available &= self._own_users(OutboxMessage.chat_id)
+        return available
+
+    def lease_outbox(self, limit: int, lease_seconds: int) -> List[Dict]:
+        """Забирает в аренду до limit готовых к отправке сообщений.
+
+        Аренда помечается уникальным токеном, поэтому одно сообщение не
+        может одновременно достаться двум отправителям. Если отправитель
+        не отчитался до окончания аренды, сообщение снова становится доступным.
+        """
+        token = uuid.uuid4().hex
+        now = utcnow()
+        available = self._leasable_outbox(now)
+        with self.Session() as session:
+            ids = [
+                row.id for row in session.query(OutboxMessage.id)
+                .filter(available)
+                .order_by(OutboxMessage.available_at, OutboxMessage.id)
+                .limit(limit)
+            ]
+            if not ids:
+                return []
+            session.execute(
+                update(OutboxMessage)
+                .where(OutboxMessage.id.in_(ids) & available)
+                .values(lease_owner=token, lease_until=now + timedelta(seconds=lease_seconds))
+            )
+            session.commit()
+            leased = session.query(OutboxMessage).filter(
+                OutboxMessage.lease_owner == token,
+                OutboxMessage.id.in_(ids)
+            ).order_by(OutboxMessage.id).all()
+            return [
+                {
+                    'id': message.id,
+                    'chat_id': message.chat_id,
+                    'news_hash': message.news_hash,
+                    'text': message.text,
+                    'attempts': message.attempts,
+                    'published_at': message.published_at
+                }
+                for message in leased
+            ]
+
+    def mark_outbox_delivered(self, message_ids: Iterable[int]):
+        """Отмечает сообщения outbox доставленными."""
+        ids = list(message_ids)
+        if not ids:
+            return
+        now = utcnow()
+        with self.Session() as session:
+            for start in range(0, len(ids), SQL_IN_CHUNK_SIZE):
+                session.execute(
+                    update(OutboxMessage)
+                    .where(OutboxMessage.id.in_(ids[start:start + SQL_IN_CHUNK_SIZE]))
+                    .values(status='delivered', delivered_at=now, lease_owner=None, lease_until=None)
+                )
+            session.commit()
+
+    def release_outbox(self, message_id: int, max_attempts: int, base_delay: float = 30.0):
+        """Возвращает неотправленное сообщение в очередь с экспоненциальной задержкой.
+
+        После max_attempts неудачных попыток сообщение помечается как 'failed'.
+        """
+        with self.Session() as session:
+            message = session.query(OutboxMessage).filter_by(id=message_id).first()
+            if not message:
+                return
+            message.attempts = (message.attempts or 0) + 1
+            message.lease_owner = None
+            message.lease_until = None
+            if message.attempts >= max_attempts:
+                message.status = 'failed'
+                message.delivered_at = utcnow()
+            else:
+                retry_in = min(3600.0, base_delay * 2 ** (message.attempts - 1))
+                message.available_at = utcnow() + timedelta(seconds=retry_in)
+            session.commit()
+
+    def prune_outbox(self, retention_days: float) -> int:
+        """Удаляет доставленные и неотправленные ('failed') сообщения старше retention_days дней.
+
+        Возвращает число удалённых сообщений.
+        """
+        cutoff = utcnow() - timedelta(days=retention_days)
+        finished = or_(
+            (OutboxMessage.status.in_(('delivered', 'failed'))) & (OutboxMessage.delivered_at < cutoff),
+            # Сообщения, отклонённые до появления отметки времени отказа
+            (OutboxMessage.status == 'failed') & OutboxMessage.delivered_at.is_(None)
+            & (OutboxMessage.created_at < cutoff)
+        )
+        deleted = 0
+        with self.Session() as session:
+            while True:
+                expired = select(OutboxMessage.id).where(finished).limit(PRUNE_BATCH_SIZE)
+                result = session.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(expired)))
+                session.commit()
+                deleted += result.rowcount
+                if result.rowcount < PRUNE_BATCH_SIZE:
+                    break
+        return deleted
+
+    def count_pending_outbox(self, ready_only: bool = True) -> int:
+        """Возвращает количество сообщений, ожидающих отправки.
+
+        По умолчанию считаются только сообщения, которые отправитель может
+        взять в аренду прямо сейчас: отложенные лимитом чата (available_at
+        в будущем) и уже арендованные очередь отправки не задерживают.
+        С ready_only=False считаются все неотправленные сообщения.
+        """
+        with self.Session() as session:
+            if ready_only:
+                condition = self._leasable_outbox(utcnow())
+            else:
+                condition = OutboxMessage.status == 'pending'
+            return session.query(OutboxMessage).filter(condition).count()
+
     def get_sources(self, source_type: Optional[str] = None) -> List[Dict]:
-        """Получает список источников новостей."""
+        """Получает список источников новостей.
+
+        Список берётся из кеша; возвращаются копии, чтобы вызывающий код
+        не мог изменить закешированные данные.
+        """
+        sources = self._sources.get(source_type, lambda: self._load_sources(source_type))
+        return [dict(source) for source in sources]
+
+    def _load_sources(self, source_type: Optional[str]) -> List[Dict]:
         with self.Session() as session:
             query = session.query(NewsSource)
             if source_type:
@@ -141,11 +925,69 @@ class DatabaseManager:
                     'name': src.name,
                     'url': src.url,
                     'type': src.type,
-                    'last_fetch': src.last_fetch
+                    'last_fetch': src.last_fetch,
+                    'etag': src.etag,
+                    'last_modified': src.last_modified,
+                    'content_length': src.content_length,
+                    'poll_interval': src.poll_interval,
+                    'next_fetch_at': src.next_fetch_at,
+                    'failure_count': src.failure_count or 0,
+                    'body_hash': src.body_hash,
+                    'entry_hashes': src.entry_hashes.split() if src.entry_hashes else [],
+                    'newest_first': src.newest_first
                 }
                 for src in sources
             ]
 
+    def get_due_sources(self, source_types: Iterable[str]) -> List[Dict]:
+        """Возвращает активные источники заданных типов своих сегментов, которые пора опросить."""
+        now = utcnow()
+        return [
+            source for source_type in source_types
+            for source in self.get_sources(source_type=source_type)
+            if (source['next_fetch_at'] is None or source['next_fetch_at'] <= now) and self.owns(source['id'])
+        ]
+
+    def update_source_schedule(self, source_id: int, poll_interval: int, next_fetch_at: datetime,
+                               failure_count: int, fetched: bool):
+        """Сохраняет расписание опроса источника; при успешной загрузке обновляет last_fetch."""
+        self.update_source_schedules([{
+            'id': source_id,
+            'poll_interval': poll_interval,
+            'next_fetch_at': next_fetch_at,
+            'failure_count': failure_count,
+            'fetched': fetched
+        }])
+
+    def update_source_schedules(self, schedules: List[Dict]):
+        """Сохраняет расписания нескольких источников одной транзакцией.
+
+        Каждый элемент содержит id, poll_interval, next_fetch_at,
+        failure_count и fetched, как аргументы update_source_schedule.
+        """
+        if not schedules:
+            return
+        now = utcnow()
+        rows = []
+        for schedule in schedules:
+            row = {
+                'id': schedule['id'],
+                'poll_interval': schedule['poll_interval'],
+                'next_fetch_at': schedule['next_fetch_at'],
+                'failure_count': schedule['failure_count']
+            }
+            if schedule['fetched']:
+                row['last_fetch'] = now
+            rows.append(row)
+        with self.Session() as session:
+            try:
+                session.execute(update(NewsSource), rows)
+                session.commit()
+                self._sources.invalidate()
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении расписания источников: {e}")
+                session.rollback()
+
     def add_source(self, url: str, name: str, source_type: str) -> bool:
         """Добавляет новый источник новостей."""
         with self.Session() as session:
@@ -153,6 +995,7 @@ class DatabaseManager:
                 source = NewsSource(url=url, name=name, type=source_type)
                 session.add(source)
                 session.commit()
+                self._sources.invalidate()
                 return True
             except Exception as e:
                 logger.error(f"Ошибка при добавлении источника: {e}")
@@ -167,6 +1010,7 @@ class DatabaseManager:
                 if source:
                     source.is_active = False
                     session.commit()
+                    self._sources.invalidate()
                     return True
                 return False
             except Exception as e:
@@ -175,13 +1019,258 @@ class DatabaseManager:
                 return False
 
     def update_source_last_fetch(self, source_id: int):
-        """Обновляет время последней проверки источника."""
+        """Обновляет время последней проверки источника.
+
+        Кеш источников не сбрасывается: last_fetch в нём может отставать
+        не больше чем на время жизни кеша, а расписание опроса от этого
+        не зависит.
+        """
+        self.update_sources_last_fetch({source_id: utcnow()})
+
+    def update_sources_last_fetch(self, last_fetch: Dict[int, datetime]) -> bool:
+        """Сохраняет время последней проверки нескольких источников одним пакетным UPDATE."""
+        if not last_fetch:
+            return True
         with self.Session() as session:
             try:
-                source = session.query(NewsSource).filter_by(id=source_id).first()
-                if source:
-                    source.last_fetch = func.now()
-                    session.commit()
+                session.execute(
+                    update(NewsSource),
+                    [{'id': source_id, 'last_fetch': fetched_at} for source_id, fetched_at in last_fetch.items()]
+                )
+                session.commit()
+                return True
             except Exception as e:
                 logger.error(f"Ошибка при обновлении времени проверки источника: {e}")
-                session.rollback() 
\ No newline at end of file
+                session.rollback()
+                return False
+
+    def update_source_validators(self, source_id: int, etag: Optional[str],
+                                 last_modified: Optional[str], content_length: Optional[int],
+                                 body_hash: Optional[str] = None,
+                                 entry_hashes: Optional[List[str]] = None,
+                                 newest_first: Optional[bool] = None):
+        """Сохраняет HTTP-валидаторы и отметку последнего ответа источника."""
+        self.update_sources_validators([{
+            'id': source_id,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_length': content_length,
+            'body_hash': body_hash,
+            'entry_hashes': entry_hashes,
+            'newest_first': newest_first
+        }])
+
+    def update_sources_validators(self, validators: List[Dict]):
+        """Сохраняет валидаторы и отметки нескольких источников одной транзакцией.
+
+        Каждый элемент содержит id и аргументы update_source_validators.
+        """
+        if not validators:
+            return
+        rows = [
+            {**row, 'entry_hashes': ' '.join(row['entry_hashes']) if row['entry_hashes'] else None}
+            for row in validators
+        ]
+        with self.Session() as session:
+            try:
+                session.execute(update(NewsSource), rows)
+                session.commit()
+                self._sources.invalidate()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении валидаторов источников: {e}")
+                session.rollback()
+
+    def keywords_version(self) -> int:
+        """Возвращает счётчик изменений ключевых слов: растёт при каждом добавлении или удалении.
+
+        Число и наибольший id для этого не годятся: SQLite повторно выдаёт
+        id удалённой последней строки, и удаление с добавлением их не меняют.
+        """
+        with self.Session() as session:
+            value = session.query(Counter.value).filter_by(name=KEYWORDS_COUNTER).scalar()
+            return value or 0
+
+    def reset_keyword_index(self):
+        """Сбрасывает индекс ключевых слов: он будет построен заново при следующем обращении."""
+        self._keyword_index = None
+
+    def rebalance_shards(self, worker_id: str, shard_count: int, lease_seconds: int) -> Dict:
+        """Продлевает аренду процесса и выравнивает распределение сегментов.
+
+        Процесс отмечает свой отклик, удаляет процессы, не откликавшиеся
+        дольше lease_seconds, и держит не больше ceil(shard_count / число
+        процессов) сегментов: лишние освобождает, недостающие забирает из
+        свободных или просроченных. Сегменты умершего процесса становятся
+        свободными, как только истечёт его аренда. Роль получателя
+        обновлений Telegram арендуется так же и достаётся одному процессу.
+
+        Возвращает словарь с ключами shards (номера своих сегментов),
+        poller (владеет ли процесс ролью получателя) и workers (число живых процессов).
+        """
+        now = utcnow()
+        until = now + timedelta(seconds=lease_seconds)
+        names = [lease_name(shard) for shard in range(shard_count)] + [POLLER_LEASE]
+        self._ensure_leases(names)
+        free = or_(WorkerLease.owner.is_(None), WorkerLease.lease_until < now)
+        mine = WorkerLease.owner == worker_id
+        with self.Session() as session:
+            if not session.execute(
+                update(Worker).where(Worker.id == worker_id).values(heartbeat_at=now)
+            ).rowcount:
+                session.add(Worker(id=worker_id, started_at=now, heartbeat_at=now))
+            session.execute(delete(Worker).where(Worker.heartbeat_at < now - timedelta(seconds=lease_seconds)))
+            workers = session.query(Worker).count()
+            fair_share = math.ceil(shard_count / workers)
+
+            session.execute(update(WorkerLease).where(mine).values(lease_until=until))
+            owned = sorted(
+                shard for shard in (
+                    shard_from_lease(row.name) for row in session.query(WorkerLease.name).filter(mine)
+                )
+                if shard is not None and shard < shard_count
+            )
+            if len(owned) > fair_share:
+                # Освобождаем лишнее для процессов, присоединившихся позже
+                session.execute(
+                    update(WorkerLease)
+                    .where(mine & WorkerLease.name.in_([lease_name(shard) for shard in owned[fair_share:]]))
+                    .values(owner=None, lease_until=None)
+                )
+            elif len(owned) < fair_share:
+                candidates = [
+                    row.name for row in session.query(WorkerLease.name)
+                    .filter(free, WorkerLease.name.in_(names[:shard_count]))
+                    .order_by(WorkerLease.name)
+                    .limit(fair_share - len(owned))
+                ]
+                if candidates:
+                    # Условие на свободность повторяется: сегмент мог уже забрать другой процесс
+                    session.execute(
+                        update(WorkerLease)
+                        .where(WorkerLease.name.in_(candidates) & free)
+                        .values(owner=worker_id, lease_until=until)
+                    )
+            session.execute(
+                update(WorkerLease)
+                .where((WorkerLease.name == POLLER_LEASE) & free)
+                .values(owner=worker_id, lease_until=until)
+            )
+            session.commit()
+
+            leases = session.query(WorkerLease.name).filter(mine).all()
+            shards = {shard_from_lease(row.name) for row in leases} - {None}
+            return {
+                'shards': {shard for shard in shards if shard < shard_count},
+                'poller': any(row.name == POLLER_LEASE for row in leases),
+                'workers': workers
+            }
+
+    def _ensure_leases(self, names: List[str]) -> None:
+        with self.Session() as session:
+            existing = {row.name for row in session.query(WorkerLease.name)}
+            missing = [name for name in names if name not in existing]
+            if not missing:
+                return
+            try:
+                session.execute(insert(WorkerLease), [{'name': name} for name in missing])
+                session.commit()
+            except Exception:
+                # Строки одновременно создал другой процесс
+                session.rollback()
+
+    def release_worker(self, worker_id: str):
+        """Освобождает все аренды процесса при его остановке, чтобы остальные забрали их сразу."""
+        with self.Session() as session:
+            session.execute(
+                update(WorkerLease).where(WorkerLease.owner == worker_id).values(owner=None, lease_until=None)
+            )
+            session.execute(delete(Worker).where(Worker.id == worker_id))
+            session.commit()
+
+    def add_news_items(self, news: List[NewsRecord]):
+        """Сохраняет загруженные новости для сопоставления процессами, владеющими пользователями."""
+        if not news:
+            return
+        now = utcnow()
+        with self.Session() as session:
+            session.execute(insert(NewsItem), [
+                {
+                    'news_hash': item.news_hash,
+                    'source': item.source,
+                    'title': item.title,
+                    'link': item.link,
+                    'description': item.description,
+                    'published': item.published,
+                    'created_at': now
+                }
+                for item in news
+            ])
+            session.commit()
+
+    def get_news_items(self, after_id: int) -> List[Tuple[int, datetime, NewsRecord]]:
+        """Возвращает новости с id больше after_id: тройки (id, время сохранения, новость)."""
+        with self.Session() as session:
+            rows = session.query(NewsItem).filter(NewsItem.id > after_id).order_by(NewsItem.id).all()
+            return [
+                (
+                    row.id,
+                    row.created_at,
+                    NewsRecord(
+                        title=row.title,
+                        link=row.link,
+                        description=row.description,
+                        published=row.published,
+                        news_hash=row.news_hash,
+                        source=row.source
+                    )
+                )
+                for row in rows
+            ]
+
+    def news_items_cursor(self, since: datetime) -> int:
+        """Возвращает id, после которого идут новости, сохранённые начиная с since."""
+        with self.Session() as session:
+            first = session.query(func.min(NewsItem.id)).filter(NewsItem.created_at >= since).scalar()
+            if first is not None:
+                return first - 1
+            return session.query(func.max(NewsItem.id)).scalar() or 0
+
+    def prune_news_items(self, older_than: datetime) -> int:
+        """Удаляет переданные между процессами новости, сохранённые раньше older_than."""
+        with self.Session() as session:
+            result = session.execute(delete(NewsItem).where(NewsItem.created_at < older_than))
+            session.commit()
+            return result.rowcount
+
+
+class AsyncDatabaseManager:
+    """Асинхронная обёртка над DatabaseManager.
+
+    Все методы DatabaseManager доступны под теми же именами, но возвращают
+    корутины: синхронные вызовы SQLAlchemy выполняются в ограниченном пуле
+    потоков и не блокируют цикл событий.
+    """
+
+    def __init__(self, db: Optional[DatabaseManager] = None, max_workers: int = 4):
+        self.db = db or DatabaseManager()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db')
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Выполняет синхронную функцию в пуле потоков базы данных."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.db, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        return wrapper
+
+    def close(self):
+        """Дожидается завершения запущенных запросов и останавливает пул потоков."""
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,325 @@
+import asyncio
+import heapq
+import logging
+from collections import deque
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from metrics import DELIVERY_FRESHNESS, SEND_DURATION, SEND_RESULTS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OutgoingMessage:
+    """Сообщение, ожидающее отправки в Telegram."""
+    chat_id: int
+    text: str
+    parse_mode: str = 'HTML'
+    disable_web_page_preview: bool = True
+    attempts: int = 0
+    # Произвольные данные отправителя, передаются в обработчики результата
+    meta: Any = None
+    # Время публикации новости (UTC без часового пояса) для замера свежести доставки
+    published: Optional[datetime] = None
+    # Telegram отклонил сообщение, и повторная отправка не поможет
+    rejected: bool = False
+
+
+class TokenBucket:
+    """Ведро токенов: не больше rate операций в секунду с запасом capacity."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated: Optional[float] = None
+
+    async def acquire(self) -> None:
+        """Ожидает появления токена и забирает его."""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            if self._updated is not None:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class DeliveryQueue:
+    """Очереди сообщений по чатам с соблюдением лимитов Telegram Bot API.
+
+    Общая скорость отправки ограничена ведром токенов, а для каждого чата
+    выдерживается минимальный интервал между сообщениями (для групп он
+    больше). Чаты обслуживаются по мере готовности, поэтому получатель
+    не ждёт, пока разошлются сообщения всем, кто оказался в очереди раньше.
+    При RetryAfter чат приостанавливается на указанное время, сетевые
+    ошибки повторяются с экспоненциальной задержкой.
+    """
+
+    def __init__(self, bot, global_rate: float = 30.0, private_interval: float = 1.0,
+                 group_interval: float = 3.0, workers: int = 8, max_attempts: int = 5,
+                 on_sent: Optional[Callable[[OutgoingMessage], Awaitable[None]]] = None,
+                 on_failed: Optional[Callable[[OutgoingMessage], Awaitable[None]]] = None):
+        self.bot = bot
+        self.private_interval = private_interval
+        self.group_interval = group_interval
+        self.max_attempts = max_attempts
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self.sent_count = 0
+        self.failed_count = 0
+        self._global_limit = TokenBucket(global_rate)
+        self._workers = workers
+        self._senders: Optional[asyncio.Semaphore] = None
+        self._queues: Dict[int, Deque[OutgoingMessage]] = {}
+        self._next_allowed: Dict[int, float] = {}
+        self._ready: List[Tuple[float, int, int]] = []
+        self._scheduled: Set[int] = set()
+        self._in_flight: Set[int] = set()
+        self._sequence = 0
+        self._pending = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        """Количество сообщений, ожидающих отправки."""
+        return self._pending
+
+    def set_global_rate(self, rate: float) -> None:
+        """Меняет общую скорость отправки, например при делении лимита между процессами."""
+        self._global_limit.rate = rate
+        self._global_limit.capacity = rate
+
+    def start(self) -> None:
+        """Запускает диспетчер отправки в текущем цикле событий."""
+        if self._dispatcher is None:
+            self._senders = asyncio.Semaphore(self._workers)
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def stop(self) -> None:
+        """Останавливает диспетчер и дожидается уже начатых отправок."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+            self._dispatcher = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def enqueue(self, message: OutgoingMessage) -> None:
+        """Ставит сообщение в очередь его чата."""
+        self._queues.setdefault(message.chat_id, deque()).append(message)
+        self._pending += 1
+        self._schedule(message.chat_id)
+
+    def _interval(self, chat_id: int) -> float:
+        # У групп и каналов отрицательные идентификаторы
+        return self.group_interval if chat_id < 0 else self.private_interval
+
+    def _schedule(self, chat_id: int) -> None:
+        if chat_id in self._scheduled or chat_id in self._in_flight:
+            return
+        loop = asyncio.get_running_loop()
+        ready_at = max(loop.time(), self._next_allowed.get(chat_id, 0.0))
+        self._sequence += 1
+        heapq.heappush(self._ready, (ready_at, self._sequence, chat_id))
+        self._scheduled.add(chat_id)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            ready_at, _, chat_id = self._ready[0]
+            delay = ready_at - loop.time()
+            if delay > 0:
+                # Ждём готовности ближайшего чата или появления нового
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._ready)
+            self._scheduled.discard(chat_id)
+            await self._senders.acquire()
+            await self._global_limit.acquire()
+            self._in_flight.add(chat_id)
+            task = asyncio.create_task(self._send_next(chat_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_next(self, chat_id: int) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._queues[chat_id]
+        message = queue[0]
+        delay = self._interval(chat_id)
+        finished = False
+        delivered = False
+        started = time.perf_counter()
+        try:
+            await self.bot.send_message(
+                chat_id=message.chat_id,
+                text=message.text,
+                parse_mode=message.parse_mode,
+                disable_web_page_preview=message.disable_web_page_preview
+            )
+            finished = delivered = True
+        except RetryAfter as e:
+            retry_after = e.retry_after
+            if isinstance(retry_after, timedelta):
+                retry_after = retry_after.total_seconds()
+            delay = max(delay, float(retry_after))
+            logger.warning(f"Превышен лимит отправки в чат {chat_id}, повтор через {delay} с")
+        except (BadRequest, Forbidden) as e:
+            # Бот заблокирован, чат не найден, неверная разметка. В PTB BadRequest
+            # наследует NetworkError, поэтому обрабатывается раньше неё
+            finished = message.rejected = True
+            logger.error(f"Telegram отклонил сообщение пользователю {chat_id}: {e}")
+        except NetworkError as e:
+            message.attempts += 1
+            finished = message.attempts >= self.max_attempts
+            delay = max(delay, min(60.0, 2.0 ** message.attempts))
+            logger.warning(f"Сетевая ошибка при отправке в чат {chat_id} (попытка {message.attempts}): {e}")
+        except TelegramError as e:
+            finished = True
+            logger.error(f"Ошибка при отправке новости пользователю {chat_id}: {e}")
+        except Exception as e:
+            finished = True
+            logger.error(f"Ошибка при отправке новости пользователю {chat_id}: {e}")
+        finally:
+            SEND_DURATION.observe(time.perf_counter() - started)
+            SEND_RESULTS.labels(result='sent' if delivered else 'failed' if finished else 'retry').inc()
+            if finished:
+                queue.popleft()
+                self._pending -= 1
+            self._next_allowed[chat_id] = loop.time() + delay
+            self._in_flight.discard(chat_id)
+            self._senders.release()
+            if queue:
+                self._schedule(chat_id)
+            else:
+                del self._queues[chat_id]
+
+        if delivered:
+            self.sent_count += 1
+            if message.published is not None:
+                age = datetime.now(timezone.utc).replace(tzinfo=None) - message.published
+                DELIVERY_FRESHNESS.observe(max(0.0, age.total_seconds()))
+            if self.on_sent is not None:
+                await self.on_sent(message)
+        elif finished:
+            self.failed_count += 1
+            if self.on_failed is not None:
+                await self.on_failed(message)
+
+
+class OutboxDispatcher:
+    """Переносит сообщения из outbox в очередь отправки и фиксирует результат.
+
+    Сообщения забираются из базы с арендой небольшими партиями, пока в
+    памяти мало неотправленных. Успешные отправки отмечаются пакетно, а
+    неудачные возвращаются в outbox с экспоненциальной задержкой. Доставка
+    выполняется не менее одного раза: при сбое между отправкой и отметкой
+    сообщение может быть отправлено повторно.
+    """
+
+    def __init__(self, db, delivery: DeliveryQueue, batch_size: int = 200,
+                 poll_interval: float = 2.0, lease_seconds: int = 300,
+                 max_attempts: int = 5, max_in_memory: int = 1000):
+        self.db = db
+        self.delivery = delivery
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.max_in_memory = max_in_memory
+        self._leased: Set[int] = set()
+        self._delivered: List[int] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        delivery.on_sent = self._on_sent
+        delivery.on_failed = self._on_failed
+
+    def start(self) -> None:
+        """Запускает перенос сообщений в текущем цикле событий."""
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает перенос и сохраняет отметки о доставке."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self._flush_delivered()
+
+    def notify(self) -> None:
+        """Сообщает, что в outbox появились новые сообщения."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._flush_delivered()
+                await self._lease_batch()
+            except Exception as e:
+                logger.error(f"Ошибка при обработке outbox: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _lease_batch(self) -> None:
+        free = self.max_in_memory - self.delivery.pending
+        if free <= 0:
+            return
+        messages = await self.db.lease_outbox(min(self.batch_size, free), self.lease_seconds)
+        for message in messages:
+            if message['id'] in self._leased:
+                continue
+            self._leased.add(message['id'])
+            self.delivery.enqueue(OutgoingMessage(
+                chat_id=message['chat_id'],
+                text=message['text'],
+                meta=message['id'],
+                published=message['published_at']
+            ))
+
+    async def _flush_delivered(self) -> None:
+        if not self._delivered:
+            return
+        delivered, self._delivered = self._delivered, []
+        try:
+            await self.db.mark_outbox_delivered(delivered)
+        except Exception:
+            self._delivered.extend(delivered)
+            raise
+
+    async def _on_sent(self, message: OutgoingMessage) -> None:
+        self._leased.discard(message.meta)
+        self._delivered.append(message.meta)
+
+    async def _on_failed(self, message: OutgoingMessage) -> None:
+        self._leased.discard(message.meta)
+        # Отклонённое сообщение сразу помечается как 'failed', остальные повторяются позже
+        await self.db.release_outbox(message.meta, 1 if message.rejected else self.max_attempts)
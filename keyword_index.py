@@ -0,0 +1,169 @@
+import threading
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class KeywordMatcher:
+    """Автомат Ахо-Корасик для поиска множества ключевых слов за один проход по тексту.
+
+    Поиск регистронезависимый и совпадает по смыслу с проверкой
+    ``keyword.lower() in text.lower()`` для каждого слова. Текст, уже
+    приведённый к нижнему регистру (NewsRecord.search_text), передаётся с
+    normalized=True, чтобы не копировать его заново.
+    """
+
+    def __init__(self, keywords: Iterable[str] = ()):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._terminal: List[Set[str]] = [set()]
+        self._output: List[Tuple[str, ...]] = [()]
+        self._keywords: Set[str] = set()
+        self._dirty = False
+        for keyword in keywords:
+            self.add(keyword)
+
+    def __len__(self) -> int:
+        return len(self._keywords)
+
+    def __contains__(self, keyword: str) -> bool:
+        return keyword.lower() in self._keywords
+
+    def add(self, keyword: str) -> None:
+        """Добавляет ключевое слово в бор. Ссылки автомата пересчитываются лениво."""
+        keyword = keyword.lower()
+        if not keyword or keyword in self._keywords:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append(set())
+                self._output.append(())
+                self._goto[state][char] = next_state
+            state = next_state
+        self._terminal[state].add(keyword)
+        self._keywords.add(keyword)
+        self._dirty = True
+
+    def remove(self, keyword: str) -> None:
+        """Удаляет ключевое слово. Узлы бора остаются, меняются только выходы."""
+        keyword = keyword.lower()
+        if keyword not in self._keywords:
+            return
+        state = 0
+        for char in keyword:
+            state = self._goto[state][char]
+        self._terminal[state].discard(keyword)
+        self._keywords.discard(keyword)
+        self._dirty = True
+
+    def _build(self) -> None:
+        """Пересчитывает суффиксные ссылки и выходы обходом бора в ширину."""
+        queue = deque()
+        for state in self._goto[0].values():
+            self._fail[state] = 0
+            self._output[state] = tuple(self._terminal[state])
+            queue.append(state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._output[next_state] = tuple(self._terminal[next_state]) + self._output[fail]
+                queue.append(next_state)
+
+        self._dirty = False
+
+    def find_all(self, text: str, normalized: bool = False) -> Set[str]:
+        """Возвращает все ключевые слова, встречающиеся в тексте."""
+        if self._dirty:
+            self._build()
+        goto, fail, output = self._goto, self._fail, self._output
+        found = set()
+        state = 0
+        for char in text if normalized else text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def contains_any(self, text: str, normalized: bool = False) -> bool:
+        """Проверяет, встречается ли в тексте хотя бы одно ключевое слово."""
+        if self._dirty:
+            self._build()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text if normalized else text.lower():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                return True
+        return False
+
+
+class KeywordIndex:
+    """Инвертированный индекс ключевых слов всех пользователей.
+
+    Один проход автомата по тексту новости возвращает всех пользователей,
+    чьи ключевые слова в нём встречаются. Индекс потокобезопасен: он
+    изменяется из пула потоков базы данных, а читается из цикла событий.
+    """
+
+    def __init__(self, subscriptions: Iterable[Tuple[int, str]] = ()):
+        self._matcher = KeywordMatcher()
+        self._subscribers: Dict[str, Set[int]] = {}
+        self._lock = threading.Lock()
+        for user_id, keyword in subscriptions:
+            self.add(user_id, keyword)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def add(self, user_id: int, keyword: str) -> None:
+        """Подписывает пользователя на ключевое слово."""
+        keyword = keyword.lower()
+        with self._lock:
+            subscribers = self._subscribers.get(keyword)
+            if subscribers is None:
+                subscribers = self._subscribers[keyword] = set()
+                self._matcher.add(keyword)
+            subscribers.add(user_id)
+
+    def remove(self, user_id: int, keyword: str) -> None:
+        """Отписывает пользователя от ключевого слова."""
+        keyword = keyword.lower()
+        with self._lock:
+            subscribers = self._subscribers.get(keyword)
+            if subscribers is None:
+                return
+            subscribers.discard(user_id)
+            if not subscribers:
+                del self._subscribers[keyword]
+                self._matcher.remove(keyword)
+
+    def match(self, text: str, normalized: bool = False) -> Dict[int, Set[str]]:
+        """Возвращает найденные в тексте ключевые слова для каждого пользователя."""
+        matches: Dict[int, Set[str]] = {}
+        with self._lock:
+            for keyword in self._matcher.find_all(text, normalized):
+                for user_id in self._subscribers[keyword]:
+                    matches.setdefault(user_id, set()).add(keyword)
+        return matches
+
+    def match_users(self, text: str, normalized: bool = False) -> Set[int]:
+        """Возвращает пользователей, у которых в тексте есть хотя бы одно ключевое слово."""
+        users = set()
+        with self._lock:
+            for keyword in self._matcher.find_all(text, normalized):
+                users.update(self._subscribers[keyword])
+        return users
@@ -0,0 +1,214 @@
+"""Нагрузочный прогон NewsBot.check_news на локальных заглушках.
+
+Запуск из корня репозитория (нужен config.py, как и для самого бота):
+
+    python -m loadtest.driver --users 10000 --sources 1000 --cycles 3
+
+Драйвер поднимает сервер каналов и заглушку Bot API, создаёт временную
+базу SQLite с пользователями, ключевыми словами и источниками и выполняет
+прогревочный цикл, сообщения которого считаются уже отправленными - как у
+давно работающего бота. Затем выполняется --cycles циклов, перед каждым
+публикуется --new-items новых записей. В конце выводятся длительность
+циклов, пропускная способность загрузки и отправки и задержка доставки от
+появления записи до приёма сообщения заглушкой.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+from telegram import Bot
+from telegram.request import HTTPXRequest
+
+from database import Base, Keyword, NewsSource, User
+from loadtest.fake_telegram import FakeTelegramServer
+from loadtest.feed_server import BINANCE_PATH, COMMON_WORDS, FeedServer, tag
+from main import NewsBot
+
+logger = logging.getLogger('loadtest')
+
+
+def percentile(values: List[float], share: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def seed_database(session_factory, feed_server: FeedServer, users: int, keywords_per_user: int,
+                  common_keyword_share: float, update_interval: int, seed: int) -> None:
+    """Заполняет базу пакетными вставками: на 10 тысяч пользователей уходят секунды."""
+    rng = random.Random(seed)
+    with session_factory() as session:
+        session.execute(insert(User), [
+            {'id': user, 'telegram_id': 100000 + user, 'is_active': True, 'update_interval': update_interval}
+            for user in range(1, users + 1)
+        ])
+        keyword_rows = []
+        for user in range(1, users + 1):
+            words = set()
+            while len(words) < keywords_per_user:
+                if rng.random() < common_keyword_share:
+                    words.add(rng.choice(COMMON_WORDS))
+                else:
+                    words.add(tag(rng.randrange(feed_server.tag_count)))
+            keyword_rows.extend({'user_id': user, 'word': word} for word in words)
+        session.execute(insert(Keyword), keyword_rows)
+        source_rows = [
+            {'url': feed_server.feed_url(feed), 'name': f'Feed {feed}', 'type': 'rss', 'is_active': True}
+            for feed in range(feed_server.feed_count)
+        ]
+        source_rows.append({'url': 'binance', 'name': 'Binance', 'type': 'binance', 'is_active': True})
+        session.execute(insert(NewsSource), source_rows)
+        session.commit()
+
+
+def make_all_sources_due(session_factory) -> None:
+    with session_factory() as session:
+        session.execute(text('UPDATE news_sources SET next_fetch_at = NULL'))
+        session.commit()
+
+
+def count_outbox(session_factory) -> int:
+    with session_factory() as session:
+        return session.execute(text('SELECT COUNT(*) FROM outbox')).scalar()
+
+
+async def run(args: argparse.Namespace) -> None:
+    feed_server = FeedServer(args.sources, items_per_feed=args.items_per_feed, tag_count=args.tags, seed=args.seed)
+    telegram = FakeTelegramServer(
+        retry_after_rate=args.retry_after_rate,
+        retry_after_seconds=args.retry_after_seconds,
+        latency=args.api_latency,
+        seed=args.seed
+    )
+    await feed_server.start()
+    await telegram.start()
+
+    # Временная база вместо DATABASE_URL из config.py
+    db_path = Path(tempfile.mkdtemp(prefix='loadtest_')) / 'loadtest.db'
+    engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+
+    started = time.perf_counter()
+    seed_database(session_factory, feed_server, args.users, args.keywords_per_user,
+                  args.common_keyword_share, args.update_interval, args.seed)
+    print(f'База: {args.users} пользователей, {args.sources} RSS-источников + Binance, '
+          f'заполнена за {time.perf_counter() - started:.1f} с ({db_path})')
+
+    bot = NewsBot()
+    bot.db.db.Session = session_factory
+    bot.binance_handler.base_url = feed_server.base_url + BINANCE_PATH.rsplit('/announcement', 1)[0]
+    bot.metrics_server = None
+    tg_bot = Bot(
+        'load:test',
+        base_url=telegram.base_url,
+        request=HTTPXRequest(connection_pool_size=64, pool_timeout=30)
+    )
+    await tg_bot.initialize()
+
+    # Прогрев: первые записи каналов уже «отправлены» давно работающим ботом
+    started = time.perf_counter()
+    await bot.check_news(None)
+    warmup = time.perf_counter() - started
+    with session_factory() as session:
+        session.execute(text("UPDATE outbox SET status = 'delivered'"))
+        session.commit()
+    print(f'Прогревочный цикл: {warmup:.2f} с, сообщений в outbox {count_outbox(session_factory)}')
+
+    await bot.post_init(type('Application', (), {'bot': tg_bot})())
+    delivered_before = len(telegram.delivered)
+    delivery_started = time.perf_counter()
+
+    cycle_times = []
+    fetch_rates = []
+    enqueued_total = 0
+    for cycle in range(1, args.cycles + 1):
+        feed_server.publish(args.new_items)
+        make_all_sources_due(session_factory)
+        outbox_before = count_outbox(session_factory)
+        requests_before = feed_server.requests
+        started = time.perf_counter()
+        await bot.check_news(None)
+        duration = time.perf_counter() - started
+        enqueued = count_outbox(session_factory) - outbox_before
+        fetched = feed_server.requests - requests_before
+        cycle_times.append(duration)
+        fetch_rates.append(fetched / duration if duration else 0.0)
+        enqueued_total += enqueued
+        print(f'Цикл {cycle}: {duration:.2f} с, запросов к источникам {fetched} '
+              f'({fetched / duration:.0f}/с), новых записей {args.new_items}, сообщений в outbox {enqueued}')
+        if cycle < args.cycles:
+            await asyncio.sleep(args.cycle_pause)
+
+    # Ждём, пока очередь отправки опустеет
+    deadline = time.perf_counter() + args.drain_timeout
+    while time.perf_counter() < deadline:
+        pending = await bot.db.count_pending_outbox(ready_only=False)
+        if not pending and not bot.delivery.pending:
+            break
+        await asyncio.sleep(0.5)
+    drain = time.perf_counter() - delivery_started
+    pending = await bot.db.count_pending_outbox(ready_only=False)
+
+    await bot.shutdown(None)
+    await tg_bot.shutdown()
+    await telegram.stop()
+    await feed_server.stop()
+
+    delivered = telegram.delivered[delivered_before:]
+    lags = [
+        received - feed_server.published_at[link]
+        for received, _, link in delivered
+        if link in feed_server.published_at
+    ]
+    print()
+    print(f'Длительность цикла: мин {min(cycle_times):.2f} с, средняя {statistics.mean(cycle_times):.2f} с, '
+          f'макс {max(cycle_times):.2f} с')
+    print(f'Загрузка источников: в среднем {statistics.mean(fetch_rates):.0f} запросов/с, '
+          f'304 - {feed_server.not_modified} из {feed_server.requests}')
+    print(f'Отправка: {len(delivered)} из {enqueued_total} сообщений за {drain:.1f} с '
+          f'({len(delivered) / drain:.1f} сообщений/с), осталось в outbox {pending}')
+    print(f'Ответы 429: по лимитам {telegram.rate_limited}, внедрённые {telegram.injected}')
+    if lags:
+        print(f'Задержка доставки: p50 {percentile(lags, 0.5):.1f} с, p95 {percentile(lags, 0.95):.1f} с, '
+              f'макс {max(lags):.1f} с')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--sources', type=int, default=1000, help='число RSS-каналов')
+    parser.add_argument('--keywords-per-user', type=int, default=3)
+    parser.add_argument('--common-keyword-share', type=float, default=0.05,
+                        help='доля частых ключевых слов, совпадающих с большинством записей')
+    parser.add_argument('--tags', type=int, default=1000, help='число редких ключевых слов')
+    parser.add_argument('--items-per-feed', type=int, default=20)
+    parser.add_argument('--new-items', type=int, default=200, help='новых записей перед каждым циклом')
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--cycle-pause', type=float, default=5.0, help='пауза между циклами, с')
+    parser.add_argument('--update-interval', type=int, default=0,
+                        help='update_interval пользователей, с (0 - отправлять сразу)')
+    parser.add_argument('--retry-after-rate', type=float, default=0.01,
+                        help='доля запросов sendMessage, получающих внеплановый 429')
+    parser.add_argument('--retry-after-seconds', type=int, default=3)
+    parser.add_argument('--api-latency', type=float, default=0.02, help='задержка ответа Bot API, с')
+    parser.add_argument('--drain-timeout', type=float, default=120.0,
+                        help='сколько ждать отправки всех сообщений после последнего цикла, с')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Заглушка Telegram Bot API с лимитами отправки, близкими к реальным.
+
+Принимает getMe и sendMessage по адресу /bot<token>/<метод>. Общий поток
+ограничен 30 сообщениями в секунду, в личный чат - одним сообщением в
+секунду, в группу - двадцатью в минуту. При превышении, а также случайно с
+вероятностью retry_after_rate отвечает 429 с retry_after, как настоящий API.
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+_LINK_RE = re.compile(r"href='([^']+)'")
+
+
+class _Bucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Забирает токен; возвращает 0 или время ожидания следующего токена в секундах."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeTelegramServer:
+    """HTTP-сервер, имитирующий методы Bot API, которые использует бот."""
+
+    def __init__(self, global_rate: float = 30.0, private_rate: float = 1.0,
+                 group_rate: float = 20 / 60, burst: float = 3.0,
+                 retry_after_rate: float = 0.0, retry_after_seconds: int = 5,
+                 latency: float = 0.02, seed: int = 0, host: str = '127.0.0.1', port: int = 0):
+        self.host = host
+        self.port = port
+        self.private_rate = private_rate
+        self.group_rate = group_rate
+        self.burst = burst
+        self.retry_after_rate = retry_after_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.latency = latency
+        self._rng = random.Random(seed)
+        self._global = _Bucket(global_rate, global_rate)
+        self._chats: Dict[int, _Bucket] = {}
+        self._message_id = 0
+        self._runner: Optional[web.AppRunner] = None
+        # Принятые сообщения: (время приёма time.time(), chat_id, ссылка на новость)
+        self.delivered: List[tuple] = []
+        self.rate_limited = 0
+        self.injected = 0
+
+    @property
+    def base_url(self) -> str:
+        """Адрес для параметра base_url у telegram.Bot."""
+        return f'http://{self.host}:{self.port}/bot'
+
+    @staticmethod
+    async def _params(request: web.Request) -> Dict:
+        if request.content_type == 'application/json':
+            return await request.json()
+        # python-telegram-bot передаёт параметры формой, сложные значения - в JSON
+        return dict(await request.post())
+
+    @staticmethod
+    def _ok(result) -> web.Response:
+        return web.Response(text=json.dumps({'ok': True, 'result': result}), content_type='application/json')
+
+    @staticmethod
+    def _retry_after(seconds: int) -> web.Response:
+        return web.Response(status=429, content_type='application/json', text=json.dumps({
+            'ok': False,
+            'error_code': 429,
+            'description': f'Too Many Requests: retry after {seconds}',
+            'parameters': {'retry_after': seconds},
+        }))
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        if method == 'getMe':
+            return self._ok({
+                'id': 1, 'is_bot': True, 'first_name': 'Load', 'username': 'load_test_bot',
+                'can_join_groups': True, 'can_read_all_group_messages': False,
+                'supports_inline_queries': False,
+            })
+        if method != 'sendMessage':
+            return web.Response(status=404, content_type='application/json', text=json.dumps({
+                'ok': False, 'error_code': 404, 'description': 'Not Found'
+            }))
+
+        params = await self._params(request)
+        chat_id = int(params['chat_id'])
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if self.retry_after_rate and self._rng.random() < self.retry_after_rate:
+            self.injected += 1
+            return self._retry_after(self.retry_after_seconds)
+
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            rate = self.group_rate if chat_id < 0 else self.private_rate
+            chat = self._chats[chat_id] = _Bucket(rate, self.burst)
+        wait = self._global.take() or chat.take()
+        if wait:
+            self.rate_limited += 1
+            return self._retry_after(max(1, math.ceil(wait)))
+
+        text = params.get('text', '')
+        link = _LINK_RE.search(text)
+        self.delivered.append((time.time(), chat_id, link.group(1) if link else None))
+        self._message_id += 1
+        return self._ok({
+            'message_id': self._message_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'group' if chat_id < 0 else 'private'},
+            'text': text,
+        })
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
@@ -0,0 +1,159 @@
+"""Локальный сервер сгенерированных RSS-каналов и объявлений в формате Binance.
+
+Каналы доступны по адресам /feeds/<номер>.xml, объявления - по
+/bapi/composite/v1/public/cms/announcement/query. Новые записи появляются
+только при вызове publish(), поэтому нагрузка каждого цикла задаётся
+драйвером. Сервер поддерживает ETag и отвечает 304 на неизменившиеся каналы.
+"""
+import json
+import random
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from aiohttp import web
+
+COMMON_WORDS = (
+    'bitcoin ethereum solana listing etf regulation stablecoin staking airdrop defi '
+    'exchange bridge validator treasury governance mainnet upgrade liquidity futures whale'
+).split()
+
+BINANCE_PATH = '/bapi/composite/v1/public/cms/announcement/query'
+
+
+def tag(index: int) -> str:
+    """Редкое ключевое слово: на него подписывается небольшая доля пользователей."""
+    return f'coin{index}'
+
+
+@dataclass
+class GeneratedItem:
+    title: str
+    link: str
+    description: str
+    published: float  # Время появления записи, time.time()
+
+
+class FeedServer:
+    """Генерирует записи каналов и отдаёт их по HTTP."""
+
+    def __init__(self, feed_count: int, items_per_feed: int = 20, tag_count: int = 1000,
+                 seed: int = 0, host: str = '127.0.0.1', port: int = 0):
+        self.feed_count = feed_count
+        self.items_per_feed = items_per_feed
+        self.tag_count = tag_count
+        self.host = host
+        self.port = port
+        self._rng = random.Random(seed)
+        self._feeds: List[List[GeneratedItem]] = [[] for _ in range(feed_count)]
+        self._announcements: List[GeneratedItem] = []
+        self._sequence = 0
+        # Время появления каждой записи по ссылке, для замера задержки доставки
+        self.published_at: Dict[str, float] = {}
+        self.requests = 0
+        self.not_modified = 0
+        self._runner: Optional[web.AppRunner] = None
+        for feed in range(feed_count):
+            for _ in range(items_per_feed):
+                self._add_item(feed)
+        for _ in range(items_per_feed):
+            self._add_announcement()
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def feed_url(self, feed: int) -> str:
+        return f'{self.base_url}/feeds/{feed}.xml'
+
+    def _make_item(self, link: str) -> GeneratedItem:
+        words = [self._rng.choice(COMMON_WORDS) for _ in range(6)]
+        words.insert(self._rng.randrange(len(words)), tag(self._rng.randrange(self.tag_count)))
+        title = ' '.join(words).capitalize()
+        description = f'<p>{escape(title)}.</p><p>' + ' '.join(
+            self._rng.choice(COMMON_WORDS) for _ in range(40)
+        ) + '</p>'
+        item = GeneratedItem(title=title, link=link, description=description, published=time.time())
+        self.published_at[link] = item.published
+        return item
+
+    def _add_item(self, feed: int) -> None:
+        self._sequence += 1
+        items = self._feeds[feed]
+        items.insert(0, self._make_item(f'https://feeds.example.com/{feed}/{self._sequence}'))
+        del items[self.items_per_feed:]
+
+    def _add_announcement(self) -> None:
+        self._sequence += 1
+        self._announcements.insert(0, self._make_item(
+            f'https://www.binance.com/en/support/announcement/load{self._sequence}'
+        ))
+        del self._announcements[self.items_per_feed:]
+
+    def publish(self, count: int) -> None:
+        """Публикует count новых записей в случайных каналах и одно объявление."""
+        for _ in range(count):
+            self._add_item(self._rng.randrange(self.feed_count))
+        self._add_announcement()
+
+    def _etag(self, feed: int) -> str:
+        items = self._feeds[feed]
+        return f'"{feed}-{items[0].link.rsplit("/", 1)[-1]}"'
+
+    async def _handle_feed(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        try:
+            feed = int(request.match_info['feed'])
+            items = self._feeds[feed]
+        except (ValueError, IndexError):
+            raise web.HTTPNotFound()
+        etag = self._etag(feed)
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers={'ETag': etag})
+        body = ''.join(
+            f'<item><title>{escape(item.title)}</title><link>{item.link}</link>'
+            f'<description>{escape(item.description)}</description>'
+            f'<pubDate>{formatdate(item.published, usegmt=True)}</pubDate></item>'
+            for item in items
+        )
+        return web.Response(
+            text=f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                 f'<title>Feed {feed}</title><link>{self.base_url}</link>{body}</channel></rss>',
+            content_type='application/rss+xml',
+            headers={'ETag': etag}
+        )
+
+    async def _handle_binance(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        catalogs = [
+            {
+                'title': item.title,
+                'code': item.link.rsplit('/', 1)[-1],
+                'description': item.description,
+                'releaseDate': int(item.published * 1000),
+            }
+            for item in self._announcements
+        ]
+        return web.Response(
+            text=json.dumps({'code': '000000', 'data': {'catalogs': catalogs}}),
+            content_type='application/json'
+        )
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/feeds/{feed}.xml', self._handle_feed)
+        app.router.add_post(BINANCE_PATH, self._handle_binance)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # При port=0 порт выбирает система
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,88 @@
+"""Отправляет записанные обновления Telegram на вебхук бота.
+
+Обновления читаются из файла по JSON в строке - в формате, который пишет
+WebhookServer при заданном WEBHOOK_RECORD_PATH. Пример:
+
+    python -m loadtest.replay_updates loadtest/updates.example.jsonl \\
+        --url http://127.0.0.1:8443/telegram --secret local-secret --fake-api-port 8081
+
+С --fake-api-port в этом же процессе поднимается заглушка Bot API, и бот,
+запущенный с TELEGRAM_API_BASE_URL = 'http://127.0.0.1:8081/bot', отвечает
+в неё, а не в Telegram. В конце выводятся коды ответов вебхука, время
+приёма обновлений и число ответов бота.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+import aiohttp
+
+from loadtest.fake_telegram import FakeTelegramServer
+from webhook import SECRET_TOKEN_HEADER
+
+
+def load_updates(path: Path) -> List[Dict]:
+    return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines() if line.strip()]
+
+
+async def run(args: argparse.Namespace) -> None:
+    updates = load_updates(Path(args.updates)) * args.repeat
+    fake = None
+    if args.fake_api_port:
+        fake = FakeTelegramServer(port=args.fake_api_port, latency=0)
+        await fake.start()
+        print(f'Заглушка Bot API: {fake.base_url}')
+        if args.wait_for_bot:
+            # Даём время запустить бота, настроенного на заглушку. Ввод ждём в потоке,
+            # чтобы заглушка тем временем отвечала на запросы бота при запуске
+            await asyncio.get_running_loop().run_in_executor(None, input, 'Запустите бота и нажмите Enter...')
+
+    headers = {SECRET_TOKEN_HEADER: args.secret} if args.secret else {}
+    statuses: Counter = Counter()
+    timings = []
+    async with aiohttp.ClientSession() as session:
+        for number, update in enumerate(updates, start=1):
+            # При повторах идентификаторы обновлений должны оставаться уникальными
+            update = dict(update, update_id=number)
+            started = time.perf_counter()
+            async with session.post(args.url, json=update, headers=headers) as response:
+                await response.read()
+                statuses[response.status] += 1
+            timings.append(time.perf_counter() - started)
+            if args.delay:
+                await asyncio.sleep(args.delay)
+
+    print(f"Отправлено обновлений: {len(updates)}, ответы вебхука: "
+          f"{', '.join(f'{status} - {count}' for status, count in sorted(statuses.items()))}")
+    if timings:
+        print(f'Время приёма: медиана {statistics.median(timings) * 1000:.1f} мс, '
+              f'макс {max(timings) * 1000:.1f} мс')
+    if fake is not None:
+        await asyncio.sleep(args.settle)
+        print(f'Ответов бота в заглушку Bot API: {len(fake.delivered)}')
+        await fake.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('updates', help='файл с обновлениями, по JSON в строке')
+    parser.add_argument('--url', default='http://127.0.0.1:8443/telegram', help='адрес вебхука бота')
+    parser.add_argument('--secret', help='значение WEBHOOK_SECRET_TOKEN')
+    parser.add_argument('--repeat', type=int, default=1, help='сколько раз повторить файл')
+    parser.add_argument('--delay', type=float, default=0.0, help='пауза между обновлениями, с')
+    parser.add_argument('--fake-api-port', type=int, help='поднять заглушку Bot API на этом порту')
+    parser.add_argument('--wait-for-bot', action='store_true',
+                        help='подождать запуска бота после старта заглушки')
+    parser.add_argument('--settle', type=float, default=2.0,
+                        help='сколько ждать ответов бота после отправки, с')
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,10 @@
 import asyncio
 import logging
-from typing import Dict, List
+import os
+import signal
+import socket
+import time
+from typing import Dict, FrozenSet, List, Optional, Tuple
 from datetime import datetime, timedelta
 
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
@@ -18,12 +22,87 @@ from config import (
     TELEGRAM_TOKEN,
     DEFAULT_RSS_SOURCES,
     DEFAULT_UPDATE_INTERVAL,
-    MAX_KEYWORDS_PER_USER
+    MAX_KEYWORDS_PER_USER,
+    FETCH_MAX_CONCURRENCY,
+    FETCH_MAX_PER_HOST,
+    FETCH_TIMEOUT,
+    DB_EXECUTOR_WORKERS,
+    PARSER_EXECUTOR,
+    PARSER_WORKERS,
+    DELIVERY_GLOBAL_RATE,
+    DELIVERY_PRIVATE_INTERVAL,
+    DELIVERY_GROUP_INTERVAL,
+    DELIVERY_WORKERS,
+    DELIVERY_MAX_ATTEMPTS,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_MAX_IN_MEMORY,
+    POLL_TICK_INTERVAL,
+    POLL_MIN_INTERVAL,
+    POLL_MAX_INTERVAL,
+    POLL_MAX_BACKOFF,
+    HTTP_BACKEND,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_PER_HOST,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_DNS_CACHE_TTL,
+    HTTP_HTTP2,
+    SEEN_RETENTION_DAYS,
+    SEEN_PRUNE_INTERVAL,
+    SEEN_FILTER_CAPACITY,
+    SEEN_FILTER_ERROR_RATE,
+    DB_CACHE_TTL,
+    WRITE_FLUSH_INTERVAL,
+    METRICS_HOST,
+    METRICS_PORT,
+    SHARDING_ENABLED,
+    WORKER_ID,
+    SHARD_COUNT,
+    SHARD_LEASE_SECONDS,
+    SHARD_HEARTBEAT_INTERVAL,
+    UPDATES_MODE,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_PATH,
+    WEBHOOK_URL,
+    WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_RECORD_PATH,
+    NEWS_JOBS_ENABLED,
+    TELEGRAM_API_BASE_URL,
+    DEDUP_WINDOW,
+    DEDUP_SIMILARITY,
+    RSS_MAX_FEED_BYTES,
+    HIGHLIGHT_KEYWORDS,
+    DIGEST_BACKLOG_THRESHOLD,
+    DIGEST_MAX_ITEMS,
+    OUTBOX_RETENTION_DAYS,
+    OUTBOX_PRUNE_INTERVAL
 )
-from database import DatabaseManager, User
-from news_sources.rss_handler import RSSHandler
+from database import DatabaseManager, AsyncDatabaseManager, utcnow
+from metrics import (
+    CYCLE_DURATION,
+    DEDUP_RESULTS,
+    FETCH_BYTES,
+    FETCH_DURATION,
+    FETCH_RESPONSES,
+    MATCH_DURATION,
+    SEND_QUEUE_DEPTH,
+    MetricsServer
+)
+from delivery import DeliveryQueue, OutboxDispatcher
+from near_duplicates import NearDuplicateFilter
+from news_record import NewsRecord
+from news_sources.rss_handler import RSSHandler, create_parser_executor
 from news_sources.binance_handler import BinanceHandler
-from utils import format_message, validate_keyword, clean_username
+from news_sources.fetch_scheduler import FetchScheduler, FetchJob
+from news_sources.poll_scheduler import AdaptivePollPolicy
+from news_sources.transport import create_transport
+from sharding import ShardCoordinator
+from utils import MessageRenderer, pack_messages, validate_keyword, clean_username
+from webhook import WebhookServer
+from write_buffer import LastFetchBuffer
 
 # Состояния для ConversationHandler
 CHOOSING_ACTION, ADDING_KEYWORD, REMOVING_KEYWORD, ADDING_SOURCE, REMOVING_SOURCE = range(5)
@@ -37,10 +116,74 @@ logger = logging.getLogger(__name__)
 
 class NewsBot:
     def __init__(self):
-        self.db = DatabaseManager()
-        self.rss_handler = RSSHandler()
-        self.binance_handler = BinanceHandler()
+        # Запросы к базе выполняются в пуле потоков, не блокируя цикл событий
+        self.db = AsyncDatabaseManager(
+            DatabaseManager(
+                seen_filter_capacity=SEEN_FILTER_CAPACITY,
+                seen_filter_error_rate=SEEN_FILTER_ERROR_RATE,
+                cache_ttl=DB_CACHE_TTL
+            ),
+            max_workers=DB_EXECUTOR_WORKERS
+        )
+        # Разбор каналов выполняется в отдельном пуле, чтобы бот оставался отзывчивым
+        self.parser_executor = create_parser_executor(PARSER_EXECUTOR, PARSER_WORKERS)
+        # Один пул соединений на все источники: keep-alive и кеш DNS общие
+        self.transport = create_transport(
+            HTTP_BACKEND,
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_per_host=HTTP_MAX_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            dns_cache_ttl=HTTP_DNS_CACHE_TTL,
+            timeout=FETCH_TIMEOUT,
+            http2=HTTP_HTTP2
+        )
+        self.rss_handler = RSSHandler(
+            parser_executor=self.parser_executor,
+            transport=self.transport,
+            max_feed_bytes=RSS_MAX_FEED_BYTES
+        )
+        self.binance_handler = BinanceHandler(transport=self.transport)
+        self.fetch_scheduler = FetchScheduler(
+            max_concurrency=FETCH_MAX_CONCURRENCY,
+            per_host_limit=FETCH_MAX_PER_HOST,
+            timeout=FETCH_TIMEOUT
+        )
+        self.poll_policy = AdaptivePollPolicy(
+            default_interval=DEFAULT_UPDATE_INTERVAL,
+            min_interval=POLL_MIN_INTERVAL,
+            max_interval=POLL_MAX_INTERVAL,
+            max_backoff=POLL_MAX_BACKOFF
+        )
+        self.last_fetch_buffer = LastFetchBuffer(self.db, flush_interval=WRITE_FLUSH_INTERVAL)
+        self.metrics_server = MetricsServer(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+        # При сегментировании процесс обслуживает только часть пользователей и источников
+        self.shards = ShardCoordinator(
+            self.db,
+            WORKER_ID or f'{socket.gethostname()}:{os.getpid()}',
+            shard_count=SHARD_COUNT,
+            lease_seconds=SHARD_LEASE_SECONDS,
+            heartbeat_interval=SHARD_HEARTBEAT_INTERVAL,
+            handoff_window=2 * SHARD_LEASE_SECONDS + POLL_TICK_INTERVAL,
+            on_change=self.on_shards_changed
+        ) if SHARDING_ENABLED and NEWS_JOBS_ENABLED else None
+        self.webhook_server = WebhookServer(
+            WEBHOOK_HOST,
+            WEBHOOK_PORT,
+            path=WEBHOOK_PATH,
+            url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            record_path=WEBHOOK_RECORD_PATH
+        ) if UPDATES_MODE == 'webhook' else None
+        # Копии одной новости из разных источников отсеиваются до подбора по ключевым словам
+        self.near_duplicates = NearDuplicateFilter(
+            DEDUP_WINDOW, DEDUP_SIMILARITY
+        ) if DEDUP_WINDOW else None
+        self.application: Optional[Application] = None
+        self.delivery: Optional[DeliveryQueue] = None
+        self.outbox: Optional[OutboxDispatcher] = None
         self.user_states: Dict[int, str] = {}
+        # Версия ключевых слов, по которой построен индекс процесса без сегментирования
+        self._keywords_version: Optional[int] = None
 
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Обработчик команды /start."""
@@ -51,8 +194,8 @@ class NewsBot:
         clean_name = clean_username(user.first_name)
         
         # Добавляем пользователя в базу данных, если его там нет
-        if not self.db.get_user(chat_id):
-            self.db.add_user(chat_id)
+        if not await self.db.get_user(chat_id):
+            await self.db.add_user(chat_id)
 
         keyboard = [
             ["📝 Добавить ключевое слово", "🗑 Удалить ключевое слово"],
@@ -86,7 +229,8 @@ class NewsBot:
             "/remove - Удалить ключевое слово\n"
             "/sources - Показать список источников\n"
             "/add_source - Добавить источник\n"
-            "/remove_source - Удалить источник\n\n"
+            "/remove_source - Удалить источник\n"
+            "/digest - Включить или выключить дайджест: новости приходят одним сообщением\n\n"
             "<b>Управление через кнопки:</b>\n"
             "• Используйте кнопки меню для быстрого доступа к функциям\n"
             "• Кнопка 'Список источников' покажет текущие источники новостей\n"
@@ -117,7 +261,7 @@ class NewsBot:
             )
             return ADDING_KEYWORD
 
-        current_keywords = self.db.get_keywords(user_id)
+        current_keywords = await self.db.get_keywords(user_id)
         if len(current_keywords) + len(keywords) > MAX_KEYWORDS_PER_USER:
             await update.message.reply_text(
                 f"❌ Превышен лимит ключевых слов ({MAX_KEYWORDS_PER_USER}).\n"
@@ -138,7 +282,7 @@ class NewsBot:
                 skipped_keywords.append(keyword)
                 continue
 
-            if self.db.add_keyword(user_id, keyword):
+            if await self.db.add_keyword(user_id, keyword):
                 added_keywords.append(keyword)
 
         # Формируем ответное сообщение
@@ -156,7 +300,7 @@ class NewsBot:
     async def remove_keyword_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Начинает процесс удаления ключевого слова."""
         user_id = update.effective_user.id
-        keywords = self.db.get_keywords(user_id)
+        keywords = await self.db.get_keywords(user_id)
 
         if not keywords:
             await update.message.reply_text("У вас нет добавленных ключевых слов.")
@@ -188,7 +332,7 @@ class NewsBot:
             await update.message.reply_text("Операция отменена.", reply_markup=reply_markup)
             return CHOOSING_ACTION
 
-        if self.db.remove_keyword(user_id, keyword):
+        if await self.db.remove_keyword(user_id, keyword):
             keyboard = [
                 ["📝 Добавить ключевое слово", "🗑 Удалить ключевое слово"],
                 ["📋 Мои ключевые слова", "📰 Список источников"],
@@ -208,7 +352,7 @@ class NewsBot:
     async def show_keywords(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Показывает список ключевых слов пользователя."""
         user_id = update.effective_user.id
-        keywords = self.db.get_keywords(user_id)
+        keywords = await self.db.get_keywords(user_id)
 
         if keywords:
             text = "📋 Ваши ключевые слова:\n\n" + "\n".join(f"• {word}" for word in keywords)
@@ -217,12 +361,28 @@ class NewsBot:
 
         await update.message.reply_text(text)
 
+    async def digest_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Переключает режим дайджеста пользователя."""
+        user_id = update.effective_user.id
+        user = await self.db.get_user(user_id)
+        if user is None:
+            await update.message.reply_text("Сначала запустите бота командой /start.")
+            return
+
+        enabled = not user.digest
+        await self.db.set_digest(user_id, enabled)
+        if enabled:
+            text = "📬 Режим дайджеста включён: новые новости будут приходить вместе, одним сообщением."
+        else:
+            text = "Режим дайджеста выключен: каждая новость будет приходить отдельным сообщением."
+        await update.message.reply_text(text)
+
     async def sources_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Показывает список источников новостей."""
         # Получаем все источники
-        rss_sources = self.db.get_sources(source_type='rss')
-        binance_sources = self.db.get_sources(source_type='binance')
-        telegram_sources = self.db.get_sources(source_type='telegram')
+        rss_sources = await self.db.get_sources(source_type='rss')
+        binance_sources = await self.db.get_sources(source_type='binance')
+        telegram_sources = await self.db.get_sources(source_type='telegram')
 
         message = "📋 <b>Список источников новостей:</b>\n\n"
         
@@ -250,6 +410,13 @@ class NewsBot:
 
         await update.message.reply_text(message, parse_mode='HTML')
 
+    async def find_telegram_source(self, chat_id: str) -> Optional[Dict]:
+        """Возвращает источник, соответствующий группе, или None."""
+        for source in await self.db.get_sources(source_type='telegram'):
+            if source['url'] == chat_id:
+                return source
+        return None
+
     async def handle_group_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обрабатывает сообщения в группах."""
         if not update.effective_chat or not update.effective_message:
@@ -264,8 +431,9 @@ class NewsBot:
 
         # Добавляем группу как источник, если её ещё нет
         chat_id = str(chat.id)
-        if not any(src['url'] == chat_id for src in self.db.get_sources(source_type='telegram')):
-            self.db.add_source(
+        source = await self.find_telegram_source(chat_id)
+        if source is None:
+            await self.db.add_source(
                 url=chat_id,
                 name=chat.title or "Telegram группа",
                 source_type='telegram'
@@ -273,13 +441,11 @@ class NewsBot:
             await message.reply_text(
                 f"✅ Группа '{chat.title}' добавлена как источник новостей!"
             )
+            source = await self.find_telegram_source(chat_id)
 
-        # Обновляем время последней проверки
-        sources = self.db.get_sources(source_type='telegram')
-        for source in sources:
-            if source['url'] == chat_id:
-                self.db.update_source_last_fetch(source['id'])
-                break
+        # Обновляем время последней проверки; запись в базу выполняется пакетно
+        if source is not None:
+            self.last_fetch_buffer.touch(source['id'])
 
     async def handle_my_chat_member(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обрабатывает изменения статуса бота в чате."""
@@ -296,8 +462,8 @@ class NewsBot:
             new_status in ['member', 'administrator']):
             
             chat_id = str(chat.id)
-            if not any(src['url'] == chat_id for src in self.db.get_sources(source_type='telegram')):
-                self.db.add_source(
+            if await self.find_telegram_source(chat_id) is None:
+                await self.db.add_source(
                     url=chat_id,
                     name=chat.title or "Telegram группа",
                     source_type='telegram'
@@ -313,11 +479,9 @@ class NewsBot:
               old_status in ['member', 'administrator'] and 
               new_status in ['left', 'kicked']):
             
-            sources = self.db.get_sources(source_type='telegram')
-            for source in sources:
-                if source['url'] == str(chat.id):
-                    self.db.remove_source(source['id'])
-                    break
+            source = await self.find_telegram_source(str(chat.id))
+            if source is not None:
+                await self.db.remove_source(source['id'])
 
     async def add_source_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Начинает процесс добавления источника."""
@@ -366,7 +530,7 @@ class NewsBot:
                 return ADDING_SOURCE
             else:  # Binance
                 try:
-                    if self.db.add_source(
+                    if await self.db.add_source(
                         url="https://www.binance.com/bapi/composite/v1/public/cms/article/catalog/list",
                         name="Binance News",
                         source_type="binance"
@@ -411,7 +575,7 @@ class NewsBot:
                     )
                     return ADDING_SOURCE
 
-                if self.db.add_source(url=url, name=name, source_type='rss'):
+                if await self.db.add_source(url=url, name=name, source_type='rss'):
                     keyboard = [
                         ["📝 Добавить ключевое слово", "🗑 Удалить ключевое слово"],
                         ["📋 Мои ключевые слова", "📰 Список источников"],
@@ -442,7 +606,7 @@ class NewsBot:
 
     async def remove_source_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         """Начинает процесс удаления источника."""
-        sources = self.db.get_sources()
+        sources = await self.db.get_sources()
         
         if not sources:
             keyboard = [
@@ -485,7 +649,7 @@ class NewsBot:
 
         try:
             source_id = int(text.split('ID: ')[1].rstrip(')'))
-            if self.db.remove_source(source_id):
+            if await self.db.remove_source(source_id):
                 keyboard = [
                     ["📝 Добавить ключевое слово", "🗑 Удалить ключевое слово"],
                     ["📋 Мои ключевые слова", "📰 Список источников"],
@@ -528,73 +692,349 @@ class NewsBot:
 
         return CHOOSING_ACTION
 
+    async def fetch_rss_source(self, source: Dict) -> Tuple[List[NewsRecord], Optional[Dict]]:
+        """Загружает RSS-источник и возвращает только записи, появившиеся с прошлой загрузки.
+
+        Запрос выполняется условно. Вместе с записями возвращаются новые
+        валидаторы и отметка канала (отпечаток тела и хеши записей) или None,
+        если они не изменились: сохранять их можно только после того, как
+        новости поставлены в outbox, иначе при сбое они будут потеряны.
+        """
+        result = await self.rss_handler.fetch_source(
+            source['url'],
+            etag=source['etag'],
+            last_modified=source['last_modified'],
+            content_length=source['content_length'],
+            body_hash=source['body_hash'],
+            known_hashes=source['entry_hashes'],
+            newest_first=source['newest_first']
+        )
+        if result.failed:
+            raise ConnectionError(f"Не удалось загрузить {source['url']}")
+        FETCH_RESPONSES.labels(source=source['url'], status=result.status).inc()
+        if result.status == 200:
+            FETCH_BYTES.labels(source=source['url']).inc(result.content_length or 0)
+        validators = None
+        if (result.etag, result.last_modified, result.content_length, result.body_hash,
+                result.newest_first) != (source['etag'], source['last_modified'], source['content_length'],
+                                         source['body_hash'], source['newest_first']):
+            validators = {
+                'id': source['id'],
+                'etag': result.etag,
+                'last_modified': result.last_modified,
+                'content_length': result.content_length,
+                'body_hash': result.body_hash,
+                'entry_hashes': result.entry_hashes,
+                'newest_first': result.newest_first
+            }
+        return result.news, validators
+
+    def next_schedule(self, source: Dict, news: Optional[List[NewsRecord]]) -> Dict:
+        """Рассчитывает следующий опрос источника; news=None означает ошибку загрузки."""
+        now = utcnow()
+        interval = source['poll_interval'] or self.poll_policy.default_interval
+        if news is None:
+            failure_count = source['failure_count'] + 1
+            next_fetch_at = self.poll_policy.on_failure(interval, failure_count, now)
+        else:
+            failure_count = 0
+            # Новыми считаем записи, опубликованные после предыдущей проверки
+            last_fetch = source['last_fetch'].replace(tzinfo=None) if source['last_fetch'] else None
+            new_items = sum(1 for item in news if last_fetch is None or item.published > last_fetch)
+            interval, next_fetch_at = self.poll_policy.on_success(interval, new_items, now)
+        return {
+            'id': source['id'],
+            'poll_interval': interval,
+            'next_fetch_at': next_fetch_at,
+            'failure_count': failure_count,
+            'fetched': news is not None
+        }
+
     async def check_news(self, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Проверяет новости и отправляет их пользователям."""
+        started = time.perf_counter()
+        due_sources = []
         try:
-            all_news = []
-            
-            # Получаем все активные источники
-            rss_sources = self.db.get_sources(source_type='rss')
-            binance_sources = self.db.get_sources(source_type='binance')
-            
-            # Получаем новости из RSS-каналов
-            for source in rss_sources:
-                try:
-                    news = await self.rss_handler.get_news([source['url']])
-                    all_news.extend(news)
-                    self.db.update_source_last_fetch(source['id'])
-                except Exception as e:
-                    logger.error(f"Ошибка при получении новостей из {source['name']}: {e}")
-            
-            # Получаем новости из Binance
-            if binance_sources:
-                try:
-                    binance_news = await self.binance_handler.get_announcements()
-                    all_news.extend(binance_news)
-                    for source in binance_sources:
-                        self.db.update_source_last_fetch(source['id'])
-                except Exception as e:
-                    logger.error(f"Ошибка при получении новостей из Binance: {e}")
-            
-            # Сортируем по дате публикации
-            all_news.sort(key=lambda x: x['published'], reverse=True)
-            
-            # Получаем всех пользователей из базы данных
-            with self.db.Session() as session:
-                users = session.query(User).filter_by(is_active=True).all()
-                
-                for user in users:
-                    keywords = self.db.get_keywords(user.telegram_id)
-                    if not keywords:
-                        continue
-                        
-                    # Фильтруем новости по ключевым словам
-                    filtered_news = []
-                    for news in all_news:
-                        text = f"{news['title']} {news['description']}".lower()
-                        if any(keyword.lower() in text for keyword in keywords):
-                            # Проверяем, не отправляли ли мы эту новость ранее
-                            if not self.db.is_news_seen(user.telegram_id, news['hash']):
-                                filtered_news.append(news)
-                                self.db.add_seen_news(user.telegram_id, news['hash'])
-                    
-                    # Отправляем новости пользователю
-                    for news in filtered_news[:10]:  # Ограничиваем количество новостей
-                        try:
-                            message = format_message(news)
-                            await context.bot.send_message(
-                                chat_id=user.telegram_id,
-                                text=message,
-                                parse_mode='HTML',
-                                disable_web_page_preview=True
-                            )
-                            await asyncio.sleep(0.5)  # Небольшая задержка между сообщениями
-                        except Exception as e:
-                            logger.error(f"Ошибка при отправке новости пользователю {user.telegram_id}: {e}")
-                            continue
-                            
+            # Получаем источники, которые пора опросить по их собственному расписанию
+            due_sources = await self.db.get_due_sources(['rss', 'binance'])
+            all_news, validators = await self.fetch_news(due_sources) if due_sources else ([], [])
+            if self.shards is not None:
+                # Новости своих источников получают все процессы, а сопоставляются
+                # они только с пользователями своих сегментов
+                await self.shards.publish_news(all_news)
+                all_news = await self.shards.take_news()
+            if all_news and self.near_duplicates is not None:
+                received = len(all_news)
+                all_news = self.near_duplicates.filter(all_news)
+                if len(all_news) < received:
+                    logger.info(f"Отброшено копий новостей: {received - len(all_news)} из {received}")
+            if all_news:
+                if self.shards is None:
+                    await self.refresh_keyword_index()
+                await self.match_news(all_news)
+            # Отметки каналов сохраняются только после постановки их новостей в outbox:
+            # если сопоставление не удалось, новые записи будут загружены повторно
+            await self.db.update_sources_validators(validators)
+
         except Exception as e:
             logger.error(f"Ошибка при проверке новостей: {e}")
+        finally:
+            # Циклы без источников к опросу не учитываются, чтобы не занижать длительность
+            if due_sources:
+                CYCLE_DURATION.observe(time.perf_counter() - started)
+
+    async def refresh_keyword_index(self) -> None:
+        """Сбрасывает индекс ключевых слов, если их изменил другой процесс.
+
+        Ключевые слова могут добавлять процессы, только принимающие
+        обновления (NEWS_JOBS_ENABLED = False). При сегментировании
+        версию проверяет ShardCoordinator, а без него - каждый цикл
+        проверки новостей.
+        """
+        version = await self.db.keywords_version()
+        if self._keywords_version is not None and version != self._keywords_version:
+            await self.db.reset_keyword_index()
+        self._keywords_version = version
+
+    async def fetch_news(self, due_sources: List[Dict]) -> Tuple[List[NewsRecord], List[Dict]]:
+        """Загружает источники и сохраняет их расписание.
+
+        Возвращает новые записи и изменившиеся валидаторы RSS-источников,
+        которые check_news сохраняет после постановки новостей в outbox.
+        """
+        all_news = []
+        validators = []
+        rss_sources = [source for source in due_sources if source['type'] == 'rss']
+        binance_sources = [source for source in due_sources if source['type'] == 'binance']
+        
+        # Все источники загружаются параллельно в общем пуле
+        jobs = [
+            FetchJob(
+                key=[source],
+                url=source['url'],
+                fetch=lambda source=source: self.fetch_rss_source(source)
+            )
+            for source in rss_sources
+        ]
+        if binance_sources:
+            # Объявления Binance загружаются одним запросом на все источники этого типа
+            jobs.append(FetchJob(
+                key=binance_sources,
+                url=self.binance_handler.base_url,
+                fetch=self.binance_handler.get_announcements
+            ))
+
+        schedules = []
+        for result in await self.fetch_scheduler.run(jobs):
+            FETCH_DURATION.labels(source=result.url).observe(result.duration)
+            if not result.ok:
+                FETCH_RESPONSES.labels(source=result.url, status='error').inc()
+                logger.error(
+                    f"Ошибка при получении новостей из {', '.join(src['name'] for src in result.key)}: "
+                    f"{result.error!r}"
+                )
+                schedules.extend(self.next_schedule(source, None) for source in result.key)
+                continue
+            if result.url == self.binance_handler.base_url:
+                # Статус ответов RSS учитывается в fetch_rss_source
+                FETCH_RESPONSES.labels(source=result.url, status='ok').inc()
+                news = result.value
+            else:
+                news, source_validators = result.value
+                if source_validators is not None:
+                    validators.append(source_validators)
+            all_news.extend(news)
+            schedules.extend(self.next_schedule(source, news) for source in result.key)
+
+        # Расписания и время проверки всех источников сохраняются одной транзакцией
+        await self.db.update_source_schedules(schedules)
+        
+        stats = self.rss_handler.stats
+        logger.info(
+            f"RSS: запросов {stats['requests']}, без изменений (304) {stats['not_modified']}, "
+            f"загружено {stats['bytes_downloaded']} байт, сэкономлено {stats['bytes_saved']} байт, "
+            f"разборов {stats['parses']}, пропущено разборов {stats['parses_avoided']} "
+            f"(тело не изменилось {stats['unchanged_bodies']}), "
+            f"чтение остановлено на известных записях {stats['early_stops']}, обрезано {stats['truncated']}, "
+            f"новых записей {stats['entries_new']} из {stats['entries_total']}"
+        )
+        return all_news, validators
+
+    async def match_news(self, all_news: List[NewsRecord]) -> None:
+        """Подбирает новости по ключевым словам и ставит их в outbox пользователей."""
+        # Сортируем по дате публикации
+        all_news.sort(key=lambda x: x.published, reverse=True)
+        
+        # Сопоставляем каждую новость сразу со всеми пользователями по индексу ключевых слов
+        keyword_index = await self.db.get_keyword_index()
+        # Для каждой новости запоминаются найденные у пользователя слова, чтобы выделить их в сообщении
+        matches: Dict[int, List[Tuple[NewsRecord, FrozenSet[str]]]] = {}
+        with MATCH_DURATION.time():
+            for news in all_news:
+                for user_id, keywords in keyword_index.match(news.search_text, normalized=True).items():
+                    matches.setdefault(user_id, []).append((news, frozenset(keywords)))
+
+        # Каждая новость форматируется один раз за цикл, для пользователя добавляется только выделение слов
+        renderer = MessageRenderer(highlight=HIGHLIGHT_KEYWORDS)
+
+        # При большой очереди отправки дайджест получают все, чтобы сократить число запросов к Bot API
+        digest_all = False
+        if matches and DIGEST_BACKLOG_THRESHOLD is not None:
+            backlog = await self.db.count_pending_outbox()
+            digest_all = backlog >= DIGEST_BACKLOG_THRESHOLD
+            if digest_all:
+                logger.info(f"Очередь отправки {backlog} сообщений, новости цикла отправляются дайджестом")
+        digest_users = await self.db.get_digest_users() if matches and not digest_all else set()
+
+        if self.shards is not None:
+            # Сегмент пользователя мог перейти другому процессу во время цикла
+            matches = {user_id: news for user_id, news in matches.items() if self.shards.owns(user_id)}
+
+        def build_messages(user_id: int, unseen: List[str]) -> List[Tuple[str, str, Optional[datetime]]]:
+            # Вызывается базой для каждого пользователя с ещё не виденными им новостями
+            matched = {news.news_hash: (news, keywords) for news, keywords in matches[user_id]}
+            filtered_news = [matched[news_hash] for news_hash in unseen]
+            if digest_all or user_id in digest_users:
+                return self.pack_digest(renderer, filtered_news[:DIGEST_MAX_ITEMS])
+            return [
+                (news.news_hash, renderer.render(news, keywords), news.published)
+                for news, keywords in filtered_news[:10]  # Ограничиваем количество новостей
+            ]
+
+        # Проверка на повтор, отметка о просмотре и постановка в outbox выполняются
+        # для группы пользователей общими запросами и одной транзакцией
+        enqueued, unseen = await self.db.enqueue_news(
+            {user_id: [news.news_hash for news, _ in matched_news] for user_id, matched_news in matches.items()},
+            build_messages
+        )
+        matched_total = sum(len({news.news_hash for news, _ in matched_news}) for matched_news in matches.values())
+        DEDUP_RESULTS.labels(result='hit').inc(matched_total - unseen)
+        DEDUP_RESULTS.labels(result='miss').inc(unseen)
+
+        if enqueued and self.outbox is not None:
+            self.outbox.notify()
+
+    @staticmethod
+    def pack_digest(renderer: MessageRenderer, news: List[Tuple[NewsRecord, FrozenSet[str]]]
+                    ) -> List[Tuple[str, str, Optional[datetime]]]:
+        """Упаковывает новости в сообщения-дайджесты в формате outbox.
+
+        Сообщение дайджеста хранится с хешем своей первой новости и временем
+        публикации самой давней из вошедших в него, чтобы задержка доставки
+        не занижалась.
+        """
+        messages = []
+        start = 0
+        for text, count in pack_messages([renderer.render(item, keywords) for item, keywords in news]):
+            packed = [item for item, _ in news[start:start + count]]
+            start += count
+            messages.append((packed[0].news_hash, text, min(item.published for item in packed)))
+        return messages
+
+    def log_seen_prefilter_stats(self, prefilter) -> None:
+        """Выводит в лог память фильтра просмотренных новостей и долю ложных срабатываний."""
+        stats = prefilter.stats()
+        logger.info(
+            f"Фильтр просмотренных: пользователей {stats['users']}, отпечатков {stats['entries']}, "
+            f"память {stats['memory_bytes']} байт, ложных срабатываний "
+            f"{stats['observed_error_rate']:.2%} (ожидается {stats['estimated_error_rate']:.2%}), "
+            f"запросов к базе не понадобилось {stats['db_checks_avoided']} из {stats['lookups']}"
+        )
+
+    async def prune_seen_news(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Удаляет устаревшие отметки о просмотре и сообщает о состоянии фильтра."""
+        try:
+            deleted = await self.db.prune_seen_news(SEEN_RETENTION_DAYS)
+            if deleted:
+                logger.info(f"Удалено устаревших отметок о просмотре: {deleted}")
+            self.log_seen_prefilter_stats(await self.db.get_seen_prefilter())
+        except Exception as e:
+            logger.error(f"Ошибка при удалении устаревших отметок о просмотре: {e}")
+
+    async def prune_outbox(self, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Удаляет из outbox доставленные и неотправленные сообщения старше срока хранения."""
+        try:
+            deleted = await self.db.prune_outbox(OUTBOX_RETENTION_DAYS)
+            if deleted:
+                logger.info(f"Удалено отправленных сообщений из outbox: {deleted}")
+        except Exception as e:
+            logger.error(f"Ошибка при очистке outbox: {e}")
+
+    async def post_init(self, application: Application) -> None:
+        """Запускает фоновые службы после инициализации приложения."""
+        self.application = application
+        if NEWS_JOBS_ENABLED:
+            await self.start_news_services(application)
+        self.last_fetch_buffer.start()
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+        if self.webhook_server is not None:
+            await self.webhook_server.start(application)
+
+    async def start_news_services(self, application: Application) -> None:
+        """Запускает сегментирование, фильтр просмотренных новостей и отправку из outbox."""
+        if self.shards is not None:
+            # Сегменты нужны до загрузки фильтра: он строится только для своих пользователей
+            await self.shards.start()
+        # Фильтр просмотренных новостей загружается заранее, а не в первом цикле проверки
+        self.log_seen_prefilter_stats(await self.db.get_seen_prefilter())
+        self.delivery = DeliveryQueue(
+            application.bot,
+            global_rate=DELIVERY_GLOBAL_RATE,
+            private_interval=DELIVERY_PRIVATE_INTERVAL,
+            group_interval=DELIVERY_GROUP_INTERVAL,
+            workers=DELIVERY_WORKERS,
+            max_attempts=DELIVERY_MAX_ATTEMPTS
+        )
+        self.outbox = OutboxDispatcher(
+            self.db,
+            self.delivery,
+            batch_size=OUTBOX_BATCH_SIZE,
+            poll_interval=OUTBOX_POLL_INTERVAL,
+            lease_seconds=OUTBOX_LEASE_SECONDS,
+            max_attempts=OUTBOX_MAX_ATTEMPTS,
+            max_in_memory=OUTBOX_MAX_IN_MEMORY
+        )
+        if self.shards is not None:
+            self.delivery.set_global_rate(DELIVERY_GLOBAL_RATE / self.shards.workers)
+        self.delivery.start()
+        self.outbox.start()
+        SEND_QUEUE_DEPTH.set_function(lambda: self.delivery.pending)
+
+    async def on_shards_changed(self, shards: ShardCoordinator) -> None:
+        """Применяет новое распределение сегментов к отправке и получению обновлений."""
+        # Лимит Telegram на отправку общий для бота, поэтому делится между процессами
+        if self.delivery is not None:
+            self.delivery.set_global_rate(DELIVERY_GLOBAL_RATE / shards.workers)
+        updater = self.application.updater if self.application is not None else None
+        if updater is None or self.webhook_server is not None:
+            return
+        if shards.is_poller and not updater.running:
+            logger.info(f"Процесс {shards.worker_id} получает обновления Telegram")
+            await updater.start_polling(allowed_updates=Update.ALL_TYPES)
+        elif not shards.is_poller and updater.running:
+            logger.info(f"Процесс {shards.worker_id} больше не получает обновления Telegram")
+            await updater.stop()
+
+    async def shutdown(self, application: Application) -> None:
+        """Освобождает ресурсы при остановке приложения."""
+        if self.webhook_server is not None:
+            await self.webhook_server.stop()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+        if self.delivery is not None:
+            await self.delivery.stop()
+        if self.outbox is not None:
+            await self.outbox.stop()
+        if self.shards is not None:
+            await self.shards.stop()
+        await self.last_fetch_buffer.stop()
+        await self.rss_handler.close_session()
+        await self.binance_handler.close_session()
+        await self.transport.close()
+        await asyncio.get_running_loop().run_in_executor(None, self.db.close)
+        if self.parser_executor is not None:
+            self.parser_executor.shutdown(wait=False, cancel_futures=True)
 
 def main():
     """Запускает бота."""
@@ -602,7 +1042,15 @@ def main():
     bot = NewsBot()
     
     # Создаем приложение
-    application = Application.builder().token(TELEGRAM_TOKEN).build()
+    builder = (
+        Application.builder()
+        .token(TELEGRAM_TOKEN)
+        .post_init(bot.post_init)
+        .post_shutdown(bot.shutdown)
+    )
+    if TELEGRAM_API_BASE_URL:
+        builder = builder.base_url(TELEGRAM_API_BASE_URL)
+    application = builder.build()
     
     # Создаем ConversationHandler
     conv_handler = ConversationHandler(
@@ -634,6 +1082,7 @@ def main():
     application.add_handler(CommandHandler("sources", bot.sources_command))
     application.add_handler(CommandHandler("add_source", bot.add_source_command))
     application.add_handler(CommandHandler("remove_source", bot.remove_source_command))
+    application.add_handler(CommandHandler("digest", bot.digest_command))
     
     # Добавляем обработчик сообщений в группах
     application.add_handler(MessageHandler(
@@ -647,11 +1096,48 @@ def main():
         ChatMemberHandler.MY_CHAT_MEMBER
     ))
     
-    # Добавляем задачу проверки новостей
-    application.job_queue.run_repeating(bot.check_news, interval=300, first=10)
+    if NEWS_JOBS_ENABLED:
+        # Добавляем задачу проверки новостей: каждый источник опрашивается по своему расписанию
+        application.job_queue.run_repeating(bot.check_news, interval=POLL_TICK_INTERVAL, first=10)
+
+        # Отметки о просмотре хранятся ограниченное время
+        if SEEN_RETENTION_DAYS:
+            application.job_queue.run_repeating(bot.prune_seen_news, interval=SEEN_PRUNE_INTERVAL, first=60)
+
+        # Отправленные сообщения outbox хранятся ограниченное время
+        if OUTBOX_RETENTION_DAYS:
+            application.job_queue.run_repeating(bot.prune_outbox, interval=OUTBOX_PRUNE_INTERVAL, first=90)
     
     # Запускаем бота
-    application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+    if UPDATES_MODE == 'webhook' or bot.shards is not None:
+        # Обновления приходят на вебхук или их получает только процесс с арендой роли получателя
+        asyncio.run(run_worker(application))
+    else:
+        application.run_polling(allowed_updates=Update.ALL_TYPES, drop_pending_updates=True)
+
+async def run_worker(application: Application) -> None:
+    """Запускает приложение без постоянного получения обновлений до сигнала остановки.
+
+    Обновления принимает вебхук, либо получение обновлений включает и
+    выключает NewsBot.on_shards_changed в зависимости от того, владеет ли
+    процесс ролью получателя.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await application.initialize()
+    try:
+        await application.post_init(application)
+        await application.start()
+        await stop.wait()
+    finally:
+        if application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.post_shutdown(application)
+        await application.shutdown()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,292 @@
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Интервалы по умолчанию: от миллисекунд до минуты
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+
+class _Metric(ABC):
+    """Общая часть метрик: имя, описание и значения по наборам меток.
+
+    Метрики обновляются из цикла событий, поэтому блокировки не нужны,
+    а обновление стоит одну операцию со словарём.
+    """
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional['Registry'] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        (registry or REGISTRY).register(self)
+
+    def labels(self, **labels):
+        """Возвращает значение метрики для заданного набора меток."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _unlabelled(self):
+        return self.labels()
+
+    @abstractmethod
+    def _new_child(self):
+        """Создаёт значение метрики для нового набора меток."""
+
+    @abstractmethod
+    def _samples(self, key: Tuple[str, ...], child) -> Iterator[str]:
+        """Строки текстового формата Prometheus для одного набора меток."""
+
+    def collect(self) -> List[str]:
+        lines = [
+            f'# HELP {self.name} {_escape(self.documentation)}',
+            f'# TYPE {self.name} {self.type_name}',
+        ]
+        for key, child in list(self._children.items()):
+            lines.extend(self._samples(key, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ('value', 'function')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение будет вычисляться при каждом чтении метрики."""
+        self.function = function
+
+    def get(self) -> float:
+        return self.function() if self.function is not None else self.value
+
+
+class Counter(_Metric):
+    """Монотонно растущий счётчик."""
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+    def _samples(self, key, child):
+        yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}'
+
+
+class Gauge(_Metric):
+    """Значение, которое может как расти, так и уменьшаться."""
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float) -> None:
+        self._unlabelled().set(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._unlabelled().set_function(function)
+
+    def _samples(self, key, child):
+        yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.get())}'
+
+
+class _HistogramValue:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        """Измеряет длительность блока в секундах."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(_Metric):
+    """Распределение значений по интервалам с суммой и количеством наблюдений."""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional['Registry'] = None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+    def _samples(self, key, child):
+        labelnames = self.labelnames + ('le',)
+        cumulative = 0
+        for bound, count in zip(child.bounds, child.counts):
+            cumulative += count
+            labels = _format_labels(labelnames, key + (_format_value(bound),))
+            yield f'{self.name}_bucket{labels} {cumulative}'
+        yield f'{self.name}_bucket{_format_labels(labelnames, key + ("+Inf",))} {child.count}'
+        yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(child.sum)}'
+        yield f'{self.name}_count{_format_labels(self.labelnames, key)} {child.count}'
+
+
+class Registry:
+    """Набор метрик, отдаваемых в текстовом формате Prometheus."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class MetricsServer:
+    """HTTP-сервер, отдающий метрики по адресу /metrics."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9100, registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get('/metrics', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(
+            body=self.registry.render().encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+
+
+# Метрики конвейера новостей
+CYCLE_DURATION = Histogram(
+    'news_cycle_duration_seconds', 'Длительность цикла проверки новостей',
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+FETCH_DURATION = Histogram(
+    'news_fetch_duration_seconds', 'Время загрузки источника', ['source']
+)
+FETCH_RESPONSES = Counter(
+    'news_fetch_responses_total', 'Ответы источников по статусу (error - ошибка или таймаут)',
+    ['source', 'status']
+)
+FETCH_BYTES = Counter(
+    'news_fetch_bytes_total', 'Загружено байт от источника', ['source']
+)
+FETCH_BYTES_SAVED = Counter(
+    'news_fetch_bytes_saved_total', 'Не загружено байт благодаря ответу 304 (по размеру прошлого ответа)',
+    ['source']
+)
+PARSES_AVOIDED = Counter(
+    'news_parses_avoided_total',
+    'Пропущенные разборы каналов: not_modified - ответ 304, unchanged_body - тело не изменилось, '
+    'known_entries - прочитаны только известные записи',
+    ['source', 'reason']
+)
+PARSE_DURATION = Histogram(
+    'news_parse_duration_seconds', 'Время разбора RSS-канала'
+)
+MATCH_DURATION = Histogram(
+    'news_match_duration_seconds', 'Время сопоставления новостей цикла с ключевыми словами'
+)
+DEDUP_RESULTS = Counter(
+    'news_dedup_total', 'Проверки новостей на повтор: hit - уже отправлялась, miss - новая',
+    ['result']
+)
+SEND_QUEUE_DEPTH = Gauge(
+    'telegram_send_queue_depth', 'Сообщений в очереди отправки в памяти'
+)
+SEND_DURATION = Histogram(
+    'telegram_send_duration_seconds', 'Время вызова sendMessage'
+)
+SEND_RESULTS = Counter(
+    'telegram_send_total', 'Результаты отправки: sent, retry или failed', ['result']
+)
+DELIVERY_FRESHNESS = Histogram(
+    'news_delivery_freshness_seconds', 'Время от публикации новости до её доставки',
+    buckets=(5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 21600, 86400)
+)
+NEAR_DUPLICATES = Counter(
+    'news_near_duplicates_total', 'Отброшенные копии новостей: same_link или similar', ['reason']
+)
+WEBHOOK_UPDATES = Counter(
+    'telegram_webhook_updates_total', 'Обновления вебхука: accepted, forbidden или invalid', ['result']
+)
@@ -0,0 +1,203 @@
+import hashlib
+import random
+import re
+import time
+from collections import deque
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from metrics import NEAR_DUPLICATES
+from news_record import NewsRecord
+
+# Параметры ссылок, которые добавляют рассылки и счётчики и не меняют страницу
+TRACKING_PARAMS = {
+    'fbclid', 'gclid', 'yclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid',
+    'ref', 'ref_src', 'referrer', 'source', 'cmpid', 'campaign', 'igshid', '_ga', 'amp',
+}
+
+_WORD_RE = re.compile(r'\w+')
+
+# Служебные слова почти не различают новости, но завышают сходство
+STOP_WORDS = set(
+    'a an the and or of to in on for at by with from as is are was were be been it its this that '
+    'has have had will new news after over into up out about more than says said '
+    'и в во на с со по к из за от до для о об не что как это его ее их а но же ли бы'.split()
+)
+
+# MinHash: число хеш-функций и строк в полосе для поиска кандидатов (LSH)
+MINHASH_PERMUTATIONS = 16
+MINHASH_ROWS_PER_BAND = 2
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(_MERSENNE_PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+# Заголовки с меньшим числом слов сравниваются только по ссылке: сходство на них ненадёжно
+MIN_TOKENS = 3
+
+
+def canonical_link(link: str) -> str:
+    """Приводит ссылку к виду, одинаковому для копий одной страницы.
+
+    Отбрасываются схема, www., фрагмент, завершающая косая черта, суффикс
+    /amp и параметры отслеживания (utm_* и TRACKING_PARAMS), остальные
+    параметры сортируются.
+    """
+    parts = urlsplit(link.strip())
+    host = (parts.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f'{host}:{parts.port}'
+    path = parts.path.rstrip('/')
+    if path.endswith('/amp'):
+        path = path[:-4]
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    return f"{host}{path}{'?' + urlencode(query) if query else ''}"
+
+
+def title_tokens(title: str) -> FrozenSet[str]:
+    """Значимые слова заголовка; окончание множественного числа отбрасывается (ETFs -> etf)."""
+    tokens = set()
+    for word in _WORD_RE.findall(title.lower()):
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.add(word)
+    return frozenset(tokens)
+
+
+def minhash(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    """Сигнатура MinHash: доля совпадающих элементов оценивает сходство Жаккара множеств."""
+    hashes = [
+        int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'big')
+        for token in tokens
+    ]
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+def same_story(first: FrozenSet[str], second: FrozenSet[str], threshold: float) -> bool:
+    """Похожи ли заголовки настолько, чтобы считать их одной новостью.
+
+    Заголовки с разными числами (выпуски, суммы, версии) считаются
+    разными новостями при любом сходстве остальных слов.
+    """
+    if {token for token in first ^ second if token.isdigit()}:
+        return False
+    return jaccard(first, second) >= threshold
+
+
+class NearDuplicateFilter:
+    """Пропускает из каждой группы копий одной новости только первую.
+
+    Копией считается новость с той же канонической ссылкой или с заголовком,
+    значимые слова которого совпадают с уже пропущенным не меньше чем на
+    threshold по мере Жаккара при одинаковых числах. Новости помнятся
+    window секунд, поэтому копия, пришедшая из другого источника в
+    следующих циклах, тоже отсекается. Уже пропущенная запись с тем же
+    хешем (её перечитывают при передаче сегментов) копией не считается:
+    повторную отправку предотвращают отметки о просмотре.
+
+    Кандидаты ищутся по полосам сигнатуры MinHash: заголовки с большим
+    сходством почти наверняка совпадают хотя бы в одной полосе, и точное
+    сходство считается только для них, а не для всех новостей окна.
+
+    Описания не сравниваются: каждое издание пишет своё, и сходство копий
+    по ним было бы ниже порога. Ключевые слова ищутся только в пропущенной
+    записи, поэтому слово из описания отброшенной копии совпадения не даст.
+    """
+
+    def __init__(self, window: float = 6 * 3600, threshold: float = 0.7):
+        self.window = window
+        self.threshold = threshold
+        self._entries: Deque[Tuple[float, int, str, FrozenSet[str], List[Tuple]]] = deque()
+        self._fingerprints: Dict[int, int] = {}
+        self._links: Dict[str, int] = {}
+        self._bands: Dict[Tuple, List[FrozenSet[str]]] = {}
+        self.stats = {'kept': 0, 'same_link': 0, 'similar': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _band_keys(tokens: FrozenSet[str]) -> List[Tuple]:
+        signature = minhash(tokens)
+        return [
+            (start, signature[start:start + MINHASH_ROWS_PER_BAND])
+            for start in range(0, MINHASH_PERMUTATIONS, MINHASH_ROWS_PER_BAND)
+        ]
+
+    def _find_similar(self, tokens: FrozenSet[str], band_keys: List[Tuple]) -> bool:
+        for key in band_keys:
+            for other in self._bands.get(key, ()):
+                if same_story(tokens, other, self.threshold):
+                    return True
+        return False
+
+    @staticmethod
+    def _release(counts: Dict, key) -> None:
+        counts[key] -= 1
+        if not counts[key]:
+            del counts[key]
+
+    def _remember(self, now: float, fingerprint: int, link: str, tokens: FrozenSet[str],
+                  band_keys: List[Tuple]) -> None:
+        self._entries.append((now, fingerprint, link, tokens, band_keys))
+        self._fingerprints[fingerprint] = self._fingerprints.get(fingerprint, 0) + 1
+        if link:
+            self._links[link] = self._links.get(link, 0) + 1
+        for key in band_keys:
+            self._bands.setdefault(key, []).append(tokens)
+
+    def _expire(self, now: float) -> None:
+        while self._entries and self._entries[0][0] < now - self.window:
+            _, fingerprint, link, tokens, band_keys = self._entries.popleft()
+            self._release(self._fingerprints, fingerprint)
+            if link:
+                self._release(self._links, link)
+            for key in band_keys:
+                entries = self._bands[key]
+                entries.remove(tokens)
+                if not entries:
+                    del self._bands[key]
+
+    def filter(self, news: List[NewsRecord], now: Optional[float] = None) -> List[NewsRecord]:
+        """Возвращает новости без копий друг друга и новостей, пропущенных за последние window секунд."""
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+        unique = []
+        for item in news:
+            if item.fingerprint in self._fingerprints:
+                unique.append(item)
+                continue
+            link = canonical_link(item.link) if item.link else ''
+            if link and link in self._links:
+                self.stats['same_link'] += 1
+                NEAR_DUPLICATES.labels(reason='same_link').inc()
+                continue
+            tokens = title_tokens(item.title)
+            band_keys = self._band_keys(tokens) if len(tokens) >= MIN_TOKENS else []
+            if band_keys and self._find_similar(tokens, band_keys):
+                self.stats['similar'] += 1
+                NEAR_DUPLICATES.labels(reason='similar').inc()
+                continue
+            self._remember(now, item.fingerprint, link, tokens, band_keys)
+            unique.append(item)
+        self.stats['kept'] += len(unique)
+        return unique
@@ -0,0 +1,27 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from seen_filter import fingerprint64
+
+
+@dataclass(frozen=True, slots=True)
+class NewsRecord:
+    """Новость из любого источника, общая для всех этапов обработки.
+
+    Текст для поиска ключевых слов (заголовок и описание в нижнем регистре)
+    и 64-битный отпечаток хеша вычисляются один раз при создании записи,
+    а не для каждого пользователя при рассылке. Запись неизменяема, поэтому
+    одну и ту же можно передавать всем подписчикам.
+    """
+    title: str
+    link: str
+    description: str
+    published: datetime
+    news_hash: str
+    source: str = 'rss'
+    search_text: str = field(init=False, repr=False, compare=False)
+    fingerprint: int = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'search_text', f"{self.title} {self.description}".lower())
+        object.__setattr__(self, 'fingerprint', fingerprint64(self.news_hash))
@@ -1,30 +1,35 @@
-import aiohttp
 import hashlib
-from typing import List, Dict, Optional
-from datetime import datetime
-import json
+from typing import List, Optional
+from datetime import datetime, timezone
+
+from keyword_index import KeywordMatcher
+from news_record import NewsRecord
+from news_sources.transport import AiohttpTransport, HttpTransport
 
 class BinanceHandler:
-    def __init__(self, api_key: Optional[str] = None, api_secret: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, api_secret: Optional[str] = None,
+                 transport: Optional[HttpTransport] = None):
         self.api_key = api_key
         self.api_secret = api_secret
-        self.session = None
+        # Общий транспорт закрывает его владелец, собственный - сам обработчик
+        self.transport = transport
+        self._owns_transport = transport is None
         self.base_url = "https://www.binance.com/bapi/composite/v1/public/cms"
 
     async def init_session(self):
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        if self.transport is None:
+            self.transport = AiohttpTransport()
 
     async def close_session(self):
-        if self.session:
-            await self.session.close()
-            self.session = None
+        if self.transport is not None and self._owns_transport:
+            await self.transport.close()
+            self.transport = None
 
     def generate_news_hash(self, title: str, code: str) -> str:
         """Генерирует уникальный хеш для новости."""
         return hashlib.md5(f"{title}{code}".encode()).hexdigest()
 
-    async def get_announcements(self, limit: int = 50) -> List[Dict]:
+    async def get_announcements(self, limit: int = 50) -> List[NewsRecord]:
         """Получает последние объявления с Binance."""
         try:
             await self.init_session()
@@ -35,50 +40,53 @@ class BinanceHandler:
                 "pageNo": "1"
             }
             
-            async with self.session.post(
+            response = await self.transport.request(
+                'POST',
                 f"{self.base_url}/announcement/query",
-                json=params
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    if data.get("code") == "000000":
-                        announcements = []
-                        for item in data.get("data", {}).get("catalogs", []):
-                            try:
-                                title = item.get("title", "")
-                                code = item.get("code", "")
-                                description = item.get("description", "")
-                                published = datetime.fromtimestamp(item.get("releaseDate", 0) / 1000)
-                                
-                                news_hash = self.generate_news_hash(title, code)
-                                
-                                announcements.append({
-                                    "title": title,
-                                    "link": f"https://www.binance.com/en/support/announcement/{code}",
-                                    "description": description[:200] + "..." if len(description) > 200 else description,
-                                    "published": published,
-                                    "hash": news_hash,
-                                    "source": "binance"
-                                })
-                            except Exception as e:
-                                print(f"Ошибка при обработке объявления Binance: {e}")
-                                continue
-                        
-                        return announcements
-                return []
+                json_body=params
+            )
+            if response.status == 200:
+                data = response.json()
+                if data.get("code") == "000000":
+                    announcements = []
+                    for item in data.get("data", {}).get("catalogs", []):
+                        try:
+                            title = item.get("title", "")
+                            code = item.get("code", "")
+                            description = item.get("description", "")
+                            # Время публикации хранится в UTC без часового пояса, как у RSS
+                            published = datetime.fromtimestamp(
+                                item.get("releaseDate", 0) / 1000, timezone.utc
+                            ).replace(tzinfo=None)
+
+                            news_hash = self.generate_news_hash(title, code)
+
+                            announcements.append(NewsRecord(
+                                title=title,
+                                link=f"https://www.binance.com/en/support/announcement/{code}",
+                                description=description[:200] + "..." if len(description) > 200 else description,
+                                published=published,
+                                news_hash=news_hash,
+                                source="binance"
+                            ))
+                        except Exception as e:
+                            print(f"Ошибка при обработке объявления Binance: {e}")
+                            continue
+
+                    return announcements
+            return []
         except Exception as e:
             print(f"Ошибка при получении объявлений Binance: {e}")
             return []
 
-    def filter_announcements_by_keywords(self, announcements: List[Dict], keywords: List[str]) -> List[Dict]:
+    def filter_announcements_by_keywords(self, announcements: List[NewsRecord],
+                                         keywords: List[str]) -> List[NewsRecord]:
         """Фильтрует объявления по ключевым словам."""
         if not keywords:
             return announcements
 
-        filtered_announcements = []
-        for announcement in announcements:
-            text = f"{announcement['title']} {announcement['description']}".lower()
-            if any(keyword.lower() in text for keyword in keywords):
-                filtered_announcements.append(announcement)
-
-        return filtered_announcements 
\ No newline at end of file
+        matcher = KeywordMatcher(keywords)
+        return [
+            announcement for announcement in announcements
+            if matcher.contains_any(announcement.search_text, normalized=True)
+        ]
@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from typing import List, Optional
+from xml.parsers import expat
+
+# Элементы записей RSS 2.0/1.0 и Atom (без учёта префикса пространства имён)
+ENTRY_TAGS = {'item', 'entry'}
+TITLE_TAGS = {'title', 'atom:title'}
+LINK_TAGS = {'link', 'atom:link'}
+
+_UTF16_BOMS = (b'\xff\xfe', b'\xfe\xff')
+
+
+@dataclass
+class ScannedEntry:
+    """Запись канала, найденная при потоковом чтении.
+
+    end - смещение конца записи в теле, closing - закрывающие теги
+    родительских элементов, превращающие начало тела до end в полный документ.
+    """
+    title: str
+    link: str
+    end: int
+    closing: bytes
+
+
+class FeedScanner:
+    """Находит записи RSS/Atom в теле, поступающем порциями.
+
+    Для каждой записи извлекаются только заголовок и ссылка, по которым
+    считается её хеш, поэтому сканирование намного дешевле полного разбора:
+    по нему решают, где остановить чтение, а разбирает feedparser только
+    начало тела (prefix). Если тело не является корректным XML, сканер
+    помечается failed и дальше только накапливает тело.
+    """
+
+    def __init__(self, encoding: Optional[str] = None):
+        # Кодировка из заголовка Content-Type важнее объявленной в документе
+        self._parser = expat.ParserCreate(encoding)
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+        self.buffer = bytearray()
+        self.failed = False
+        self._stack: List[str] = []
+        self._entry_depth: Optional[int] = None
+        self._field: Optional[str] = None
+        self._text: List[str] = []
+        self._title: Optional[str] = None
+        self._link: Optional[str] = None
+        self._completed: List[ScannedEntry] = []
+
+    def feed(self, chunk: bytes) -> List[ScannedEntry]:
+        """Добавляет порцию тела и возвращает записи, закончившиеся в ней."""
+        if not self.buffer and chunk.startswith(_UTF16_BOMS):
+            # Закрывающие теги добавляются в однобайтовой записи
+            self.failed = True
+        self.buffer += chunk
+        if self.failed:
+            return []
+        try:
+            self._parser.Parse(chunk, False)
+        except expat.ExpatError:
+            self.failed = True
+        completed, self._completed = self._completed, []
+        return completed
+
+    def prefix(self, entry: ScannedEntry) -> bytes:
+        """Документ из начала тела до конца entry включительно."""
+        return bytes(self.buffer[:entry.end]) + entry.closing
+
+    def _start(self, name: str, attrs: dict) -> None:
+        self._stack.append(name)
+        if self._entry_depth is None:
+            if name.rpartition(':')[2] in ENTRY_TAGS:
+                self._entry_depth = len(self._stack)
+                self._title = self._link = None
+            return
+        if len(self._stack) != self._entry_depth + 1:
+            return
+        if name in TITLE_TAGS and self._title is None:
+            self._field = 'title'
+            self._text = []
+        elif name in LINK_TAGS and self._link is None:
+            if 'href' in attrs:
+                # Atom: ссылка на саму страницу записи
+                if attrs.get('rel', 'alternate') == 'alternate':
+                    self._link = attrs['href'].strip()
+            else:
+                self._field = 'link'
+                self._text = []
+
+    def _data(self, data: str) -> None:
+        if self._field is not None:
+            self._text.append(data)
+
+    def _end(self, name: str) -> None:
+        depth = len(self._stack)
+        self._stack.pop()
+        if self._entry_depth is None:
+            return
+        if self._field is not None and depth == self._entry_depth + 1:
+            value = ''.join(self._text).strip()
+            if self._field == 'title':
+                self._title = value
+            else:
+                self._link = value
+            self._field = None
+        elif depth == self._entry_depth:
+            self._entry_depth = None
+            end = self.buffer.index(b'>', self._parser.CurrentByteIndex) + 1
+            self._completed.append(ScannedEntry(
+                title=self._title or '',
+                link=self._link or '',
+                end=end,
+                closing=''.join(f'</{parent}>' for parent in reversed(self._stack)).encode('ascii', 'replace')
+            ))
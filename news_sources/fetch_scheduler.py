@@ -0,0 +1,83 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+
+@dataclass
+class FetchJob:
+    """Задача загрузки одного источника."""
+    key: Any
+    url: str
+    fetch: Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class FetchResult:
+    """Результат выполнения задачи загрузки."""
+    key: Any
+    url: str
+    value: Any = None
+    error: Optional[BaseException] = None
+    duration: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class FetchScheduler:
+    """Параллельно выполняет загрузку источников с ограничениями.
+
+    Общее число одновременных запросов ограничено ``max_concurrency``,
+    число запросов к одному хосту - ``per_host_limit``. Каждая задача
+    прерывается по истечении ``timeout`` секунд.
+    """
+
+    def __init__(self, max_concurrency: int = 50, per_host_limit: int = 4, timeout: float = 30.0):
+        self.max_concurrency = max_concurrency
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self._global_limit: Optional[asyncio.Semaphore] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).hostname or url
+        semaphore = self._host_limits.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_limits[host] = semaphore
+        return semaphore
+
+    async def _run_job(self, job: FetchJob) -> FetchResult:
+        loop = asyncio.get_running_loop()
+        # Сначала место у хоста, затем общее: задача, ждущая занятый хост,
+        # не должна держать общий слот, нужный запросам к другим хостам
+        async with self._host_semaphore(job.url):
+            async with self._global_limit:
+                started = loop.time()
+                try:
+                    value = await asyncio.wait_for(job.fetch(), timeout=self.timeout)
+                    return FetchResult(job.key, job.url, value=value, duration=loop.time() - started)
+                except Exception as e:
+                    # asyncio.TimeoutError тоже попадает сюда
+                    return FetchResult(job.key, job.url, error=e, duration=loop.time() - started)
+
+    async def run(self, jobs: List[FetchJob]) -> List[FetchResult]:
+        """Выполняет все задачи параллельно и возвращает результаты в исходном порядке.
+
+        При отмене вызывающей корутины отменяются все незавершённые задачи.
+        """
+        if not jobs:
+            return []
+        if self._global_limit is None:
+            self._global_limit = asyncio.Semaphore(self.max_concurrency)
+
+        tasks = [asyncio.create_task(self._run_job(job)) for job in jobs]
+        try:
+            return await asyncio.gather(*tasks)
+        except asyncio.CancelledError:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
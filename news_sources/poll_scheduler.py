@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+from typing import Tuple
+
+
+class AdaptivePollPolicy:
+    """Подбирает интервал опроса источника по частоте его публикаций.
+
+    Если с прошлого опроса появились новые записи, интервал сокращается,
+    если нет - плавно растёт до max_interval. При ошибках интервал не
+    меняется, но следующий опрос откладывается с экспоненциальной задержкой.
+    """
+
+    def __init__(self, default_interval: int = 300, min_interval: int = 60,
+                 max_interval: int = 3600, max_backoff: int = 6 * 3600,
+                 speedup: float = 0.5, slowdown: float = 1.5):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.speedup = speedup
+        self.slowdown = slowdown
+
+    def on_success(self, interval: int, new_items: int, now: datetime) -> Tuple[int, datetime]:
+        """Возвращает новый интервал и время следующего опроса после успешной загрузки."""
+        interval = interval or self.default_interval
+        if new_items:
+            interval = max(self.min_interval, int(interval * self.speedup))
+        else:
+            interval = min(self.max_interval, int(interval * self.slowdown))
+        return interval, now + timedelta(seconds=interval)
+
+    def on_failure(self, interval: int, failure_count: int, now: datetime) -> datetime:
+        """Возвращает время следующего опроса после failure_count ошибок подряд."""
+        interval = interval or self.default_interval
+        delay = min(self.max_backoff, interval * 2 ** max(0, failure_count - 1))
+        return now + timedelta(seconds=delay)
@@ -1,100 +1,390 @@
 import feedparser
 import hashlib
-from typing import List, Dict, Optional
+import logging
+from dataclasses import dataclass, field
+from typing import AbstractSet, Iterable, List, Optional, Tuple, Union
 from datetime import datetime
-import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from keyword_index import KeywordMatcher
+from metrics import FETCH_BYTES_SAVED, PARSE_DURATION, PARSES_AVOIDED
+from news_record import NewsRecord
+from news_sources.feed_stream import FeedScanner
+from news_sources.transport import AiohttpTransport, HttpTransport
+from utils import html_preview
+
+logger = logging.getLogger(__name__)
+
+# Максимальный размер читаемого тела канала (в байтах)
+MAX_FEED_BYTES = 5 * 1024 * 1024
+
+# Чтение канала прекращается после стольких известных записей подряд:
+# одна известная запись может оказаться закреплённой выше новых
+KNOWN_ENTRIES_TO_STOP = 3
+
+
+def is_newest_first(items: List[NewsRecord]) -> bool:
+    """Проверяет, что записи канала перечислены от новых к старым.
+
+    Записи без даты получают при разборе текущее время и идут по
+    возрастанию, поэтому такие каналы порядка не подтверждают.
+    """
+    if len(items) < 2:
+        return False
+    dates = [item.published for item in items]
+    return dates[0] > dates[-1] and all(a >= b for a, b in zip(dates, dates[1:]))
+
+
+def generate_news_hash(title: str, link: str) -> str:
+    """Генерирует уникальный хеш для новости."""
+    return hashlib.md5(f"{title}{link}".encode()).hexdigest()
+
+
+def fingerprint_body(content: Union[str, bytes]) -> str:
+    """Возвращает отпечаток тела ответа для поиска неизменившихся каналов."""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha1(content).hexdigest()
+
+
+def parse_feed_records(content: Union[str, bytes]) -> List[Tuple[str, str, str, datetime, str]]:
+    """Разбирает RSS-канал в компактные записи (title, link, description, published, hash).
+
+    Функция не зависит от состояния обработчика, поэтому может выполняться
+    в отдельном процессе.
+    """
+    feed = feedparser.parse(content)
+    records = []
+
+    for entry in feed.entries:
+        try:
+            title = entry.get('title', '')
+            link = entry.get('link', '')
+            description = entry.get('description', '')
+
+            # Очищаем описание от HTML-тегов, разбирая только начало для превью
+            clean_description = html_preview(description, 200)
+
+            # Получаем дату публикации
+            published = entry.get('published_parsed', None)
+            if published:
+                published_date = datetime(*published[:6])
+            else:
+                published_date = datetime.now()
+
+            records.append((
+                title,
+                link,
+                clean_description,
+                published_date,
+                generate_news_hash(title, link)
+            ))
+        except Exception as e:
+            print(f"Ошибка при обработке новости: {e}")
+            continue
+
+    return records
+
+
+def create_parser_executor(kind: str, workers: int) -> Optional[Executor]:
+    """Создаёт пул для разбора каналов: 'process', 'thread' или 'inline' (без пула)."""
+    if kind == 'process':
+        return ProcessPoolExecutor(max_workers=workers)
+    if kind == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='parser')
+    return None
+
+
+@dataclass
+class FeedResponse:
+    """Ответ RSS-канала вместе с HTTP-валидаторами."""
+    status: int
+    # Байты передаются в feedparser как есть, если сервер не указал кодировку
+    content: Union[str, bytes, None] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_length: Optional[int] = None
+    # False - тело прочитано не до конца, а content содержит только его начало
+    complete: bool = True
+    # Чтение остановлено на известных записях, не встретив новых
+    known_only: bool = False
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == 304
+
+
+@dataclass
+class FeedFetchResult:
+    """Результат загрузки одного RSS-канала.
+
+    В news попадают только записи, которых не было в предыдущем ответе;
+    entry_hashes содержит хеши всех записей канала и служит отметкой для
+    следующей загрузки.
+    """
+    news: List[NewsRecord] = field(default_factory=list)
+    not_modified: bool = False
+    failed: bool = False
+    status: Optional[int] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_length: Optional[int] = None
+    body_hash: Optional[str] = None
+    entry_hashes: List[str] = field(default_factory=list)
+    # Порядок записей, определённый при последнем полном чтении канала
+    newest_first: Optional[bool] = None
+
 
 class RSSHandler:
-    def __init__(self):
-        self.session = None
+    def __init__(self, parser_executor: Optional[Executor] = None,
+                 transport: Optional[HttpTransport] = None,
+                 max_feed_bytes: int = MAX_FEED_BYTES):
+        # Общий транспорт закрывает его владелец, собственный - сам обработчик
+        self.transport = transport
+        self._owns_transport = transport is None
+        self.parser_executor = parser_executor
+        self.max_feed_bytes = max_feed_bytes
+        # Статистика условных запросов
+        self.stats = {
+            'requests': 0,
+            'not_modified': 0,
+            'bytes_downloaded': 0,
+            'bytes_saved': 0,
+            'parses': 0,
+            'parses_avoided': 0,
+            'unchanged_bodies': 0,
+            'entries_total': 0,
+            'entries_new': 0,
+            'early_stops': 0,
+            'truncated': 0,
+        }
 
     async def init_session(self):
-        if not self.session:
-            self.session = aiohttp.ClientSession()
+        if self.transport is None:
+            self.transport = AiohttpTransport()
 
     async def close_session(self):
-        if self.session:
-            await self.session.close()
-            self.session = None
+        if self.transport is not None and self._owns_transport:
+            await self.transport.close()
+            self.transport = None
 
     def generate_news_hash(self, title: str, link: str) -> str:
         """Генерирует уникальный хеш для новости."""
-        return hashlib.md5(f"{title}{link}".encode()).hexdigest()
+        return generate_news_hash(title, link)
+
+    async def fetch_rss(self, url: str, etag: Optional[str] = None,
+                        last_modified: Optional[str] = None,
+                        known_hashes: AbstractSet[str] = frozenset(),
+                        early_stop: bool = False) -> Optional[FeedResponse]:
+        """Асинхронно получает содержимое RSS-канала.
+
+        Если переданы валидаторы предыдущего ответа, запрос выполняется
+        условно, и при неизменном канале сервер отвечает 304 без тела.
+
+        Тело читается порциями, и записи в нём находятся по мере загрузки.
+        Для каналов, перечисляющих записи от новых к старым (early_stop),
+        чтение прекращается, встретив KNOWN_ENTRIES_TO_STOP записей подряд
+        из known_hashes, а в content остаётся только начало канала до
+        последней новой записи: объём загрузки и разбора зависит от числа
+        новых записей, а не от размера канала. В каналах с обратным порядком
+        новые записи идут после известных, поэтому они читаются целиком.
+        Больше max_feed_bytes не читается; от обрезанного тела остаются
+        записи, полученные целиком.
+        """
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
 
-    async def fetch_rss(self, url: str) -> Optional[str]:
-        """Асинхронно получает содержимое RSS-канала."""
         try:
             await self.init_session()
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    return await response.text()
-                return None
+            async with self.transport.stream('GET', url, headers=headers) as response:
+                self.stats['requests'] += 1
+                if response.status == 304:
+                    self.stats['not_modified'] += 1
+                    return FeedResponse(status=304, etag=etag, last_modified=last_modified)
+                if response.status != 200:
+                    return None
+
+                charset = response.charset
+                response_etag = response.headers.get('ETag')
+                response_last_modified = response.headers.get('Last-Modified')
+                scanner = FeedScanner(charset)
+                stop_after = min(KNOWN_ENTRIES_TO_STOP, len(known_hashes)) if early_stop else 0
+                known_run = 0
+                last_entry = last_new = None
+                stopped = truncated = False
+                async for chunk in response.chunks:
+                    if len(scanner.buffer) + len(chunk) > self.max_feed_bytes:
+                        chunk = chunk[:self.max_feed_bytes - len(scanner.buffer)]
+                        truncated = True
+                    for entry in scanner.feed(chunk):
+                        last_entry = entry
+                        if generate_news_hash(entry.title, entry.link) not in known_hashes:
+                            last_new = entry
+                            known_run = 0
+                            continue
+                        known_run += 1
+                        if stop_after and known_run >= stop_after:
+                            stopped = True
+                            break
+                    if stopped or truncated:
+                        break
+                size = len(scanner.buffer)
+
+            self.stats['bytes_downloaded'] += size
+            if truncated:
+                self.stats['truncated'] += 1
+                logger.warning(f"RSS-канал {url} больше {self.max_feed_bytes} байт, прочитано только начало")
+
+            if stopped or (truncated and not scanner.failed):
+                if last_new is None:
+                    # Новых записей нет, разбирать нечего
+                    content = None
+                else:
+                    content = scanner.prefix(last_new if stopped else last_entry)
+            else:
+                # Тело прочитано целиком или не разбирается сканером: разбор как раньше
+                content = bytes(scanner.buffer)
+            if stopped:
+                self.stats['early_stops'] += 1
+            if content is not None and charset:
+                # Без charset в заголовке кодировку определит feedparser по XML-декларации
+                content = content.decode(charset, errors='replace')
+            return FeedResponse(
+                status=200,
+                content=content,
+                etag=response_etag,
+                last_modified=response_last_modified,
+                content_length=size,
+                complete=not (stopped or truncated),
+                known_only=content is None
+            )
         except Exception as e:
             print(f"Ошибка при получении RSS с {url}: {e}")
             return None
 
-    async def parse_feed(self, content: str) -> List[Dict]:
-        """Парсит содержимое RSS-канала."""
-        feed = feedparser.parse(content)
-        news_items = []
-
-        for entry in feed.entries:
-            try:
-                title = entry.get('title', '')
-                link = entry.get('link', '')
-                description = entry.get('description', '')
-                
-                # Очищаем описание от HTML-тегов
-                soup = BeautifulSoup(description, 'html.parser')
-                clean_description = soup.get_text()
-
-                # Получаем дату публикации
-                published = entry.get('published_parsed', None)
-                if published:
-                    published_date = datetime(*published[:6])
-                else:
-                    published_date = datetime.now()
-
-                news_hash = self.generate_news_hash(title, link)
-                
-                news_items.append({
-                    'title': title,
-                    'link': link,
-                    'description': clean_description[:200] + '...' if len(clean_description) > 200 else clean_description,
-                    'published': published_date,
-                    'hash': news_hash
-                })
-            except Exception as e:
-                print(f"Ошибка при обработке новости: {e}")
-                continue
-
-        return news_items
-
-    async def get_news(self, urls: List[str]) -> List[Dict]:
+    async def fetch_source(self, url: str, etag: Optional[str] = None,
+                           last_modified: Optional[str] = None,
+                           content_length: Optional[int] = None,
+                           body_hash: Optional[str] = None,
+                           known_hashes: Optional[Iterable[str]] = None,
+                           newest_first: Optional[bool] = None) -> FeedFetchResult:
+        """Загружает RSS-канал с учётом сохранённых валидаторов и отметок.
+
+        При ответе 304 разбор канала пропускается, а размер предыдущего
+        ответа учитывается как сэкономленный трафик. То же происходит, если
+        сервер не поддерживает валидаторы, но тело ответа не изменилось или
+        его чтение остановлено на известных записях, не встретив новых.
+        Из разобранного канала возвращаются только записи, хешей которых
+        нет среди known_hashes.
+
+        Чтение останавливается на известных записях, только если по
+        предыдущему полному чтению канал признан упорядоченным от новых
+        к старым (newest_first); после каждого полного чтения порядок
+        определяется заново.
+        """
+        known_list = list(known_hashes or [])
+        known = set(known_list)
+        unchanged = FeedFetchResult(
+            not_modified=True,
+            etag=etag,
+            last_modified=last_modified,
+            content_length=content_length,
+            body_hash=body_hash,
+            entry_hashes=known_list,
+            newest_first=newest_first
+        )
+
+        response = await self.fetch_rss(url, etag, last_modified, known, early_stop=bool(newest_first))
+        if response is None:
+            unchanged.not_modified = False
+            unchanged.failed = True
+            return unchanged
+
+        unchanged.status = response.status
+        if response.not_modified:
+            self.stats['parses_avoided'] += 1
+            self.stats['bytes_saved'] += content_length or 0
+            PARSES_AVOIDED.labels(source=url, reason='not_modified').inc()
+            FETCH_BYTES_SAVED.labels(source=url).inc(content_length or 0)
+            return unchanged
+
+        # Отпечаток имеет смысл только для тела, прочитанного целиком
+        new_body_hash = fingerprint_body(response.content) if response.complete else None
+        if response.known_only or (body_hash is not None and new_body_hash == body_hash):
+            self.stats['parses_avoided'] += 1
+            if response.complete:
+                self.stats['unchanged_bodies'] += 1
+            PARSES_AVOIDED.labels(
+                source=url, reason='unchanged_body' if response.complete else 'known_entries'
+            ).inc()
+            unchanged.etag = response.etag
+            unchanged.last_modified = response.last_modified
+            return unchanged
+
+        news_items = await self.parse_feed(response.content)
+        new_items = [item for item in news_items if item.news_hash not in known]
+        self.stats['entries_total'] += len(news_items)
+        self.stats['entries_new'] += len(new_items)
+        entry_hashes = [item.news_hash for item in news_items]
+        if response.complete:
+            newest_first = is_newest_first(news_items)
+        else:
+            # Непрочитанная часть канала состоит из уже известных записей
+            seen = set(entry_hashes)
+            entry_hashes.extend(news_hash for news_hash in known_list if news_hash not in seen)
+            del entry_hashes[max(len(known_list), len(news_items)):]
+        return FeedFetchResult(
+            news=new_items,
+            status=response.status,
+            etag=response.etag,
+            last_modified=response.last_modified,
+            content_length=response.content_length,
+            body_hash=new_body_hash,
+            entry_hashes=entry_hashes,
+            newest_first=newest_first
+        )
+
+    async def parse_feed(self, content: Union[str, bytes]) -> List[NewsRecord]:
+        """Парсит содержимое RSS-канала.
+
+        Если задан пул исполнителей, разбор выполняется в нём, чтобы
+        не занимать цикл событий.
+        """
+        self.stats['parses'] += 1
+        with PARSE_DURATION.time():
+            if self.parser_executor is None:
+                records = parse_feed_records(content)
+            else:
+                loop = asyncio.get_running_loop()
+                records = await loop.run_in_executor(self.parser_executor, parse_feed_records, content)
+
+        return [NewsRecord(*record) for record in records]
+
+    async def get_news(self, urls: List[str]) -> List[NewsRecord]:
         """Получает новости из списка RSS-каналов."""
         all_news = []
         
         for url in urls:
-            content = await self.fetch_rss(url)
-            if content:
-                news_items = await self.parse_feed(content)
+            response = await self.fetch_rss(url)
+            if response and response.content:
+                news_items = await self.parse_feed(response.content)
                 all_news.extend(news_items)
 
         # Сортируем по дате публикации
-        all_news.sort(key=lambda x: x['published'], reverse=True)
+        all_news.sort(key=lambda x: x.published, reverse=True)
         return all_news
 
-    def filter_news_by_keywords(self, news_items: List[Dict], keywords: List[str]) -> List[Dict]:
+    def filter_news_by_keywords(self, news_items: List[NewsRecord], keywords: List[str]) -> List[NewsRecord]:
         """Фильтрует новости по ключевым словам."""
         if not keywords:
             return news_items
 
-        filtered_news = []
-        for news in news_items:
-            text = f"{news['title']} {news['description']}".lower()
-            if any(keyword.lower() in text for keyword in keywords):
-                filtered_news.append(news)
-
-        return filtered_news 
\ No newline at end of file
+        matcher = KeywordMatcher(keywords)
+        return [
+            news for news in news_items
+            if matcher.contains_any(news.search_text, normalized=True)
+        ]
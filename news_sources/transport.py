@@ -0,0 +1,205 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Mapping, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Размер порции тела при потоковом чтении (в байтах)
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def content_charset(headers: Mapping[str, str]) -> Optional[str]:
+    """Кодировка из заголовка Content-Type, если она указана."""
+    content_type = headers.get('Content-Type', '')
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.strip().partition('=')
+        if name.lower() == 'charset' and value:
+            return value.strip('"\'')
+    return None
+
+
+@dataclass
+class TransportResponse:
+    """Ответ HTTP-запроса, независимый от используемой библиотеки."""
+    status: int
+    headers: Mapping[str, str]
+    body: bytes = b''
+
+    @property
+    def charset(self) -> Optional[str]:
+        return content_charset(self.headers)
+
+    def text(self) -> str:
+        return self.body.decode(self.charset or 'utf-8', errors='replace')
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+@dataclass
+class TransportStream:
+    """Ответ, тело которого читается порциями по мере поступления.
+
+    Если выйти из контекста stream(), не дочитав chunks, остаток тела не
+    загружается, а соединение закрывается.
+    """
+    status: int
+    headers: Mapping[str, str]
+    chunks: AsyncIterator[bytes]
+
+    @property
+    def charset(self) -> Optional[str]:
+        return content_charset(self.headers)
+
+
+async def _single_chunk(body: bytes) -> AsyncIterator[bytes]:
+    if body:
+        yield body
+
+
+class HttpTransport(ABC):
+    """Общий пул HTTP-соединений для всех обработчиков источников."""
+
+    @abstractmethod
+    async def request(self, method: str, url: str, headers: Optional[Mapping[str, str]] = None,
+                      json_body: Any = None) -> TransportResponse:
+        """Выполняет запрос и возвращает ответ с телом целиком."""
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str,
+                     headers: Optional[Mapping[str, str]] = None) -> AsyncIterator[TransportStream]:
+        """Выполняет запрос и отдаёт тело порциями.
+
+        Транспорты без потокового чтения загружают тело целиком и отдают
+        его одной порцией.
+        """
+        response = await self.request(method, url, headers=headers)
+        chunks = _single_chunk(response.body)
+        try:
+            yield TransportStream(response.status, response.headers, chunks)
+        finally:
+            await chunks.aclose()
+
+    @abstractmethod
+    async def close(self) -> None:
+        """Закрывает соединения пула."""
+
+
+class AiohttpTransport(HttpTransport):
+    """Транспорт на aiohttp с настроенным keep-alive, кешем DNS и лимитом соединений на хост."""
+
+    def __init__(self, max_connections: int = 100, max_per_host: int = 8,
+                 keepalive_timeout: float = 30.0, dns_cache_ttl: int = 300, timeout: float = 30.0):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = timeout
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессия создаётся лениво, внутри работающего цикла событий
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self.session
+
+    async def request(self, method: str, url: str, headers: Optional[Mapping[str, str]] = None,
+                      json_body: Any = None) -> TransportResponse:
+        async with self._get_session().request(method, url, headers=headers, json=json_body) as response:
+            body = await response.read()
+            return TransportResponse(status=response.status, headers=response.headers, body=body)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str,
+                     headers: Optional[Mapping[str, str]] = None) -> AsyncIterator[TransportStream]:
+        async with self._get_session().request(method, url, headers=headers) as response:
+            yield TransportStream(response.status, response.headers, response.content.iter_chunked(STREAM_CHUNK_SIZE))
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+class HttpxTransport(HttpTransport):
+    """Транспорт на httpx; при установленном пакете h2 использует HTTP/2.
+
+    По HTTP/2 запросы к одному хосту мультиплексируются в одном соединении.
+    Лимит соединений на хост httpx не поддерживает, его обеспечивает
+    FetchScheduler.
+    """
+
+    def __init__(self, max_connections: int = 100, keepalive_timeout: float = 30.0,
+                 timeout: float = 30.0, http2: bool = True):
+        import httpx
+
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("Пакет h2 не установлен, httpx будет использовать HTTP/1.1")
+                http2 = False
+        self.http2 = http2
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=keepalive_timeout
+            ),
+            timeout=timeout,
+            follow_redirects=True
+        )
+
+    async def request(self, method: str, url: str, headers: Optional[Mapping[str, str]] = None,
+                      json_body: Any = None) -> TransportResponse:
+        response = await self.client.request(method, url, headers=headers, json=json_body)
+        return TransportResponse(status=response.status_code, headers=response.headers, body=response.content)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str,
+                     headers: Optional[Mapping[str, str]] = None) -> AsyncIterator[TransportStream]:
+        async with self.client.stream(method, url, headers=headers) as response:
+            chunks = response.aiter_bytes(STREAM_CHUNK_SIZE)
+            try:
+                yield TransportStream(response.status_code, response.headers, chunks)
+            finally:
+                await chunks.aclose()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+def create_transport(backend: str = 'aiohttp', max_connections: int = 100, max_per_host: int = 8,
+                     keepalive_timeout: float = 30.0, dns_cache_ttl: int = 300,
+                     timeout: float = 30.0, http2: bool = True) -> HttpTransport:
+    """Создаёт транспорт: 'aiohttp' (по умолчанию) или 'httpx'."""
+    if backend == 'httpx':
+        return HttpxTransport(
+            max_connections=max_connections,
+            keepalive_timeout=keepalive_timeout,
+            timeout=timeout,
+            http2=http2
+        )
+    return AiohttpTransport(
+        max_connections=max_connections,
+        max_per_host=max_per_host,
+        keepalive_timeout=keepalive_timeout,
+        dns_cache_ttl=dns_cache_ttl,
+        timeout=timeout
+    )
@@ -0,0 +1,142 @@
+import hashlib
+import math
+import threading
+from typing import Dict, Iterable, List, Set
+
+
+def fingerprint64(news_hash: str) -> int:
+    """Сжимает хеш новости до 64-битного целого со знаком.
+
+    Хеши новостей - это MD5 в шестнадцатеричном виде, поэтому берутся их
+    первые 16 символов. Число со знаком помещается в INTEGER SQLite.
+    """
+    try:
+        value = int(news_hash[:16], 16)
+    except ValueError:
+        value = int(hashlib.md5(news_hash.encode()).hexdigest()[:16], 16)
+    if value >= 1 << 63:
+        value -= 1 << 64
+    return value
+
+
+class BloomFilter:
+    """Фильтр Блума для 64-битных отпечатков.
+
+    Позиции битов получаются двойным хешированием из двух половин
+    отпечатка, поэтому дополнительные хеш-функции не вычисляются.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / self.capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, fingerprint: int):
+        fingerprint &= (1 << 64) - 1
+        h1 = fingerprint & 0xFFFFFFFF
+        h2 = (fingerprint >> 32) | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, fingerprint: int) -> None:
+        for position in self._positions(fingerprint):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, fingerprint: int) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(fingerprint))
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    @property
+    def estimated_error_rate(self) -> float:
+        """Ожидаемая доля ложных срабатываний при текущем заполнении."""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+
+class SeenPrefilter:
+    """Вероятностный фильтр просмотренных новостей для каждого пользователя.
+
+    Отвечает на вопрос «мог ли пользователь видеть новость»: отрицательный
+    ответ точен, и запрос к базе не нужен, положительный требует проверки.
+    Когда фильтр пользователя заполняется, к нему добавляется следующий
+    вдвое большей ёмкости, так что доля ложных срабатываний не растёт
+    с числом новостей. Удалённые из базы записи остаются в фильтре и лишь
+    приводят к лишней проверке.
+    """
+
+    def __init__(self, capacity: int = 1024, error_rate: float = 0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._filters: Dict[int, List[BloomFilter]] = {}
+        self._lock = threading.Lock()
+        # Наблюдаемая статистика: сколько проверок удалось не отправлять в базу
+        self.lookups = 0
+        self.negatives = 0
+        self.false_positives = 0
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._filters
+
+    def add_user(self, user_id: int) -> None:
+        with self._lock:
+            self._filters.setdefault(user_id, [])
+
+    def add(self, user_id: int, fingerprints: Iterable[int]) -> None:
+        fingerprints = list(fingerprints)
+        with self._lock:
+            filters = self._filters.setdefault(user_id, [])
+            for fingerprint in fingerprints:
+                if not filters:
+                    # Первый фильтр рассчитан с запасом на уже известные отпечатки
+                    filters.append(BloomFilter(max(self.capacity, 2 * len(fingerprints)), self.error_rate))
+                elif filters[-1].is_full:
+                    filters.append(BloomFilter(filters[-1].capacity * 2, self.error_rate))
+                filters[-1].add(fingerprint)
+
+    def candidates(self, user_id: int, fingerprints: Iterable[int]) -> Set[int]:
+        """Возвращает отпечатки, которые пользователь мог видеть; остальные точно новые."""
+        fingerprints = list(fingerprints)
+        with self._lock:
+            filters = self._filters.get(user_id, [])
+            result = {
+                fingerprint for fingerprint in fingerprints
+                if any(fingerprint in bloom for bloom in filters)
+            }
+            self.lookups += len(fingerprints)
+            self.negatives += len(fingerprints) - len(result)
+            return result
+
+    def record_false_positives(self, count: int) -> None:
+        """Учитывает кандидатов, которых не оказалось в базе."""
+        with self._lock:
+            self.false_positives += count
+
+    def stats(self) -> Dict:
+        """Возвращает занимаемую память и долю ложных срабатываний."""
+        with self._lock:
+            filters = [bloom for user_filters in self._filters.values() for bloom in user_filters]
+            entries = sum(bloom.count for bloom in filters)
+            estimated = (
+                sum(bloom.estimated_error_rate * bloom.count for bloom in filters) / entries
+                if entries else 0.0
+            )
+            checked_unseen = self.negatives + self.false_positives
+            return {
+                'users': len(self._filters),
+                'entries': entries,
+                'memory_bytes': sum(bloom.memory_bytes for bloom in filters),
+                'estimated_error_rate': estimated,
+                'observed_error_rate': self.false_positives / checked_unseen if checked_unseen else 0.0,
+                'lookups': self.lookups,
+                'db_checks_avoided': self.negatives,
+            }
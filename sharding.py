@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Awaitable, Callable, FrozenSet, List, Optional, Set
+
+from database import shard_of, utcnow
+from news_record import NewsRecord
+
+logger = logging.getLogger(__name__)
+
+# Сколько секунд перечитывать уже полученные новости: строки с меньшим id
+# могут быть зафиксированы другим процессом позже строк с большим
+HANDOFF_SETTLE_SECONDS = 60
+
+
+class ShardCoordinator:
+    """Распределяет пользователей и источники между процессами бота через аренды в базе.
+
+    Пользователи (по telegram_id) и источники (по id) делятся на shard_count
+    сегментов. Каждые heartbeat_interval секунд процесс продлевает аренду
+    своих сегментов и выравнивает их число с остальными живыми процессами
+    (DatabaseManager.rebalance_shards). Процесс загружает источники своих
+    сегментов и сохраняет новые записи в news_items, а сопоставляет с
+    ключевыми словами и отправляет их только пользователям своих сегментов.
+    Так у каждого пользователя один пишущий процесс, и фильтр просмотренных
+    новостей в памяти остаётся точным.
+
+    Если процесс не смог продлить аренду дольше lease_seconds, он перестаёт
+    обслуживать сегменты: их уже могли забрать другие. При получении новых
+    сегментов новости перечитываются за handoff_window секунд, чтобы не
+    потерять записи, которые предыдущий владелец не успел обработать;
+    повторы отсекаются отметками о просмотре.
+    """
+
+    def __init__(self, db, worker_id: str, shard_count: int = 64, lease_seconds: int = 30,
+                 heartbeat_interval: float = 10.0, handoff_window: float = 120.0,
+                 on_change: Optional[Callable[['ShardCoordinator'], Awaitable[None]]] = None):
+        self.db = db
+        self.worker_id = worker_id
+        self.shard_count = shard_count
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.handoff_window = handoff_window
+        self.on_change = on_change
+        self.shards: FrozenSet[int] = frozenset()
+        self.is_poller = False
+        self.workers = 1
+        self._last_heartbeat: Optional[float] = None
+        self._keywords_version: Optional[int] = None
+        self._cursor: Optional[int] = None
+        self._consumed: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Получает сегменты и запускает периодическое продление аренды.
+
+        Первое распределение выполняется сразу, чтобы первый цикл проверки
+        новостей уже знал свои сегменты.
+        """
+        if self._task is None:
+            await self.db.set_shards(self.shards, self.shard_count)
+            await self.heartbeat()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает продление и освобождает аренды, чтобы их сразу забрали другие процессы."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.db.release_worker(self.worker_id)
+        except Exception as e:
+            logger.error(f"Ошибка при освобождении сегментов: {e}")
+        await self._apply(frozenset(), False, self.workers)
+
+    async def heartbeat(self) -> None:
+        """Продлевает аренду и применяет новое распределение сегментов."""
+        try:
+            result = await self.db.rebalance_shards(self.worker_id, self.shard_count, self.lease_seconds)
+        except Exception as e:
+            logger.error(f"Ошибка при продлении аренды сегментов: {e}")
+            if self._last_heartbeat is None or time.monotonic() - self._last_heartbeat > self.lease_seconds:
+                await self._apply(frozenset(), False, self.workers)
+            return
+        self._last_heartbeat = time.monotonic()
+        await self._apply(frozenset(result['shards']), result['poller'], result['workers'])
+
+        # Ключевые слова меняет процесс, получающий обновления; остальные перестраивают индекс
+        version = await self.db.keywords_version()
+        if self._keywords_version is not None and version != self._keywords_version:
+            await self.db.reset_keyword_index()
+        self._keywords_version = version
+
+        if self.is_poller:
+            await self.db.prune_news_items(utcnow() - timedelta(seconds=2 * self.handoff_window))
+
+    async def _apply(self, shards: FrozenSet[int], is_poller: bool, workers: int) -> None:
+        changed = (shards, is_poller, workers) != (self.shards, self.is_poller, self.workers)
+        if shards != self.shards:
+            gained = shards - self.shards
+            logger.info(
+                f"Сегменты процесса {self.worker_id}: {len(shards)} из {self.shard_count} "
+                f"(получено {len(gained)}, отдано {len(self.shards - shards)}), процессов {workers}"
+            )
+            await self.db.set_shards(shards, self.shard_count)
+            if gained:
+                self._cursor = None
+        self.shards = shards
+        self.is_poller = is_poller
+        self.workers = workers
+        if changed and self.on_change is not None:
+            await self.on_change(self)
+
+    def owns(self, key: int) -> bool:
+        """Относится ли пользователь (telegram_id) или источник (id) к сегментам процесса."""
+        return shard_of(key, self.shard_count) in self.shards
+
+    async def publish_news(self, news: List[NewsRecord]) -> None:
+        """Передаёт новости своих источников процессам, владеющим пользователями."""
+        await self.db.add_news_items(news)
+
+    async def take_news(self) -> List[NewsRecord]:
+        """Возвращает новости, сохранённые всеми процессами и ещё не обработанные этим.
+
+        Недавние строки перечитываются HANDOFF_SETTLE_SECONDS секунд, а
+        уже возвращённые пропускаются по id, поэтому строка, зафиксированная
+        позже строк с большим id, не теряется.
+        """
+        if self._cursor is None:
+            self._cursor = await self.db.news_items_cursor(utcnow() - timedelta(seconds=self.handoff_window))
+            self._consumed.clear()
+        items = await self.db.get_news_items(self._cursor)
+        news = []
+        for item_id, _, record in items:
+            if item_id not in self._consumed:
+                news.append(record)
+                self._consumed.add(item_id)
+
+        settled = utcnow() - timedelta(seconds=HANDOFF_SETTLE_SECONDS)
+        for item_id, created_at, _ in items:
+            if created_at > settled:
+                break
+            self._cursor = item_id
+        self._consumed = {item_id for item_id in self._consumed if item_id > self._cursor}
+        return news
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.heartbeat()
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении сегментов: {e}")
@@ -0,0 +1,81 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+import database
+
+
+class EnqueueNewsTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory(prefix='test_database_')
+        self.addCleanup(directory.cleanup)
+        engine = database.create_database(f"sqlite:///{Path(directory.name) / 'test.db'}")
+        self.addCleanup(engine.dispose)
+        self.db = database.DatabaseManager(cache_ttl=0, session_factory=sessionmaker(bind=engine))
+        for user_id in (1, 2):
+            self.db.add_user(user_id)
+
+    def enqueue(self, news_by_user):
+        calls = {}
+
+        def build_messages(user_id, unseen):
+            calls[user_id] = unseen
+            return [(news_hash, f'{user_id}: {news_hash}', None) for news_hash in unseen[:2]]
+
+        return self.db.enqueue_news(news_by_user, build_messages), calls
+
+    def test_only_unseen_news_are_enqueued_for_each_user(self):
+        self.db.mark_news_seen(2, ['b'])
+
+        (enqueued, unseen), calls = self.enqueue({1: ['a', 'b', 'c'], 2: ['a', 'b'], 3: ['a']})
+        self.assertEqual(calls, {1: ['a', 'b', 'c'], 2: ['a']})
+        self.assertEqual((enqueued, unseen), (3, 4))
+        self.assertEqual(self.db.count_pending_outbox(ready_only=False), 3)
+        # Новость, не вошедшая в сообщения, тоже отмечена просмотренной
+        self.assertTrue(self.db.is_news_seen(1, 'c'))
+
+        (enqueued, unseen), calls = self.enqueue({1: ['a', 'b', 'c', 'd'], 2: ['a', 'b']})
+        self.assertEqual(calls, {1: ['d']})
+        self.assertEqual((enqueued, unseen), (1, 1))
+
+    def test_add_to_outbox_skips_seen_news(self):
+        self.db.mark_news_seen(1, ['a'])
+        messages = [('a', 'A', None), ('b', 'B', None)]
+        self.assertEqual(self.db.add_to_outbox(1, messages, seen_hashes=['c']), 1)
+        self.assertTrue(self.db.is_news_seen(1, 'c'))
+        self.assertEqual(self.db.add_to_outbox(1, messages), 0)
+
+
+class SeenPrefilterAccountingTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory(prefix='test_database_')
+        self.addCleanup(directory.cleanup)
+        engine = database.create_database(f"sqlite:///{Path(directory.name) / 'test.db'}")
+        self.addCleanup(engine.dispose)
+        self.session_factory = sessionmaker(bind=engine)
+        self.db = database.DatabaseManager(cache_ttl=0, session_factory=self.session_factory)
+        self.db.add_user(1)
+        self.db.mark_news_seen(1, ['seen'])
+        self.prefilter = self.db.get_seen_prefilter()
+
+    def test_user_missing_from_prefilter_is_not_counted_as_false_positives(self):
+        # Пользователь добавлен другим процессом уже после построения фильтра
+        database.DatabaseManager(cache_ttl=0, session_factory=self.session_factory).add_user(2)
+        self.assertNotIn(2, self.prefilter)
+
+        self.assertEqual(self.db.filter_unseen_news(2, ['a', 'b', 'c']), {'a', 'b', 'c'})
+        self.assertEqual(self.prefilter.false_positives, 0)
+
+    def test_maybe_answers_missing_from_database_are_false_positives(self):
+        self.prefilter.add(1, [database.fingerprint64('phantom')])
+
+        self.assertEqual(self.db.filter_unseen_news(1, ['seen', 'phantom', 'new']), {'phantom', 'new'})
+        self.assertEqual(self.prefilter.false_positives, 1)
+        self.assertEqual(self.db.enqueue_news({1: ['phantom']}, lambda user_id, unseen: [])[1], 1)
+        self.assertEqual(self.prefilter.false_positives, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
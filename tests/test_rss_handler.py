@@ -0,0 +1,119 @@
+import unittest
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Mapping, Optional
+
+from metrics import PARSES_AVOIDED
+from news_sources.rss_handler import RSSHandler
+from news_sources.transport import HttpTransport, TransportStream
+
+START = datetime(2024, 1, 1, 12, 0)
+
+
+def make_feed(numbers) -> bytes:
+    """RSS-канал с записями в порядке numbers; запись n опубликована через n часов после START."""
+    items = ''.join(
+        f'<item><title>Новость {n}</title><link>https://example.com/{n}</link>'
+        f'<pubDate>{(START + timedelta(hours=n)).strftime("%a, %d %b %Y %H:%M:%S")} +0000</pubDate></item>'
+        for n in numbers
+    )
+    return f'<?xml version="1.0" encoding="utf-8"?><rss version="2.0"><channel>{items}</channel></rss>'.encode()
+
+
+class FeedTransport(HttpTransport):
+    """Отдаёт тело канала по одной записи за порцию и считает прочитанные байты."""
+
+    def __init__(self):
+        self.body = b''
+        self.bytes_read = 0
+
+    async def request(self, method, url, headers=None, json_body=None):
+        raise AssertionError('ожидается потоковое чтение')
+
+    async def _chunks(self) -> AsyncIterator[bytes]:
+        for part in self.body.split(b'</item>'):
+            chunk = part + b'</item>' if part.endswith(b'</pubDate>') else part
+            self.bytes_read += len(chunk)
+            yield chunk
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str,
+                     headers: Optional[Mapping[str, str]] = None) -> AsyncIterator[TransportStream]:
+        chunks = self._chunks()
+        try:
+            yield TransportStream(200, {'Content-Type': 'application/rss+xml; charset=utf-8'}, chunks)
+        finally:
+            await chunks.aclose()
+
+    async def close(self):
+        pass
+
+
+class FetchSourceOrderTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.transport = FeedTransport()
+        self.handler = RSSHandler(transport=self.transport)
+
+    async def fetch(self, numbers, previous=None):
+        self.transport.body = make_feed(numbers)
+        self.transport.bytes_read = 0
+        if previous is None:
+            return await self.handler.fetch_source('memory')
+        return await self.handler.fetch_source(
+            'memory',
+            body_hash=previous.body_hash,
+            known_hashes=previous.entry_hashes,
+            newest_first=previous.newest_first
+        )
+
+    async def test_newest_first_feed_stops_at_known_entries(self):
+        first = await self.fetch(range(20, 0, -1))
+        self.assertTrue(first.newest_first)
+
+        second = await self.fetch(range(21, 1, -1), first)
+        self.assertEqual([item.title for item in second.news], ['Новость 21'])
+        self.assertLess(self.transport.bytes_read, len(self.transport.body) // 2)
+        self.assertTrue(second.newest_first)
+
+        third = await self.fetch(range(21, 1, -1), second)
+        self.assertTrue(third.not_modified)
+        self.assertEqual(third.news, [])
+
+    async def test_oldest_first_feed_is_read_to_the_end(self):
+        first = await self.fetch(range(1, 7))
+        self.assertFalse(first.newest_first)
+
+        second = await self.fetch(range(1, 8), first)
+        self.assertFalse(second.not_modified)
+        self.assertEqual([item.title for item in second.news], ['Новость 7'])
+        self.assertEqual(self.transport.bytes_read, len(self.transport.body))
+
+        third = await self.fetch(range(2, 9), second)
+        self.assertEqual([item.title for item in third.news], ['Новость 8'])
+
+    async def test_feed_without_dates_is_not_treated_as_newest_first(self):
+        self.transport.body = (
+            '<rss version="2.0"><channel>'
+            + ''.join(f'<item><title>{n}</title><link>https://example.com/{n}</link></item>' for n in range(5))
+            + '</channel></rss>'
+        ).encode()
+        result = await self.handler.fetch_source('memory')
+        self.assertFalse(result.newest_first)
+
+    async def test_skipped_parses_are_exported_as_metrics(self):
+        def avoided(reason):
+            return PARSES_AVOIDED.labels(source='memory', reason=reason).get()
+
+        before = {reason: avoided(reason) for reason in ('unchanged_body', 'known_entries')}
+        first = await self.fetch(range(1, 7))
+        await self.fetch(range(1, 7), first)
+        self.assertEqual(avoided('unchanged_body'), before['unchanged_body'] + 1)
+
+        newest_first = await self.fetch(range(20, 0, -1))
+        await self.fetch(range(20, 0, -1), newest_first)
+        self.assertEqual(avoided('known_entries'), before['known_entries'] + 1)
+        self.assertEqual(self.handler.stats['parses_avoided'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,46 +1,350 @@
 import re
-from typing import List, Dict
+from functools import lru_cache
+from html.entities import html5 as html5_entities
+from html.parser import HTMLParser
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
 from datetime import datetime
 import pytz
+from bs4 import BeautifulSoup
 
-def format_message(news_item: Dict) -> str:
-    """Форматирует новость для отправки в Telegram."""
-    title = news_item['title']
-    link = news_item['link']
-    description = news_item['description']
-    source = news_item.get('source', 'rss')
-    
+from news_record import NewsRecord
+
+# Теги, текст внутри которых BeautifulSoup не включает в get_text()
+_INVISIBLE_TAGS = frozenset(('script', 'style', 'template'))
+# Пустые элементы, которые BeautifulSoup сразу закрывает
+_VOID_TAGS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'keygen', 'link',
+    'menuitem', 'meta', 'param', 'source', 'track', 'wbr', 'basefont', 'bgsound',
+    'command', 'frame', 'image', 'isindex', 'nextid', 'spacer',
+))
+# Теги, в которых BeautifulSoup сохраняет пробельные строки как есть
+_PREFORMATTED_TAGS = frozenset(('pre', 'textarea'))
+# Таблица для str.translate, удаляющая пробельные символы ASCII
+_ASCII_SPACES = {ord(char): None for char in '\x20\x0a\x09\x0c\x0d'}
+# Часовой пояс дат в сообщениях
+MOSCOW_TZ = pytz.timezone('Europe/Moscow')
+# Сколько скомпилированных шаблонов выделения хранить (по одному на набор ключевых слов)
+HIGHLIGHT_CACHE_SIZE = 1024
+# Максимальная длина сообщения Telegram (в единицах UTF-16)
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Разделитель новостей в дайджесте
+DIGEST_SEPARATOR = '\n\n➖➖➖\n\n'
+# Теги, целые сущности и отдельные символы HTML-сообщения
+_HTML_TOKEN_RE = re.compile(r'<[^<>]*>|&#?\w+;|[^<&]+|[<&]')
+_TAG_NAME_RE = re.compile(r'</?([a-zA-Z][a-zA-Z0-9-]*)')
+_ENTITY_RE = re.compile(r'&(?:#([0-9]{1,7});|#[xX]([0-9a-fA-F]{1,6});|([A-Za-z][A-Za-z0-9]{0,31};))')
+
+
+class _EnoughText(Exception):
+    """Набрано достаточно видимого текста, разбор можно прекратить."""
+
+
+class _MalformedMarkup(Exception):
+    """Разметка, которую быстрый путь не обрабатывает так же, как BeautifulSoup."""
+
+
+class _TextExtractor(HTMLParser):
+    """Потоковый сборщик видимого текста без построения дерева документа.
+
+    Повторяет правила BeautifulSoup: текст внутри открытых script/style/template
+    пропускается, закрывающий тег закрывает ближайший открытый тег с тем же
+    именем, а строки из одних пробельных символов вне pre/textarea
+    сворачиваются в один перевод строки или пробел.
+    """
+
+    def __init__(self, limit: Optional[int]):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.length = 0
+        self.limit = limit
+        self._pending: List[str] = []
+        self._open_tags: List[str] = []
+        # Пустые элементы, уже закрытые при открытии; их закрывающий тег игнорируется
+        self._closed_void_tags: List[str] = []
+        self._invisible_depth = 0
+        self._preformatted_depth = 0
+
+    def _flush(self):
+        if not self._pending:
+            return
+        data = ''.join(self._pending)
+        self._pending = []
+        if self._invisible_depth:
+            return
+        if not self._preformatted_depth and not data.translate(_ASCII_SPACES):
+            data = '\n' if '\n' in data else ' '
+        self.parts.append(data)
+        self.length += len(data)
+        if self.limit is not None and self.length >= self.limit:
+            raise _EnoughText
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in _VOID_TAGS:
+            self._closed_void_tags.append(tag)
+            return
+        self._open_tags.append(tag)
+        if tag in _INVISIBLE_TAGS:
+            self._invisible_depth += 1
+        elif tag in _PREFORMATTED_TAGS:
+            self._preformatted_depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        self._flush()
+        if tag in self._closed_void_tags:
+            # BeautifulSoup принимает этот тег за закрытие предыдущего, и сам тег остаётся открытым
+            self._closed_void_tags.remove(tag)
+            self._open_tags.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._closed_void_tags:
+            self._closed_void_tags.remove(tag)
+            return
+        self._flush()
+        if tag not in self._open_tags:
+            return
+        while True:
+            closed = self._open_tags.pop()
+            if closed in _INVISIBLE_TAGS:
+                self._invisible_depth -= 1
+            elif closed in _PREFORMATTED_TAGS:
+                self._preformatted_depth -= 1
+            if closed == tag:
+                break
+
+    def handle_data(self, data):
+        self._pending.append(data)
+        # Длинный непробельный текст можно обрезать, не дожидаясь конца строки
+        if (self.limit is not None and not self._invisible_depth and data.translate(_ASCII_SPACES)
+                and self.length + sum(map(len, self._pending)) >= self.limit):
+            self._flush()
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        # CDATA и прочие нестандартные объявления BeautifulSoup обрабатывает по-своему
+        raise _MalformedMarkup
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def _has_simple_entities(html: str) -> bool:
+    """Проверяет, что все ссылки на символы раскрываются одинаково у HTMLParser и BeautifulSoup."""
+    if html.count('&') != len(_ENTITY_RE.findall(html)):
+        return False
+    for match in _ENTITY_RE.finditer(html):
+        decimal, hexadecimal, name = match.groups()
+        if name is not None:
+            if name not in html5_entities:
+                return False
+            continue
+        code = int(decimal) if decimal is not None else int(hexadecimal, 16)
+        if code < 0x20 or 0x7f <= code <= 0x9f or 0xd800 <= code <= 0xdfff or code > 0x10ffff:
+            return False
+    return True
+
+
+def strip_html(html: str, limit: Optional[int] = None) -> str:
+    """Возвращает видимый текст HTML-фрагмента, как BeautifulSoup(html, 'html.parser').get_text().
+
+    При заданном limit разбор прекращается, как только набрано limit символов,
+    и возвращается не больше limit символов. Разметка, которую быстрый путь
+    не может обработать идентично, разбирается через BeautifulSoup.
+    """
+    if '<' not in html and '&' not in html:
+        if html and not html.translate(_ASCII_SPACES):
+            html = '\n' if '\n' in html else ' '
+        return html if limit is None else html[:limit]
+
+    if _has_simple_entities(html):
+        parser = _TextExtractor(limit)
+        try:
+            parser.feed(html)
+            if not parser.rawdata:
+                parser.close()
+                text = ''.join(parser.parts)
+                return text if limit is None else text[:limit]
+        except _EnoughText:
+            return ''.join(parser.parts)[:limit]
+        except _MalformedMarkup:
+            pass
+
+    text = BeautifulSoup(html, 'html.parser').get_text()
+    return text if limit is None else text[:limit]
+
+
+def html_preview(html: str, length: int = 200) -> str:
+    """Возвращает текст HTML-фрагмента, обрезанный до length символов с многоточием."""
+    text = strip_html(html, length + 1)
+    return text[:length] + '...' if len(text) > length else text
+
+
+def _message_parts(news_item: NewsRecord) -> Tuple[str, str]:
+    """Части сообщения до и после описания новости."""
     # Форматируем дату в московское время
-    moscow_tz = pytz.timezone('Europe/Moscow')
-    if isinstance(news_item['published'], datetime):
-        published = news_item['published'].astimezone(moscow_tz)
+    if isinstance(news_item.published, datetime):
+        published = news_item.published.astimezone(MOSCOW_TZ)
         date_str = published.strftime('%d.%m.%Y %H:%M')
     else:
         date_str = "Дата не указана"
 
-    source_emoji = "📰" if source == "rss" else "💰"
-    
-    message = (
-        f"{source_emoji} <b>{title}</b>\n\n"
-        f"{description}\n\n"
-        f"🕒 {date_str}\n"
-        f"🔗 <a href='{link}'>Подробнее</a>"
+    source_emoji = "📰" if news_item.source == "rss" else "💰"
+    head = f"{source_emoji} <b>{news_item.title}</b>\n\n"
+    tail = (
+        f"\n\n🕒 {date_str}\n"
+        f"🔗 <a href='{news_item.link}'>Подробнее</a>"
     )
-    
-    return message
+    return head, tail
+
+
+def format_message(news_item: NewsRecord, keywords: Iterable[str] = ()) -> str:
+    """Форматирует новость для отправки в Telegram, выделяя keywords в описании."""
+    head, tail = _message_parts(news_item)
+    return f"{head}{highlight_keywords(news_item.description, keywords)}{tail}"
+
 
-def highlight_keywords(text: str, keywords: List[str]) -> str:
-    """Выделяет ключевые слова в тексте жирным шрифтом."""
+@lru_cache(maxsize=HIGHLIGHT_CACHE_SIZE)
+def _highlight_pattern(keywords: FrozenSet[str]) -> re.Pattern:
+    # Длинные слова раньше коротких, чтобы «bitcoin etf» не выделилось как «bitcoin»
+    words = sorted(keywords, key=lambda word: (-len(word), word))
+    return re.compile(f"({'|'.join(map(re.escape, words))})", re.IGNORECASE)
+
+
+def highlight_keywords(text: str, keywords: Iterable[str]) -> str:
+    """Выделяет ключевые слова в тексте жирным шрифтом.
+
+    Шаблон для набора слов компилируется один раз и хранится в кеше на
+    HIGHLIGHT_CACHE_SIZE наборов.
+    """
+    keywords = frozenset(word.lower() for word in keywords if word)
     if not keywords:
         return text
-        
-    pattern = '|'.join(map(re.escape, keywords))
-    return re.sub(
-        f'({pattern})',
-        r'<b>\1</b>',
-        text,
-        flags=re.IGNORECASE
-    )
+    return _highlight_pattern(keywords).sub(r'<b>\1</b>', text)
+
+
+def telegram_length(text: str) -> int:
+    """Длина текста так, как её ограничивает Telegram: в единицах UTF-16.
+
+    Теги и сущности учитываются полностью, поэтому оценка не меньше длины
+    текста после разбора разметки.
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+def truncate_html(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT, ellipsis: str = '…') -> str:
+    """Обрезает HTML-сообщение до limit, не разрывая теги и сущности.
+
+    Теги, открытые до места обрезки, закрываются, поэтому результат
+    остаётся корректной разметкой для parse_mode='HTML'.
+    """
+    if telegram_length(text) <= limit:
+        return text
+    parts: List[str] = []
+    open_tags: List[str] = []
+    length = telegram_length(ellipsis)
+    for match in _HTML_TOKEN_RE.finditer(text):
+        token = match.group()
+        tag = _TAG_NAME_RE.match(token) if token.startswith('<') and token.endswith('>') else None
+        if tag is not None and token.startswith('</'):
+            # Закрывающий тег уже учтён в длине вместе с открывающим
+            if open_tags and open_tags[-1] == tag.group(1).lower():
+                open_tags.pop()
+                parts.append(token)
+            continue
+        closing = 0 if tag is None else telegram_length(f'</{tag.group(1)}>')
+        token_length = telegram_length(token)
+        if tag is None and not token.startswith('&') and length + token_length > limit:
+            # Текст обрезается посимвольно, остальные элементы - только целиком
+            for char in token:
+                char_length = telegram_length(char)
+                if length + char_length > limit:
+                    break
+                parts.append(char)
+                length += char_length
+            break
+        if length + token_length + closing > limit:
+            break
+        parts.append(token)
+        length += token_length + closing
+        if tag is not None and not token.endswith('/>'):
+            open_tags.append(tag.group(1).lower())
+    return ''.join(parts) + ellipsis + ''.join(f'</{name}>' for name in reversed(open_tags))
+
+
+def pack_messages(parts: List[str], limit: int = TELEGRAM_MESSAGE_LIMIT,
+                  separator: str = DIGEST_SEPARATOR) -> List[Tuple[str, int]]:
+    """Собирает готовые сообщения в как можно меньшее число сообщений не длиннее limit.
+
+    Порядок частей сохраняется, часть никогда не делится между
+    сообщениями, а слишком длинная обрезается truncate_html. Возвращает
+    пары (текст сообщения, число вошедших в него частей).
+    """
+    messages: List[Tuple[str, int]] = []
+    current: List[str] = []
+    length = 0
+    separator_length = telegram_length(separator)
+    for part in parts:
+        part = truncate_html(part, limit)
+        part_length = telegram_length(part)
+        if current and length + separator_length + part_length > limit:
+            messages.append((separator.join(current), len(current)))
+            current, length = [], 0
+        length += part_length + (separator_length if current else 0)
+        current.append(part)
+    if current:
+        messages.append((separator.join(current), len(current)))
+    return messages
+
+
+class MessageRenderer:
+    """Форматирует новости цикла рассылки, не повторяя работу для каждого получателя.
+
+    Дата, заголовок и ссылка новости форматируются один раз, а к описанию
+    добавляется выделение найденных у пользователя ключевых слов. Готовые
+    сообщения хранятся по паре (новость, набор слов), поэтому пользователи,
+    у которых в новости нашлись одни и те же слова, получают один и тот же
+    текст без повторного форматирования. Экземпляр создаётся на один цикл;
+    сверх max_entries сообщения форматируются без сохранения.
+    """
+
+    def __init__(self, highlight: bool = True, max_entries: int = 100_000):
+        self.highlight = highlight
+        self.max_entries = max_entries
+        self._parts: Dict[int, Tuple[str, str]] = {}
+        self._messages: Dict[Tuple[int, FrozenSet[str]], str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, news_item: NewsRecord, keywords: FrozenSet[str] = frozenset()) -> str:
+        """Возвращает сообщение о новости с выделенными keywords."""
+        if not self.highlight:
+            keywords = frozenset()
+        key = (news_item.fingerprint, keywords)
+        message = self._messages.get(key)
+        if message is not None:
+            self.hits += 1
+            return message
+        self.misses += 1
+
+        parts = self._parts.get(news_item.fingerprint)
+        if parts is None:
+            parts = _message_parts(news_item)
+            if len(self._parts) < self.max_entries:
+                self._parts[news_item.fingerprint] = parts
+        head, tail = parts
+        message = f"{head}{highlight_keywords(news_item.description, keywords)}{tail}"
+        if len(self._messages) < self.max_entries:
+            self._messages[key] = message
+        return message
 
 def validate_keyword(keyword: str) -> bool:
     """Проверяет валидность ключевого слова."""
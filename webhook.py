@@ -0,0 +1,100 @@
+import hmac
+import json
+import logging
+from typing import IO, Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from metrics import WEBHOOK_UPDATES
+
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передаёт secret_token из setWebhook
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+
+class WebhookServer:
+    """HTTP-сервер, принимающий обновления Telegram вместо getUpdates.
+
+    Обновление с верным секретом сразу передаётся в очередь приложения, а
+    Telegram получает ответ, не дожидаясь обработки. Состояние пошаговых
+    диалогов меню (ConversationHandler) и user_data хранятся в памяти
+    процесса, поэтому несколько процессов за балансировщиком с одним
+    адресом допустимы только при маршрутизации по чату: обновления одного
+    чата (message.chat.id в теле запроса) должны всегда попадать в один
+    процесс, иначе диалог, начатый в одном процессе, другой не продолжит.
+    GET /healthz отвечает, пока процесс работает. Если задан
+    url, адрес регистрируется в Telegram при запуске. Без url сервер только
+    слушает порт: так его проверяют локально, отправляя записанные обновления
+    (record_path и loadtest.replay_updates).
+    """
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 8443, path: str = '/telegram',
+                 url: Optional[str] = None, secret_token: Optional[str] = None,
+                 record_path: Optional[str] = None):
+        if url and not secret_token:
+            raise ValueError("Для регистрации вебхука нужен secret_token")
+        self.host = host
+        self.port = port
+        self.path = path
+        self.url = url
+        self.secret_token = secret_token
+        self.record_path = record_path
+        self._application: Optional[Application] = None
+        self._record: Optional[IO[str]] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self, application: Application) -> None:
+        self._application = application
+        if self.record_path:
+            self._record = open(self.record_path, 'a', encoding='utf-8')
+        app = web.Application()
+        app.router.add_post(self.path, self._handle)
+        app.router.add_get('/healthz', self._health)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Вебхук принимает обновления на http://{self.host}:{self.port}{self.path}")
+        if self.url:
+            # Повторная регистрация того же адреса другими процессами ничего не меняет
+            await application.bot.set_webhook(
+                self.url,
+                secret_token=self.secret_token,
+                allowed_updates=Update.ALL_TYPES
+            )
+
+    async def stop(self) -> None:
+        # Вебхук в Telegram не удаляется: обновления могут принимать другие процессы
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+        if self._record is not None:
+            self._record.close()
+            self._record = None
+
+    async def _health(self, request: web.Request) -> web.Response:
+        return web.Response(text='ok')
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        if self.secret_token and not hmac.compare_digest(
+                request.headers.get(SECRET_TOKEN_HEADER, ''), self.secret_token):
+            WEBHOOK_UPDATES.labels(result='forbidden').inc()
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self._application.bot)
+        except Exception as e:
+            logger.warning(f"Некорректное обновление вебхука: {e}")
+            update = None
+        if update is None:
+            WEBHOOK_UPDATES.labels(result='invalid').inc()
+            return web.Response(status=400)
+
+        if self._record is not None:
+            self._record.write(json.dumps(data, ensure_ascii=False) + '\n')
+            self._record.flush()
+        await self._application.update_queue.put(update)
+        WEBHOOK_UPDATES.labels(result='accepted').inc()
+        return web.Response()
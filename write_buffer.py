@@ -0,0 +1,64 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from database import utcnow
+
+logger = logging.getLogger(__name__)
+
+
+class LastFetchBuffer:
+    """Накапливает обновления last_fetch источников и записывает их пакетом.
+
+    Каждое сообщение в группе только отмечает время в памяти; раз в
+    flush_interval секунд и при остановке все отметки сохраняются одним
+    UPDATE. Для каждого источника хранится только последнее время, поэтому
+    число строк в пакете не превышает числа активных источников.
+    """
+
+    def __init__(self, db, flush_interval: float = 5.0):
+        self.db = db
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        """Количество источников с несохранёнными отметками."""
+        return len(self._pending)
+
+    def touch(self, source_id: int, fetched_at: Optional[datetime] = None) -> None:
+        """Отмечает обращение к источнику; запись в базу будет выполнена позже."""
+        self._pending[source_id] = fetched_at or utcnow()
+
+    def start(self) -> None:
+        """Запускает периодическую запись в текущем цикле событий."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает периодическую запись и сохраняет оставшиеся отметки."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Сохраняет накопленные отметки одним запросом."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        if not await self.db.update_sources_last_fetch(pending):
+            # Возвращаем отметки в буфер, не затирая появившиеся за время записи
+            for source_id, fetched_at in pending.items():
+                self._pending.setdefault(source_id, fetched_at)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка при сохранении времени проверки источников: {e}")